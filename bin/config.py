@@ -4,6 +4,8 @@ import os
 import platform
 from ipywidgets import Layout, Label, Text, Checkbox, Button, HBox, VBox, \
     FloatText, BoundedIntText, BoundedFloatText, HTMLMath, Dropdown
+from omp_planner import planner
+from config_doc import config_doc
 
 hublib_flag = True
 if platform.system() != 'Windows':
@@ -133,10 +135,26 @@ class ConfigTab(object):
 
         self.omp_threads = BoundedIntText(
             min=1,
-            max=4,
+            max=1024,
             description='# threads',
             layout=Layout(width=constWidth),
         )
+        # propose # threads from the usable cores (and those taken by active runs); see bin/omp_planner.py
+        self.omp_auto = Button(description='Auto', tooltip='Use the cores that are free',
+                               layout=Layout(width='60px'))
+        self.omp_info = Label('')
+        self.timings_dir = None   # where past runs' timings are kept, and for which model (set by the tool)
+        self.model = None
+        def omp_auto_cb(b):
+            threads, why = planner().propose()
+            self.omp_threads.value = threads
+            self.omp_info.value = why
+            if self.timings_dir:
+                report = planner().report(self.timings_dir, self.model)
+                if report:
+                    self.omp_info.value += '; past runs: ' + report
+        self.omp_auto.on_click(omp_auto_cb)
+        omp_row = HBox([self.omp_threads, self.omp_auto, self.omp_info])
 
         # self.toggle_prng = Checkbox(
         #     description='Seed PRNG', style={'description_width': 'initial'},  # e.g. 'initial'  '120px'
@@ -289,7 +307,7 @@ class ConfigTab(object):
         uep = xml_root.find(".//options//virtual_wall_at_domain_edge")
         if uep:
             self.tab = VBox([domain_box,
-                         HBox([self.tmax, Label('min')]), self.omp_threads,  
+                         HBox([self.tmax, Label('min')]), omp_row,  
                          svg_mat_output_row,
                         label_blankline, 
                         #  HBox([self.csv_upload.w, self.toggle_cells_csv]),
@@ -299,90 +317,92 @@ class ConfigTab(object):
                          ])  
         else:
             self.tab = VBox([domain_box,
-                         HBox([self.tmax, Label('min')]), self.omp_threads,  
+                         HBox([self.tmax, Label('min')]), omp_row,  
                          svg_mat_output_row,
                          ])  
 
     # Populate the GUI widgets with values from the XML
     def fill_gui(self, xml_root):
-        self.xmin.value = float(xml_root.find(".//x_min").text)
-        self.xmax.value = float(xml_root.find(".//x_max").text)
-        self.xdelta.value = float(xml_root.find(".//dx").text)
+        doc = config_doc(xml_root)   # (indexed: one pass over the tree for all the finds below)
+        self.xmin.value = float(doc.find(".//x_min").text)
+        self.xmax.value = float(doc.find(".//x_max").text)
+        self.xdelta.value = float(doc.find(".//dx").text)
     
-        self.ymin.value = float(xml_root.find(".//y_min").text)
-        self.ymax.value = float(xml_root.find(".//y_max").text)
-        self.ydelta.value = float(xml_root.find(".//dy").text)
+        self.ymin.value = float(doc.find(".//y_min").text)
+        self.ymax.value = float(doc.find(".//y_max").text)
+        self.ydelta.value = float(doc.find(".//dy").text)
     
-        self.zmin.value = float(xml_root.find(".//z_min").text)
-        self.zmax.value = float(xml_root.find(".//z_max").text)
-        self.zdelta.value = float(xml_root.find(".//dz").text)
+        self.zmin.value = float(doc.find(".//z_min").text)
+        self.zmax.value = float(doc.find(".//z_max").text)
+        self.zdelta.value = float(doc.find(".//dz").text)
 
-        uep = xml_root.find(".//options//virtual_wall_at_domain_edge")
+        uep = doc.find(".//options//virtual_wall_at_domain_edge")
         if uep and (uep.text.lower() == 'true'):
             self.toggle_virtual_walls.value = True
         else:
             self.toggle_virtual_walls.value = False
         
 
-        self.tmax.value = float(xml_root.find(".//max_time").text)
+        self.tmax.value = float(doc.find(".//max_time").text)
         
-        self.omp_threads.value = int(xml_root.find(".//omp_num_threads").text)
+        self.omp_threads.value = int(doc.find(".//omp_num_threads").text)
         
-        if xml_root.find(".//full_data//enable").text.lower() == 'true':
+        if doc.find(".//full_data//enable").text.lower() == 'true':
             self.toggle_mcds.value = True
         else:
             self.toggle_mcds.value = False
-        self.mcds_interval.value = float(xml_root.find(".//full_data//interval").text)
+        self.mcds_interval.value = float(doc.find(".//full_data//interval").text)
 
         # NOTE: do this *after* filling the mcds_interval, directly above, due to the callback/constraints on them
-        if xml_root.find(".//SVG//enable").text.lower() == 'true':
+        if doc.find(".//SVG//enable").text.lower() == 'true':
             self.toggle_svg.value = True
         else:
             self.toggle_svg.value = False
-        self.svg_interval.value = float(xml_root.find(".//SVG//interval").text)
+        self.svg_interval.value = float(doc.find(".//SVG//interval").text)
 
         # if xml_root.find(".//initial_conditions//cell_positions").attrib["enabled"].lower() == 'true':
-        uep = xml_root.find(".//initial_conditions//cell_positions")
+        uep = doc.find(".//initial_conditions//cell_positions")
         if uep:
             if uep.attrib["enabled"].lower() == 'true':
                 self.toggle_cells_csv.value = True
             else:
                 self.toggle_cells_csv.value = False
 
-            self.toggle_cells_csv.description = xml_root.find(".//initial_conditions//cell_positions//filename").text
+            self.toggle_cells_csv.description = doc.find(".//initial_conditions//cell_positions//filename").text
 
 
     # Read values from the GUI widgets and generate/write a new XML
     def fill_xml(self, xml_root):
         # print('config.py fill_xml() !!!!!')
+        doc = config_doc(xml_root)
         # TODO: verify template .xml file exists!
 
         # TODO: verify valid type (numeric) and range?
-        xml_root.find(".//x_min").text = str(self.xmin.value)
-        xml_root.find(".//x_max").text = str(self.xmax.value)
-        xml_root.find(".//dx").text = str(self.xdelta.value)
-        xml_root.find(".//y_min").text = str(self.ymin.value)
-        xml_root.find(".//y_max").text = str(self.ymax.value)
-        xml_root.find(".//dy").text = str(self.ydelta.value)
-        xml_root.find(".//z_min").text = str(self.zmin.value)
-        xml_root.find(".//z_max").text = str(self.zmax.value)
-        xml_root.find(".//dz").text = str(self.zdelta.value)
+        doc.find(".//x_min").text = str(self.xmin.value)
+        doc.find(".//x_max").text = str(self.xmax.value)
+        doc.find(".//dx").text = str(self.xdelta.value)
+        doc.find(".//y_min").text = str(self.ymin.value)
+        doc.find(".//y_max").text = str(self.ymax.value)
+        doc.find(".//dy").text = str(self.ydelta.value)
+        doc.find(".//z_min").text = str(self.zmin.value)
+        doc.find(".//z_max").text = str(self.zmax.value)
+        doc.find(".//dz").text = str(self.zdelta.value)
 
-        if xml_root.find(".//options//virtual_wall_at_domain_edge"):
-            xml_root.find(".//options//virtual_wall_at_domain_edge").text = str(self.toggle_virtual_walls.value).lower()
+        if doc.find(".//options//virtual_wall_at_domain_edge"):
+            doc.find(".//options//virtual_wall_at_domain_edge").text = str(self.toggle_virtual_walls.value).lower()
 
-        xml_root.find(".//max_time").text = str(self.tmax.value)
+        doc.find(".//max_time").text = str(self.tmax.value)
 
-        xml_root.find(".//omp_num_threads").text = str(self.omp_threads.value)
+        doc.find(".//omp_num_threads").text = str(self.omp_threads.value)
 
-        xml_root.find(".//SVG").find(".//enable").text = str(self.toggle_svg.value)
-        xml_root.find(".//SVG").find(".//interval").text = str(self.svg_interval.value)
-        xml_root.find(".//full_data").find(".//enable").text = str(self.toggle_mcds.value)
-        xml_root.find(".//full_data").find(".//interval").text = str(self.mcds_interval.value)
+        doc.find(".//SVG//enable").text = str(self.toggle_svg.value)
+        doc.find(".//SVG//interval").text = str(self.svg_interval.value)
+        doc.find(".//full_data//enable").text = str(self.toggle_mcds.value)
+        doc.find(".//full_data//interval").text = str(self.mcds_interval.value)
 
 # uep.find('.//cell_definition[1]//phenotype//mechanics//options//set_absolute_equilibrium_distance').attrib['enabled'] = str(self.bool1.value)
         # xml_root.find(".//initial_conditions//cell_positions").attrib["enabled"] = str(self.toggle_cells_csv.value)
-        uep = xml_root.find(".//initial_conditions//cell_positions")
+        uep = doc.find(".//initial_conditions//cell_positions")
         if uep:
             uep.attrib["enabled"] = str(self.toggle_cells_csv.value)
 
@@ -0,0 +1,160 @@
+# An indexed config (.xml) document, for the tabs' fill_gui()/fill_xml()
+#
+# Each xml_root.find('.//x_min') walks the whole tree, and the tabs (including the generated UserTab,
+# MicroenvTab and CellTypesTab) do hundreds of them per load/save. A ConfigDoc indexes the tree in one
+# pass: the elements by tag (in document order), with each one's parent, its position among its
+# same-tag siblings, and the extent of its subtree. A find() then goes through the path a step at a time,
+# looking only at the elements with the step's tag within the subtrees matched so far (by bisecting):
+#   doc.find('.//x_min')                           # from the root
+#   doc.find('.//boundary_value[2]', vp[0])        # from an element, i.e., vp[0].find(...)
+#   doc.findall('variable', uep)
+# Paths are ElementTree's: steps separated by '/' or '//', each a tag with an optional [N], [@attr] or
+# [@attr='value'] predicate. Anything else (e.g., '*', '..', [tag]) is passed on to ElementTree.
+# findall() returns elements in document order (ElementTree's order differs for nested same-tag elements).
+# The index is of the tree's structure: changing texts and attributes (as fill_xml does) is fine, but
+# adding or removing elements needs a new ConfigDoc.
+
+import re
+import bisect
+import xml.etree.ElementTree as ET
+
+_step_re = re.compile(r"^([\w.\-]+)(?:\[(?:(\d+)|@([\w.\-]+)(?:=(?:'([^']*)'|\"([^\"]*)\"))?)\])?$")
+
+
+def _parse_path(path):
+    """[(descendant?, tag, predicate), ...], or None if it's not a path we index"""
+    if path.startswith('.//'):
+        rest, descendant = path[3:], True
+    elif path.startswith('./'):
+        rest, descendant = path[2:], False
+    elif path.startswith('/'):
+        return None
+    else:
+        rest, descendant = path, False
+    steps = []
+    for part in rest.split('/'):
+        if part == '':   # (the 2nd '/' of a '//')
+            if descendant:
+                return None
+            descendant = True
+            continue
+        m = _step_re.match(part)
+        if not m:
+            return None
+        tag, pos, attr, val1, val2 = m.groups()
+        if pos is not None:
+            pred = ('pos', int(pos))
+        elif attr is not None:
+            pred = ('attr', attr, val1 if val1 is not None else val2)
+        else:
+            pred = None
+        steps.append((descendant, tag, pred))
+        descendant = False
+    return steps if steps and not descendant else None
+
+
+def config_doc(xml_root):
+    """A ConfigDoc for xml_root (an Element or ElementTree), or xml_root if it's one already"""
+    return xml_root if isinstance(xml_root, ConfigDoc) else ConfigDoc(xml_root)
+
+
+class ConfigDoc(object):
+
+    def __init__(self, tree):
+        self.tree = tree if isinstance(tree, ET.ElementTree) else ET.ElementTree(tree)
+        self.root = self.tree.getroot()
+        self.by_tag = {}      # tag -> [element, ...] in document order
+        self.orders = {}      # tag -> [their order, ...] (for bisect)
+        self.info = {}        # id(element) -> [order, last order in its subtree, parent, position among same-tag siblings]
+        self._cache = {}      # (path, id(start)) -> [element, ...]
+        self._index()
+
+    @classmethod
+    def parse(cls, fname):
+        return cls(ET.parse(fname))
+
+    def getroot(self):
+        return self.root
+
+    def write(self, *args, **kwargs):
+        self.tree.write(*args, **kwargs)
+
+    def _index(self):
+        order = 0
+        self.info[id(self.root)] = [0, 0, None, 1]
+        stack = [(self.root, iter(self.root), {})]   # (element, its remaining children, # of them by tag so far)
+        while stack:
+            parent, children, counts = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                self.info[id(parent)][1] = order
+                continue
+            if not isinstance(child.tag, str):   # (comments, processing instructions)
+                continue
+            order += 1
+            counts[child.tag] = counts.get(child.tag, 0) + 1
+            self.info[id(child)] = [order, order, parent, counts[child.tag]]
+            self.by_tag.setdefault(child.tag, []).append(child)
+            self.orders.setdefault(child.tag, []).append(order)
+            stack.append((child, iter(child), {}))
+
+    #-------------------------
+    def _matches(self, elm, step):
+        descendant, tag, pred = step
+        if elm.tag != tag:
+            return False
+        if pred is None:
+            return True
+        if pred[0] == 'pos':
+            return self.info[id(elm)][3] == pred[1]
+        return elm.get(pred[1]) is not None if pred[2] is None else elm.get(pred[1]) == pred[2]
+
+    def _step(self, contexts, step):
+        """The elements matching step from any of contexts (in document order)"""
+        descendant, tag, pred = step
+        elms, orders = self.by_tag.get(tag, []), self.orders.get(tag, [])
+        found, seen = [], set()
+        for ctx in contexts:
+            lo, hi = self.info[id(ctx)][:2]
+            for k in range(bisect.bisect_right(orders, lo), bisect.bisect_right(orders, hi)):
+                elm = elms[k]
+                if id(elm) in seen or not (descendant or self.info[id(elm)][2] is ctx):
+                    continue
+                if self._matches(elm, step):
+                    seen.add(id(elm))
+                    found.append(elm)
+        if len(contexts) > 1:   # (their subtrees may overlap)
+            found.sort(key=lambda elm: self.info[id(elm)][0])
+        return found
+
+    def _search(self, path, start):
+        key = (path, id(start))
+        if key in self._cache:
+            return self._cache[key]
+        steps = _parse_path(path)
+        if steps is None or id(start) not in self.info:
+            found = start.findall(path)
+        else:
+            found = [start]
+            for step in steps:
+                found = self._step(found, step)
+                if not found:
+                    break
+        self._cache[key] = found
+        return found
+
+    def find(self, path, start=None):
+        """The first element matching path, from start (default: the root), or None; like start.find(path)"""
+        found = self._search(path, self.root if start is None else start)
+        return found[0] if found else None
+
+    def findall(self, path, start=None):
+        return list(self._search(path, self.root if start is None else start))
+
+    def iterfind(self, path, start=None):
+        return iter(self.findall(path, start))
+
+    def findtext(self, path, default=None, start=None):
+        elm = self.find(path, start)
+        return default if elm is None else (elm.text or '')
@@ -0,0 +1,91 @@
+# Content hashes of configs, to find a cached run with the same inputs
+#
+# A config's hash is taken over a canonical form of its XML: whitespace is collapsed, numbers are
+# normalized (so "1e5", "100000" and "100000.0" hash the same), booleans are lowercased and
+# attributes sorted. Settings that don't change the results (the output folder, # of threads) are
+# left out. The hash also covers the executable, so a rebuilt myproj doesn't reuse old results.
+#
+# A run that finished has its hash in <run dir>/.config_hash.
+
+import os
+import hashlib
+import xml.etree.ElementTree as ET
+
+hash_file_name = '.config_hash'
+ignored_paths = ['save/folder', 'parallel/omp_num_threads']
+
+_executable_ids = {}
+
+
+def _normalize(text):
+    if text is None:
+        return ''
+    text = ' '.join(text.split())
+    if text.lower() in ('true', 'false'):
+        return text.lower()
+    try:
+        return repr(float(text))
+    except ValueError:
+        return text
+
+
+def canonical_config(xml_root):
+    """The config as a str, one line per element: path, sorted attributes, normalized text"""
+    lines = []
+    def walk(elem, path):
+        path = path + '/' + elem.tag if path else elem.tag
+        if any(path.endswith(p) for p in ignored_paths):
+            return
+        attrs = ','.join('%s=%s' % (k, _normalize(v)) for k,v in sorted(elem.attrib.items()))
+        lines.append('%s[%s]=%s' % (path, attrs, _normalize(elem.text)))
+        for child in elem:
+            walk(child, path)
+    walk(xml_root, '')
+    return '\n'.join(lines)
+
+
+def executable_id(executable):
+    """sha256 of the executable's contents (remembered while its mtime and size don't change)"""
+    try:
+        st = os.stat(executable)
+    except OSError:
+        return 'none'
+    key = (executable, st.st_mtime_ns, st.st_size)
+    if key not in _executable_ids:
+        h = hashlib.sha256()
+        with open(executable, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        _executable_ids[key] = h.hexdigest()
+    return _executable_ids[key]
+
+
+def config_hash(xml_root, executable):
+    h = hashlib.sha256(canonical_config(xml_root).encode())
+    h.update(executable_id(executable).encode())
+    return h.hexdigest()
+
+
+def config_file_hash(config_file, executable):
+    return config_hash(ET.parse(config_file).getroot(), executable)
+
+
+def record_config_hash(rdir, executable, h=None):
+    """Mark the (finished) run in rdir with its config's hash (h, if it's known); returns the hash, or None"""
+    try:
+        if h is None:
+            h = config_file_hash(os.path.join(rdir, 'config.xml'), executable)
+        with open(os.path.join(rdir, hash_file_name), 'w') as f:
+            f.write(h)
+        return h
+    except (OSError, ET.ParseError):
+        return None
+
+
+def read_config_hash(rdir):
+    try:
+        with open(os.path.join(rdir, hash_file_name)) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
@@ -0,0 +1,187 @@
+# Per-field statistics of a run's substrates, for the Plots tab's colormap ranges
+#
+# Each output%08d_microenvironment0.mat is reduced once (min, max and percentiles of every substrate),
+# on a thread pool, and the results are appended to <run dir>/.fields/stats.jsonl (a line per frame, the
+# last one for a frame winning; the totals are recomputed on loading). Later updates (e.g., as
+# a live run writes new frames) are given the .mat names from the run's FrameIndex, and only stat and
+# reduce the ones they haven't seen (all of them are checked once, in case they changed since saved).
+# Frames whose files are gone (e.g., a reused run dir) are dropped.
+
+import os
+import glob
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from mat_files import read_mat_header, read_mat_rows
+from field_store import store_dir_name, num_mesh_rows
+
+percentiles = [1, 50, 99]
+
+
+def frame_stats(fname):
+    """min, max and percentiles of each substrate in one microenvironment .mat"""
+    header = read_mat_header(fname)
+    nrows = header[1] if header is not None else read_mat_rows(fname, slice(None)).shape[0]
+    fields = read_mat_rows(fname, list(range(num_mesh_rows, nrows)))
+    pcts = np.percentile(fields, percentiles, axis=1)
+    stats = {'min': fields.min(axis=1).tolist(), 'max': fields.max(axis=1).tolist()}
+    for p, vals in zip(percentiles, pcts):
+        stats['p%d' % p] = vals.tolist()
+    return stats
+
+
+class FieldStats(object):
+
+    def __init__(self, output_dir, workers=4):
+        self.output_dir = output_dir
+        self.workers = workers
+        self.stats_file = os.path.join(output_dir, store_dir_name, 'stats.jsonl')
+        self.frames = {}   # .mat name -> frame_stats() + its mtime and size
+        self.totals = {}   # over all frames: min, max, and the lowest/highest of each percentile
+        self._lock = threading.Lock()
+        self._thread = None
+        self._again = False
+        self._names = None
+        self.checked = False   # have the saved frames' files been checked (this session)?
+        # {"name": ..., "stats": {...} or null (gone)} lines
+        num_lines, torn = 0, False
+        try:
+            with open(self.stats_file) as f:
+                for line in f:
+                    num_lines += 1
+                    torn = not line.endswith('\n')
+                    try:
+                        rec = json.loads(line)
+                        if rec['stats'] is None:
+                            self.frames.pop(rec['name'], None)
+                        else:
+                            self.frames[rec['name']] = rec['stats']
+                    except (ValueError, KeyError, TypeError):   # (e.g., a line cut short by a crash)
+                        pass
+        except OSError:
+            pass
+        self.totals = self._totals()
+        # mostly superseded lines, or a last line cut short (the next one would be appended to it); compact it
+        if torn or num_lines > 2 * len(self.frames) + 100:
+            self._compact()
+
+    def update(self, names=None):
+        """Reduce the frames that are new (or changed) since the last update; returns True if anything changed.
+        names: the .mat names (e.g., from FrameIndex.mat_names()), else the dir is globbed."""
+        if names is None:
+            names = [os.path.basename(fname) for fname in glob.glob(os.path.join(self.output_dir, 'output*_microenvironment0.mat'))]
+        names = set(names)
+        with self._lock:
+            gone = [name for name in self.frames if name not in names]
+        candidates = names if not self.checked else [name for name in names if name not in self.frames]
+        todo = []
+        for name in sorted(candidates):
+            fname = os.path.join(self.output_dir, name)
+            try:
+                st = os.stat(fname)
+            except OSError:
+                gone.append(name)
+                continue
+            entry = self.frames.get(name)
+            if not entry or entry['mtime_ns'] != st.st_mtime_ns or entry['size'] != st.st_size:
+                todo.append((fname, st))
+        self.checked = True
+        if not todo and not gone:
+            return False
+
+        def reduce(item):
+            fname, st = item
+            try:
+                stats = frame_stats(fname)
+            except (OSError, ValueError):   # e.g., still being written
+                return None
+            stats.update(mtime_ns=st.st_mtime_ns, size=st.st_size)
+            return os.path.basename(fname), stats
+
+        results = []
+        if todo:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                results = [r for r in pool.map(reduce, todo) if r is not None]
+        if not results and not gone:
+            return False
+
+        with self._lock:
+            replaced = bool(gone) or any(name in self.frames for name, stats in results)
+            for name in gone:
+                self.frames.pop(name, None)
+            for name, stats in results:
+                self.frames[name] = stats
+            if replaced:   # (a frame's stats can't be taken out of the totals)
+                self.totals = self._totals()
+            else:
+                self.totals = self._totals([stats for name, stats in results], self.totals)
+            self._append([{'name': name, 'stats': None} for name in gone] +
+                         [{'name': name, 'stats': stats} for name, stats in results])
+        return True
+
+    def _totals(self, frames=None, totals=None):
+        """The totals over frames (default: all of them), merged into totals if given"""
+        frames = list(self.frames.values()) if frames is None else list(frames)
+        if totals:   # (as a frame's stats)
+            frames.append({'min': totals['min'], 'max': totals['max'],
+                           **{'p%d' % p: totals['p%d' % p][0] for p in percentiles}})
+            frames.append({'min': totals['min'], 'max': totals['max'],
+                           **{'p%d' % p: totals['p%d' % p][1] for p in percentiles}})
+        if not frames:
+            return {}
+        totals = {'min': np.min([f['min'] for f in frames], axis=0).tolist(),
+                  'max': np.max([f['max'] for f in frames], axis=0).tolist()}
+        for p in percentiles:
+            vals = [f['p%d' % p] for f in frames]
+            totals['p%d' % p] = [np.min(vals, axis=0).tolist(), np.max(vals, axis=0).tolist()]
+        return totals
+
+    def _append(self, records):
+        try:
+            os.makedirs(os.path.dirname(self.stats_file), exist_ok=True)
+            with open(self.stats_file, 'a') as f:
+                f.write(''.join(json.dumps(rec) + '\n' for rec in records))
+        except OSError:   # e.g., a read-only (shared) run directory; keep them in memory
+            pass
+
+    def _compact(self):
+        try:
+            with open(self.stats_file + '.tmp', 'w') as f:
+                for name, stats in self.frames.items():
+                    f.write(json.dumps({'name': name, 'stats': stats}) + '\n')
+            os.replace(self.stats_file + '.tmp', self.stats_file)
+        except OSError:
+            pass
+
+    def update_in_background(self, names=None, done=None):
+        """update(names) on a thread; done(self) is called (on that thread) if anything changed.
+        Calls made while one is running are folded into a single rerun, with the latest names."""
+        with self._lock:
+            self._names = names
+            if self._thread is not None and self._thread.is_alive():
+                self._again = True
+                return
+            def work():
+                while True:
+                    with self._lock:
+                        names = self._names
+                    try:
+                        changed = self.update(names)
+                    except OSError:
+                        changed = False
+                    if changed and done is not None:
+                        done(self)
+                    with self._lock:
+                        if not self._again:
+                            self._thread = None
+                            return
+                        self._again = False
+            self._thread = threading.Thread(target=work, name='field_stats', daemon=True)
+            self._thread.start()
+
+    def global_range(self, field_idx):
+        """(min, max) of substrate field_idx (0 = the first) over all frames so far, or None."""
+        if not self.totals or field_idx >= len(self.totals['min']):
+            return None
+        return self.totals['min'][field_idx], self.totals['max'][field_idx]
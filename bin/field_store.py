@@ -0,0 +1,139 @@
+# Consolidated substrate fields of a finished run
+#
+# Optionally (see consolidate_fields_flag in tool4nanobio.py), after a run all of its
+# output%08d_microenvironment0.mat files are packed into one memory-mappable float32 array (half the
+# size of the .mat data), laid out (frame, field, voxel), in <run dir>/.fields/:
+#   fields.npy     - the substrate rows of every frame's .mat (rows 4, 5, ... of the .mat)
+#   mesh.npy       - the mesh rows (x, y, z, voxel volume), the same for every frame
+#   times.npy      - current_time (mins) of each frame, from output%08d.xml
+#   manifest.json  - the # of frames it was built from, and the last .mat's name, mtime and size
+# Each frame is a contiguous block, written one at a time, so building it never holds more than a frame in memory.
+# The frames are those of the run's FrameIndex, which is also what an existing store is checked against.
+
+import os
+import json
+import threading
+import xml.etree.ElementTree as ET
+import numpy as np
+from mat_files import read_mat_header, read_mat_rows
+from frame_index import read_current_time, frame_index
+
+store_dir_name = '.fields'
+num_mesh_rows = 4   # rows of the microenvironment .mat before the substrates
+
+
+def _mat_names(output_dir):
+    return sorted(frame_index(output_dir).mat_names())
+
+
+def _file_entry(fname):
+    st = os.stat(fname)
+    return {'name': os.path.basename(fname), 'mtime_ns': st.st_mtime_ns, 'size': st.st_size}
+
+
+def consolidate_fields(output_dir):
+    """Pack a run's microenvironment .mat files into its field store; returns the FieldStore (None if no frames).
+
+    Does nothing if the store is already up to date.
+    """
+    store = FieldStore.open(output_dir)
+    if store is not None:
+        return store
+
+    frame_index(output_dir).refresh()
+    names = _mat_names(output_dir)
+    if not names:
+        return None
+    # the store is indexed by frame #, so the frames have to be all there
+    if names != ["output%08d_microenvironment0.mat" % k for k in range(len(names))]:
+        return None
+    fnames = [os.path.join(output_dir, name) for name in names]
+    header = read_mat_header(fnames[0])
+    if header is not None:
+        nrows, nvoxels = header[1], header[2]
+    else:   # compressed; read it to get the shape
+        nrows, nvoxels = read_mat_rows(fnames[0], slice(None)).shape
+    field_rows = list(range(num_mesh_rows, nrows))
+
+    store_dir = os.path.join(output_dir, store_dir_name)
+    os.makedirs(store_dir, exist_ok=True)
+    fields_file = os.path.join(store_dir, 'fields.npy')
+    fields = np.lib.format.open_memmap(fields_file + '.tmp', mode='w+', dtype=np.float32,
+                                       shape=(len(fnames), len(field_rows), nvoxels))
+    times = np.zeros(len(fnames))
+    for frame, fname in enumerate(fnames):
+        fields[frame] = read_mat_rows(fname, field_rows)
+        xml_fname = fname.replace('_microenvironment0.mat', '.xml')
+        try:
+            times[frame] = read_current_time(xml_fname)
+        except (OSError, ET.ParseError, TypeError):
+            times[frame] = np.nan
+    fields.flush()
+    del fields
+
+    with open(os.path.join(store_dir, 'mesh.npy'), 'wb') as f:
+        np.save(f, read_mat_rows(fnames[0], list(range(num_mesh_rows))))
+    with open(os.path.join(store_dir, 'times.npy'), 'wb') as f:
+        np.save(f, times)
+    os.replace(fields_file + '.tmp', fields_file)
+    # the manifest goes last: its presence means the store is complete
+    manifest_file = os.path.join(store_dir, 'manifest.json')
+    with open(manifest_file + '.tmp', 'w') as f:
+        json.dump({'num_frames': len(fnames), 'last': _file_entry(fnames[-1])}, f)
+    os.replace(manifest_file + '.tmp', manifest_file)
+    return FieldStore.open(output_dir)
+
+
+def consolidate_in_background(output_dir, done=None):
+    """Run consolidate_fields on a thread; done(store) is called when it's finished."""
+    def work():
+        try:
+            store = consolidate_fields(output_dir)
+        except (OSError, ValueError):   # e.g., a read-only run dir or a truncated .mat
+            return
+        if done is not None:
+            done(store)
+    thread = threading.Thread(target=work, name='consolidate_fields', daemon=True)
+    thread.start()
+    return thread
+
+
+class FieldStore(object):
+    """A run's consolidated substrate fields; field_index arguments are rows of the .mat (4 = first substrate)."""
+
+    def __init__(self, store_dir):
+        self.dir = store_dir
+        self.fields = np.load(os.path.join(store_dir, 'fields.npy'), mmap_mode='r')
+        self.mesh_rows = np.load(os.path.join(store_dir, 'mesh.npy'))
+        self.times = np.load(os.path.join(store_dir, 'times.npy'))
+
+    @classmethod
+    def open(cls, output_dir):
+        """The run's store, or None if there isn't one or its frames have changed since it was built
+        (by their count in the run's FrameIndex, and the last one's file)."""
+        store_dir = os.path.join(output_dir, store_dir_name)
+        try:
+            with open(os.path.join(store_dir, 'manifest.json')) as f:
+                manifest = json.load(f)
+            names = _mat_names(output_dir)
+            if len(names) != manifest['num_frames'] or names[-1] != manifest['last']['name'] or \
+                    _file_entry(os.path.join(output_dir, names[-1])) != manifest['last']:
+                return None
+            return cls(store_dir)
+        except (OSError, ValueError, KeyError, IndexError):
+            return None
+
+    @property
+    def num_frames(self):
+        return self.fields.shape[0]
+
+    def field(self, frame, field_index):
+        return self.fields[frame, field_index - num_mesh_rows]
+
+    def mesh(self):
+        """x and y of each voxel."""
+        return self.mesh_rows[0], self.mesh_rows[1]
+
+    def time_series(self, field_index, voxel):
+        """(times, values) of one field at one voxel, across all frames."""
+        return self.times, np.asarray(self.fields[:, field_index - num_mesh_rows, voxel])
@@ -0,0 +1,129 @@
+# Frame cache for the Plots tab
+#
+# Parsed output frames (cells, substrate fields, current_time) are kept in a bounded LRU cache,
+# so scrubbing back and forth with the frame slider doesn't re-read the same files (often from NFS).
+# Entries are keyed by (output_dir, frame, tag, file mtime) and evicted by total size in bytes.
+# A FramePrefetcher fills the cache with the neighboring frames in the background.
+
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+
+def sizeof(value):
+    """Rough size (bytes) of a cached value: the NumPy arrays it holds, plus a little overhead."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return 64 + sum(sizeof(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return 64 + sum(sizeof(v) for v in value)
+    if hasattr(value, '__dict__'):
+        return 64 + sum(sizeof(v) for v in vars(value).values())
+    return 64
+
+
+class FrameCache(object):
+
+    def __init__(self, max_bytes=512*1024*1024):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries = OrderedDict()   # key -> (value, nbytes), least recently used first
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def get(self, output_dir, frame, tag, fname, loader):
+        """Return loader(fname) for this frame, from the cache if the file hasn't changed.
+
+        tag distinguishes the kinds of data for a frame, e.g. 'cells' or 'substrate'.
+        Raises OSError if fname doesn't exist.
+        """
+        mtime = os.stat(fname).st_mtime_ns
+        key = (output_dir, frame, tag, mtime)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key][0]
+
+        value = loader(fname)
+        self.put(key, value)
+        return value
+
+    def put(self, key, value):
+        nbytes = sizeof(value)
+        if nbytes > self.max_bytes:   # would evict everything else; don't bother
+            return
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                _, (_, old_nbytes) = self._entries.popitem(last=False)
+                self.nbytes -= old_nbytes
+
+
+class FramePrefetcher(object):
+    """Load the frames around the current one (N+1, N-1, N+2, ...) into the frame cache on a thread pool.
+
+    load_frame(frame) does the actual loading; it should swallow its own errors (e.g., missing files).
+    Each call to prefetch() reprioritizes: queued loads are cancelled and resubmitted nearest-first
+    around the new frame, so a slider jump doesn't wait behind stale work.
+    """
+
+    def __init__(self, load_frame, depth=3, workers=2):
+        self.load_frame = load_frame
+        self.depth = depth
+        self.workers = workers
+        self._pool = None
+        self._futures = {}   # frame -> Future
+        self._lock = threading.Lock()
+
+    def configure(self, depth=None, workers=None):
+        if depth is not None:
+            self.depth = depth
+        if workers is not None and workers != self.workers:
+            self.workers = workers
+            self.shutdown()   # a new pool with the new size is created on the next prefetch()
+
+    def prefetch(self, frame, max_frame):
+        if self.depth <= 0 or self.workers <= 0:
+            return
+        wanted = []
+        for k in range(1, self.depth + 1):
+            for f in (frame + k, frame - k):
+                if 0 <= f <= max_frame:
+                    wanted.append(f)
+
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='prefetch')
+            # drop everything still queued; whatever is already running is left to finish
+            for f, future in list(self._futures.items()):
+                if future.done() or future.cancel():
+                    del self._futures[f]
+            for f in wanted:
+                if f not in self._futures:
+                    self._futures[f] = self._pool.submit(self.load_frame, f)
+
+    def cancel(self):
+        with self._lock:
+            for future in self._futures.values():
+                future.cancel()
+            self._futures.clear()
+
+    def shutdown(self):
+        self.cancel()
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+                self._pool = None
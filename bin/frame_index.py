@@ -0,0 +1,242 @@
+# Index of a run's output frames
+#
+# Maps each output # to its simulation time and files (output%08d.xml, _microenvironment0.mat,
+# _cells[_physicell].mat) and each snapshot # to its .svg, so the Plots tab doesn't have to glob the
+# directory and fully parse an .xml per frame. current_time is read with iterparse, stopping as soon
+# as it's found. The index is saved in <run dir>/.frame_index.jsonl and extended as new files appear:
+# after one full directory scan, advance() only checks for the next expected file names, and appends
+# a line per new (or changed) frame, the last one for a frame winning (like svg_cells.CellStore's index).
+
+import os
+import re
+import json
+import threading
+import xml.etree.ElementTree as ET
+
+index_file_name = '.frame_index.jsonl'
+_output_re = re.compile(r'^output(\d{8})(\.xml|_microenvironment0\.mat|_cells_physicell\.mat|_cells\.mat)$')
+_snapshot_re = re.compile(r'^snapshot(\d{8})\.svg$')
+
+
+def read_current_time(xml_fname):
+    """current_time (mins) from a PhysiCell output%08d.xml, without parsing the rest of it"""
+    for event, elem in ET.iterparse(xml_fname, events=('end',)):
+        if elem.tag == 'current_time':
+            return float(elem.text)
+    return None
+
+
+class FrameIndex(object):
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.index_file = os.path.join(output_dir, index_file_name)
+        self.outputs = {}     # output # -> {'time', 'mtime_ns' (of the .xml), 'xml', 'mat', 'cells'}
+        self.snapshots = {}   # snapshot # -> .svg name
+        self.scanned = False  # has refresh() listed the directory yet (this session)?
+        self._lock = threading.Lock()
+        # {"output": k, "entry": {...} or null} and {"snapshot": k, "name": ... or null} lines
+        num_lines, torn = 0, False
+        try:
+            with open(self.index_file) as f:
+                for line in f:
+                    num_lines += 1
+                    torn = not line.endswith('\n')
+                    try:
+                        rec = json.loads(line)
+                        if 'output' in rec:
+                            self._set(self.outputs, rec['output'], rec['entry'])
+                        else:
+                            self._set(self.snapshots, rec['snapshot'], rec['name'])
+                    except (ValueError, KeyError, TypeError):   # (e.g., a line cut short by a crash)
+                        pass
+        except OSError:
+            pass
+        # mostly superseded lines, or a last line cut short (the next one would be appended to it); compact it
+        if torn or num_lines > 2 * (len(self.outputs) + len(self.snapshots)) + 100:
+            self._compact()
+
+    @staticmethod
+    def _set(d, k, value):
+        if value is None:
+            d.pop(int(k), None)
+        else:
+            d[int(k)] = value
+
+    def refresh(self):
+        """Add any new files (and re-read the times of rewritten .xml); returns True if anything changed."""
+        changed = False
+        try:
+            entries = list(os.scandir(self.output_dir))
+        except OSError:
+            return False
+        with self._lock:
+            for e in entries:
+                m = _snapshot_re.match(e.name)
+                if m:
+                    k = int(m.group(1))
+                    if self.snapshots.get(k) != e.name:
+                        self.snapshots[k] = e.name
+                        changed = True
+                    continue
+                m = _output_re.match(e.name)
+                if m:
+                    changed |= self._add_output(int(m.group(1)), m.group(2), e.name, e)
+
+            # forget files that are gone, e.g. when a run dir is reused for a new run
+            names = set(e.name for e in entries)
+            for k in [k for k,name in self.snapshots.items() if name not in names]:
+                del self.snapshots[k]
+                changed = True
+            for k, entry in list(self.outputs.items()):
+                for key in ['xml', 'mat', 'cells']:
+                    if entry[key] and entry[key] not in names:
+                        entry[key] = None
+                        changed = True
+                if entry['xml'] is None:
+                    entry['time'] = entry['mtime_ns'] = None
+                if not (entry['xml'] or entry['mat'] or entry['cells']):
+                    del self.outputs[k]
+            if changed:   # (a full scan; rewrite the index rather than append to it)
+                self._compact()
+            self.scanned = True
+        return changed
+
+    def advance(self):
+        """Pick up frames written since the last call, checking just the next expected file names,
+        i.e. O(1) per new frame instead of listing the directory. Returns True if there were any.
+
+        Falls back to a full refresh() the first time, or if the newest known file is gone (e.g., a reused run dir).
+        """
+        with self._lock:
+            last_svg = self.snapshots.get(max(self.snapshots)) if self.snapshots else None
+            rescan = not self.scanned or (last_svg and not os.path.isfile(os.path.join(self.output_dir, last_svg)))
+        if rescan:
+            return self.refresh()
+
+        records = []
+        with self._lock:
+            k = max(self.snapshots) + 1 if self.snapshots else 0
+            while True:
+                name = "snapshot%08d.svg" % k
+                if not os.path.isfile(os.path.join(self.output_dir, name)):
+                    break
+                self.snapshots[k] = name
+                records.append({'snapshot': k, 'name': name})
+                k += 1
+
+            xml_frames = [k for k,entry in self.outputs.items() if entry['xml']]
+            k = max(xml_frames) + 1 if xml_frames else 0
+            while True:
+                if self._find_output(k):
+                    records.append({'output': k, 'entry': self.outputs[k]})
+                if not self.outputs.get(k, {}).get('xml'):   # not there (or not finished) yet
+                    break
+                k += 1
+            self._append(records)
+        return bool(records)
+
+    def _find_output(self, k):
+        """Look for output # k's files; returns True if its entry changed"""
+        changed = False
+        for suffix in ['.xml', '_microenvironment0.mat', '_cells_physicell.mat', '_cells.mat']:
+            name = "output%08d%s" % (k, suffix)
+            if os.path.isfile(os.path.join(self.output_dir, name)):
+                changed |= self._add_output(k, suffix, name)
+        return changed
+
+    def _add_output(self, k, suffix, name, st=None):
+        entry = self.outputs.setdefault(k, {'time': None, 'mtime_ns': None, 'xml': None, 'mat': None, 'cells': None})
+        if suffix == '.xml':
+            mtime = (st.stat() if hasattr(st, 'stat') else os.stat(os.path.join(self.output_dir, name))).st_mtime_ns
+            if entry['xml'] == name and entry['mtime_ns'] == mtime:
+                return False
+            try:
+                entry['time'] = read_current_time(os.path.join(self.output_dir, name))
+            except (OSError, ET.ParseError):   # still being written; try again next time
+                return False
+            entry['xml'], entry['mtime_ns'] = name, mtime
+            return True
+        key = 'mat' if suffix == '_microenvironment0.mat' else 'cells'
+        if key == 'cells' and entry['cells'] and entry['cells'].endswith('_cells_physicell.mat'):
+            return False   # older PhysiCell writes both; _cells.mat is then "basic_agents"
+        if entry[key] == name:
+            return False
+        entry[key] = name
+        return True
+
+    def _append(self, records):
+        if not records:
+            return
+        try:
+            with open(self.index_file, 'a') as f:
+                f.write(''.join(json.dumps(rec) + '\n' for rec in records))
+        except OSError:   # e.g., a read-only (shared) run directory
+            pass
+
+    def _compact(self):
+        try:
+            with open(self.index_file + '.tmp', 'w') as f:
+                for k, name in sorted(self.snapshots.items()):
+                    f.write(json.dumps({'snapshot': k, 'name': name}) + '\n')
+                for k, entry in sorted(self.outputs.items()):
+                    f.write(json.dumps({'output': k, 'entry': entry}) + '\n')
+            os.replace(self.index_file + '.tmp', self.index_file)
+        except OSError:
+            pass
+
+    def output(self, k):
+        """The entry for output # k; looks for its files if they weren't there at the last refresh()."""
+        with self._lock:
+            entry = self.outputs.get(k)
+            if entry is None or entry['time'] is None or entry['mat'] is None:
+                if self._find_output(k):
+                    self._append([{'output': k, 'entry': self.outputs[k]}])
+                entry = self.outputs.get(k)
+            return entry
+
+    def time(self, k):
+        entry = self.output(k)
+        return entry['time'] if entry else None
+
+    def path(self, k, key):
+        """Full path of output # k's 'xml', 'mat' or 'cells' file, or None"""
+        entry = self.output(k)
+        if entry and entry[key]:
+            return os.path.join(self.output_dir, entry[key])
+        return None
+
+    def svg_path(self, k):
+        name = self.snapshots.get(k)
+        return os.path.join(self.output_dir, name) if name else None
+
+    def mat_names(self):
+        """The names of the microenvironment .mat files indexed so far (no file system access)"""
+        with self._lock:
+            return [entry['mat'] for entry in self.outputs.values() if entry['mat']]
+
+    def max_snapshot(self):
+        return max(self.snapshots) if self.snapshots else None
+
+    def max_output(self):
+        with self._lock:
+            frames = [k for k,entry in self.outputs.items() if entry['xml']]
+        return max(frames) if frames else None
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def frame_index(output_dir):
+    """The (one) FrameIndex for a run directory."""
+    output_dir = os.path.abspath(output_dir)
+    with _indexes_lock:
+        if output_dir not in _indexes:
+            _indexes[output_dir] = FrameIndex(output_dir)
+        return _indexes[output_dir]
+
+
+def forget_frame_index(output_dir):
+    """Drop the FrameIndex for a run directory, e.g. when a new run starts in it"""
+    with _indexes_lock:
+        _indexes.pop(os.path.abspath(output_dir), None)
@@ -0,0 +1,303 @@
+# A local, persistent job queue (for batch runs when there's no nanoHUB Submit)
+#
+# Jobs live in a spool dir, and move between its subdirs by (atomic) renames:
+#   queued/<job id>/    config.xml + job.json (executable, threads, limits, when submitted)
+#   running/<job id>/   the job's output is written here; job.json gets the pid of its runner
+#   done/<job id>.json  the outcome, and where the results went
+# A detached worker process ("python job_queue.py worker ...", one per spool dir, held by a lock file)
+# runs up to max_jobs at a time (re-read from settings.json, so the GUI can change it), each through a runner ("python job_queue.py run <job dir>") that sets
+# its resource limits and writes the exit status into the job dir. Finished jobs are harvested into
+# the cache dir (<cache dir>/<job id>), like any cached run, so the "Load Config" dropdown lists them.
+# Neither the jobs nor the worker belong to the notebook's kernel, so they survive it being restarted;
+# a worker (re)started later adopts the jobs that are still running, and harvests those that ended.
+
+import os
+import sys
+import json
+import time
+import shutil
+import signal
+import datetime
+import subprocess
+from ipywidgets import Layout, Label, Button, HBox, VBox, HTML, Dropdown, BoundedFloatText
+from run_dirs import localize_config
+
+job_queue_flag = True
+try:
+    import fcntl
+    import resource
+except:
+    job_queue_flag = False   # e.g., Windows
+
+states = ['queued', 'running', 'done']
+
+
+def _read_json(fname):
+    try:
+        with open(fname) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(fname, obj):
+    with open(fname + '.tmp', 'w') as f:
+        json.dump(obj, f, indent=1)
+    os.replace(fname + '.tmp', fname)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobQueue(object):
+
+    def __init__(self, spool_dir, cache_dir, max_jobs=1):
+        self.spool_dir = spool_dir
+        self.cache_dir = cache_dir    # where finished jobs go
+        self.max_jobs = max_jobs      # for a worker that we start (see set_max_jobs)
+        for state in states:
+            os.makedirs(os.path.join(spool_dir, state), exist_ok=True)
+        self.lock_file = os.path.join(spool_dir, 'worker.lock')
+
+    def set_max_jobs(self, max_jobs):
+        """How many jobs to run at a time, from now on (a running worker picks it up too)"""
+        self.max_jobs = max_jobs
+        _write_json(os.path.join(self.spool_dir, 'settings.json'), {'max_jobs': max_jobs})
+
+    def submit(self, config_file, executable, config_dir, threads=1, mem_gb=None, cpu_hours=None, nice=10,
+               config_hash=None):
+        """Queue a run of config_file (copied; relative paths in it are from config_dir); returns the job's id"""
+        job_id = 'job_' + datetime.datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        tmp = os.path.join(self.spool_dir, '.' + job_id)
+        os.makedirs(tmp)
+        shutil.copy(config_file, os.path.join(tmp, 'config.xml'))
+        localize_config(os.path.join(tmp, 'config.xml'), config_dir, threads)
+        _write_json(os.path.join(tmp, 'job.json'),
+                    {'id': job_id, 'executable': executable, 'threads': threads, 'submitted': time.time(),
+                     'config_hash': config_hash,   # (of the config as the GUI wrote it, before localize_config)
+                     'limits': {'mem_gb': mem_gb, 'cpu_hours': cpu_hours, 'nice': nice}})
+        os.rename(tmp, os.path.join(self.spool_dir, 'queued', job_id))   # (the worker only sees whole jobs)
+        self.ensure_worker()
+        return job_id
+
+    def worker_running(self):
+        with open(self.lock_file, 'a') as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return True
+            fcntl.flock(f, fcntl.LOCK_UN)
+            return False
+
+    def ensure_worker(self):
+        """Start a (detached) worker, unless one is running"""
+        if self.worker_running():
+            return
+        with open(os.path.join(self.spool_dir, 'worker.log'), 'a') as log:
+            subprocess.Popen([sys.executable, os.path.abspath(__file__), 'worker', self.spool_dir, self.cache_dir,
+                              str(self.max_jobs)], stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+                             start_new_session=True, close_fds=True)
+
+    def resume(self):
+        """Start a worker if there are jobs left queued or running, e.g. by a kernel that has since gone;
+        otherwise they'd wait for the next submit (running ones are harvested when they end)"""
+        if any(os.listdir(os.path.join(self.spool_dir, state)) for state in ['queued', 'running']):
+            self.ensure_worker()
+
+    def jobs(self):
+        """[job info, ...] with 'state' (queued, running, done), newest first"""
+        jobs = []
+        for state in ['queued', 'running']:
+            for job_id in os.listdir(os.path.join(self.spool_dir, state)):
+                info = _read_json(os.path.join(self.spool_dir, state, job_id, 'job.json'))
+                if info:
+                    info['state'] = state
+                    jobs.append(info)
+        for name in os.listdir(os.path.join(self.spool_dir, 'done')):
+            info = _read_json(os.path.join(self.spool_dir, 'done', name))
+            if info:
+                info['state'] = 'done'
+                jobs.append(info)
+        return sorted(jobs, key=lambda j: j.get('submitted', 0), reverse=True)
+
+    def cancel(self, job_id):
+        """Drop a queued job, or stop a running one (it's then harvested as 'failed')"""
+        queued = os.path.join(self.spool_dir, 'queued', job_id)
+        tmp = os.path.join(self.spool_dir, '.cancelled_' + job_id)
+        try:
+            os.rename(queued, tmp)   # (unless the worker got to it first)
+            shutil.rmtree(tmp, ignore_errors=True)
+            return True
+        except OSError:
+            pass
+        info = _read_json(os.path.join(self.spool_dir, 'running', job_id, 'job.json'))
+        if info and info.get('pid'):
+            try:
+                os.killpg(info['pid'], signal.SIGTERM)   # (the runner and myproj)
+                return True
+            except OSError:
+                pass
+        return False
+
+
+class JobQueuePanel(object):
+    """The jobs of a JobQueue (refreshed on demand), with a Cancel button, and the limits for new jobs"""
+
+    def __init__(self, queue, done_func=None):
+        self.queue = queue
+        self.done_func = done_func     # done_func(), when a refresh finds newly finished jobs
+        self.num_done = None
+        self.table = HTML('')
+        self.job = Dropdown(description='Job', layout=Layout(width='350px'))
+        refresh_button = Button(description='Refresh', icon='refresh')
+        refresh_button.on_click(lambda b: self.refresh())
+        cancel_button = Button(description='Cancel job', button_style='warning')
+        cancel_button.on_click(lambda b: self.cancel())
+        self.status = Label('')
+        # limits for the jobs submitted from now on (0: none)
+        self.mem_gb = BoundedFloatText(value=0, min=0, max=1e6, step=1, description='Memory (GB)',
+                                       layout=Layout(width='180px'), style={'description_width': 'initial'})
+        self.cpu_hours = BoundedFloatText(value=0, min=0, max=1e6, step=1, description='CPU time (hours)',
+                                          layout=Layout(width='200px'), style={'description_width': 'initial'})
+        limits = HBox([Label('Limits per job:'), self.mem_gb, self.cpu_hours])
+        self.w = VBox([HBox([refresh_button, self.job, cancel_button, self.status]), limits, self.table])
+
+    def limits(self):
+        """{'mem_gb': .., 'cpu_hours': ..} for JobQueue.submit, None for no limit"""
+        return {'mem_gb': self.mem_gb.value or None, 'cpu_hours': self.cpu_hours.value or None}
+
+    def refresh(self):
+        jobs = self.queue.jobs()
+        rows = ''.join('<tr><td>%s</td><td>%s</td><td>%s</td><td>%s</td></tr>' %
+                       (j['id'], j['state'], j.get('status', ''), j.get('path', '')) for j in jobs[:20])
+        self.table.value = '<table><tr><th>Job</th><th>State</th><th>Status</th><th>Results</th></tr>%s</table>' % rows
+        self.job.options = [j['id'] for j in jobs if j['state'] != 'done']
+        num_done = sum(1 for j in jobs if j['state'] == 'done')
+        if self.num_done is not None and num_done > self.num_done and self.done_func is not None:
+            self.done_func()
+        self.num_done = num_done
+
+    def cancel(self):
+        if self.job.value:
+            self.status.value = ('cancelled %s' if self.queue.cancel(self.job.value) else "couldn't cancel %s") % self.job.value
+            self.refresh()
+
+
+#-------------------------
+# the worker (a separate process)
+_children = []   # our runners
+
+def work(spool_dir, cache_dir, max_jobs, poll_interval=2.0, idle_exit=300):
+    lock = open(os.path.join(spool_dir, 'worker.lock'), 'a')
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return   # there's already a worker
+    queued, running = [os.path.join(spool_dir, s) for s in ['queued', 'running']]
+    idle_since = time.time()
+    while True:
+        max_jobs = (_read_json(os.path.join(spool_dir, 'settings.json')) or {}).get('max_jobs', max_jobs)
+        for p in list(_children):   # reap our runners (a zombie would look alive)
+            if p.poll() is not None:
+                _children.remove(p)
+
+        # harvest the jobs that ended (including any left by a previous worker)
+        active = 0
+        for job_id in sorted(os.listdir(running)):
+            jdir = os.path.join(running, job_id)
+            info = _read_json(os.path.join(jdir, 'job.json')) or {}
+            exit_status = _read_json(os.path.join(jdir, 'exit_status.json'))
+            if exit_status is None and not info.get('pid'):   # a worker died while starting it; start over
+                try:
+                    os.rename(jdir, os.path.join(queued, job_id))
+                except OSError:
+                    pass
+                continue
+            if exit_status is not None or not (info.get('pid') and _pid_alive(info['pid'])):
+                harvest(spool_dir, cache_dir, jdir, info, exit_status)
+            else:
+                active += 1
+
+        # start the oldest queued jobs
+        for job_id in sorted(os.listdir(queued))[:max(0, max_jobs - active)]:
+            jdir = os.path.join(running, job_id)
+            try:
+                os.rename(os.path.join(queued, job_id), jdir)
+            except OSError:   # (cancelled)
+                continue
+            info = _read_json(os.path.join(jdir, 'job.json'))
+            with open(os.path.join(jdir, 'output.log'), 'w') as log:
+                runner = subprocess.Popen([sys.executable, os.path.abspath(__file__), 'run', jdir],
+                                          cwd=jdir, stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+                                          start_new_session=True)
+            _children.append(runner)
+            info.update(pid=runner.pid, started=time.time())
+            _write_json(os.path.join(jdir, 'job.json'), info)
+            active += 1
+
+        if active or os.listdir(queued):
+            idle_since = time.time()
+        elif time.time() - idle_since > idle_exit:
+            return
+        time.sleep(poll_interval)
+
+
+def harvest(spool_dir, cache_dir, jdir, info, exit_status):
+    """Move a finished job's dir into the cache dir, and note its outcome in done/"""
+    from config_hash import record_config_hash
+    from run_catalog import run_catalog
+    job_id = os.path.basename(jdir)
+    returncode = exit_status.get('returncode') if exit_status else None
+    status = 'done' if returncode == 0 else 'failed'
+    rdir = os.path.join(cache_dir, job_id)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        shutil.move(jdir, rdir)
+    except OSError:
+        rdir = jdir
+    if status == 'done':
+        record_config_hash(rdir, info.get('executable', ''), info.get('config_hash'))
+    run_catalog(cache_dir).add_run(rdir, status=status)
+    info.update(state='done', status=status, returncode=returncode, path=rdir, finished=time.time())
+    _write_json(os.path.join(spool_dir, 'done', job_id + '.json'), info)
+
+
+def run_job(jdir):
+    """Run a job's myproj in jdir, with its limits; writes exit_status.json"""
+    info = _read_json(os.path.join(jdir, 'job.json'))
+    limits = info.get('limits', {})
+
+    def set_limits():
+        if limits.get('nice'):
+            os.nice(limits['nice'])
+        if limits.get('mem_gb'):
+            nbytes = int(limits['mem_gb'] * 1024**3)
+            resource.setrlimit(resource.RLIMIT_AS, (nbytes, nbytes))
+        if limits.get('cpu_hours'):
+            secs = int(limits['cpu_hours'] * 3600)
+            resource.setrlimit(resource.RLIMIT_CPU, (secs, secs))
+
+    env = dict(os.environ, OMP_NUM_THREADS=str(info.get('threads', 1)))
+    proc = subprocess.Popen([info['executable'], 'config.xml'], cwd=jdir, env=env, preexec_fn=set_limits)
+    signal.signal(signal.SIGTERM, lambda sig, frame: proc.terminate())
+    from telemetry import Telemetry
+    telemetry = Telemetry(proc.pid, jdir, interval=2.0)
+    telemetry.start()
+    returncode = proc.wait()
+    telemetry.stop()
+    _write_json(os.path.join(jdir, 'exit_status.json'), {'returncode': returncode, 'finished': time.time()})
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    if sys.argv[1] == 'worker':
+        work(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+    elif sys.argv[1] == 'run':
+        run_job(sys.argv[2])
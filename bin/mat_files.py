@@ -0,0 +1,84 @@
+# Reading parts of MATLAB .mat files (as written by BioFVM/PhysiCell) without loading them whole
+
+import struct
+import numpy as np
+import scipy.io
+
+
+# MAT-file data types -> NumPy dtypes
+mat4_precisions = {0:'f8', 1:'f4', 2:'i4', 3:'i2', 4:'u2', 5:'u1'}
+mat5_types = {1:'i1', 2:'u1', 3:'i2', 4:'u2', 5:'i4', 6:'u4', 7:'f4', 9:'f8', 12:'i8', 13:'u8'}
+
+
+def read_mat_header(fname):
+    """Locate the (first) 2-D matrix in a MAT v4 or uncompressed v5 file, without reading its data.
+
+    Returns (dtype, nrows, ncols, offset of the data), or None if the data can't be
+    memory-mapped as is (compressed v5, complex, sparse, ...).
+    """
+    with open(fname, 'rb') as f:
+        head = f.read(128)
+        if len(head) == 128 and head[126:128] in (b'IM', b'MI'):   # v5
+            e = '<' if head[126:128] == b'IM' else '>'
+            mtype, nbytes = struct.unpack(e + 'II', f.read(8))
+            if mtype != 14:   # not a miMATRIX, e.g. miCOMPRESSED
+                return None
+            def subelement():
+                mtype, nbytes = struct.unpack(e + 'II', f.read(8))
+                if mtype >> 16:   # small data element: its (<= 4 bytes) data are packed into the tag
+                    return mtype & 0xffff, mtype >> 16, True
+                return mtype, nbytes, False
+            mtype, nbytes, small = subelement()   # array flags
+            flags = struct.unpack(e + 'II', f.read(8))
+            if (flags[0] & 0xff) in (1, 2, 3, 4, 5) or (flags[0] & 0x800):   # cell, struct, object, char, sparse; complex
+                return None
+            mtype, nbytes, small = subelement()   # dimensions
+            dims = struct.unpack(e + '%di' % (nbytes // 4), f.read(4 if small else (nbytes + 7) // 8 * 8)[:nbytes])
+            if len(dims) != 2:
+                return None
+            mtype, nbytes, small = subelement()   # name
+            if not small:
+                f.seek((nbytes + 7) // 8 * 8, 1)
+            mtype, nbytes, small = subelement()   # real part
+            if small or mtype not in mat5_types:
+                return None
+            return np.dtype(e + mat5_types[mtype]), dims[0], dims[1], f.tell()
+
+        # v4: a 20-byte header (type, mrows, ncols, imagf, namlen), the name, then the data
+        for e in '<>':
+            mopt, mrows, ncols, imagf, namlen = struct.unpack(e + '5i', head[:20])
+            if 0 <= mopt < 5000:
+                break
+        else:
+            return None
+        M, O, P, T = mopt // 1000, (mopt // 100) % 10, (mopt // 10) % 10, mopt % 10
+        if O != 0 or T != 0 or imagf or P not in mat4_precisions:   # only full, real matrices
+            return None
+        return np.dtype(('<', '>')[M] + mat4_precisions[P]), mrows, ncols, 20 + namlen
+
+
+def read_mat_rows(fname, rows):
+    """Read just some rows of the (first) matrix in a .mat, e.g. the microenvironment's mesh or one substrate.
+
+    The data are memory-mapped, so only the pages holding those rows are read from disk.
+    Falls back to scipy.io.loadmat for files that can't be mapped.
+    """
+    header = read_mat_header(fname)
+    if header is None:
+        info_dict = {}
+        scipy.io.loadmat(fname, info_dict)
+        M = [val for key,val in info_dict.items() if not key.startswith('__')][0]
+        return np.array(M[rows, :], dtype=float)
+    dtype, nrows, ncols, offset = header
+    data = np.memmap(fname, dtype=dtype, mode='r', offset=offset, shape=(ncols, nrows))   # column-major: a column per voxel
+    vals = np.array(data[:, rows].T, dtype=float)   # a copy, so the file isn't held open
+    del data
+    return vals
+
+
+def mat_shape(fname):
+    """(nrows, ncols) of the (first) matrix in a .mat, without reading its data; e.g. ncols of a cells .mat is the # of cells"""
+    header = read_mat_header(fname)
+    if header is not None:
+        return header[1], header[2]
+    return scipy.io.whosmat(fname)[0][1]
@@ -0,0 +1,158 @@
+# OpenMP threads (and placement) for the simulations launched by this tool
+#
+# The cores we may use are those in our CPU affinity mask, capped by the cgroup's CPU quota (v2 cpu.max,
+# or v1 cpu.cfs_quota_us/cpu.cfs_period_us) if there is one. Each run we launch claims cores, so a run
+# started while others are going (e.g., a sweep) gets the cores that are left, and is pinned to them
+# (OMP_PLACES + OMP_PROC_BIND) instead of piling onto the same ones.
+#
+# Wall times of finished runs are kept in <cache dir>/.omp_timings.json (per executable, as secs per
+# simulated min), to report the speedup actually achieved with N threads.
+
+import os
+import math
+import json
+import threading
+import xml.etree.ElementTree as ET
+from statistics import median
+from config_hash import executable_id
+
+
+def cgroup_cpu_quota():
+    """The cgroup's CPU quota (in cores, may be fractional), or None if there isn't one"""
+    try:   # cgroup v2
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()[:2]
+        return None if quota == 'max' else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:   # cgroup v1
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+            quota = int(f.read())
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+            period = int(f.read())
+        return None if quota <= 0 else quota / period
+    except (OSError, ValueError):
+        return None
+
+
+def affinity_cpus():
+    try:
+        return sorted(os.sched_getaffinity(0))   # honors taskset/cpusets
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+
+def usable_cores():
+    cores = len(affinity_cpus())
+    quota = cgroup_cpu_quota()
+    if quota is not None:
+        cores = min(cores, max(1, int(math.ceil(quota))))
+    return cores
+
+
+class OmpPlanner(object):
+
+    def __init__(self):
+        self.claims = {}   # run key -> [cpus]
+        self._lock = threading.Lock()
+
+    def free_cpus(self):
+        taken = set(c for cpus in self.claims.values() for c in cpus)
+        cpus = affinity_cpus()[:usable_cores()]
+        return [c for c in cpus if c not in taken]
+
+    def propose(self):
+        """(# of threads for a new run, a description of why)"""
+        with self._lock:
+            free = len(self.free_cpus())
+            active = len(self.claims)
+        cores = usable_cores()
+        quota = cgroup_cpu_quota()
+        why = '%d usable cores' % cores
+        if quota is not None:
+            why += ' (cgroup quota %.1f)' % quota
+        if active:
+            why += ', %d in use by %d active run%s' % (cores - free, active, 's' if active > 1 else '')
+        return max(1, free), why
+
+    def start(self, key, threads):
+        """Claim cores for run `key`; returns the environment for its myproj"""
+        with self._lock:
+            self.claims.pop(key, None)
+            free = self.free_cpus()
+            env = dict(os.environ, OMP_NUM_THREADS=str(threads))
+            if len(free) >= threads:
+                cpus = free[:threads]
+                env.update(OMP_PLACES=','.join('{%d}' % c for c in cpus), OMP_PROC_BIND='close')
+            else:   # oversubscribed anyway; don't pin it onto someone else's cores
+                cpus = free
+                env.update(OMP_PROC_BIND='false')
+                env.pop('OMP_PLACES', None)
+            self.claims[key] = cpus
+        return env
+
+    def finish(self, key):
+        with self._lock:
+            self.claims.pop(key, None)
+
+    #-------------------------
+    def record(self, cache_dir, model, threads, secs, sim_mins):
+        """Remember how long a finished run of model (e.g., its executable's id) took with threads"""
+        if secs <= 0 or sim_mins <= 0:
+            return
+        fname = os.path.join(cache_dir, '.omp_timings.json')
+        with self._lock:
+            timings = self._read_timings(fname)
+            runs = timings.setdefault(model, [])
+            runs.append([threads, secs / sim_mins])
+            del runs[:-100]
+            try:
+                with open(fname + '.tmp', 'w') as f:
+                    json.dump(timings, f)
+                os.replace(fname + '.tmp', fname)
+            except OSError:
+                pass
+
+    def record_run(self, cache_dir, executable, rdir, secs):
+        """record() a finished run in rdir, with its # threads and max time from its config.xml"""
+        try:
+            xml_root = ET.parse(os.path.join(rdir, 'config.xml')).getroot()
+            threads = int(xml_root.find('.//omp_num_threads').text)
+            sim_mins = float(xml_root.find('.//max_time').text)
+        except (OSError, ET.ParseError, AttributeError, ValueError):
+            return
+        self.record(cache_dir, executable_id(executable), threads, secs, sim_mins)
+
+    def _read_timings(self, fname):
+        try:
+            with open(fname) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def speedups(self, cache_dir, model):
+        """{threads: (speedup vs. the fewest threads tried, # of runs)} from past runs of model"""
+        with self._lock:
+            runs = self._read_timings(os.path.join(cache_dir, '.omp_timings.json')).get(model, [])
+        by_threads = {}
+        for threads, secs_per_min in runs:
+            by_threads.setdefault(threads, []).append(secs_per_min)
+        if not by_threads:
+            return {}
+        base = median(by_threads[min(by_threads)])
+        return {t: (base / median(v), len(v)) for t,v in sorted(by_threads.items())}
+
+    def report(self, cache_dir, model):
+        """e.g., '2 threads: 1.8x, 4 threads: 3.1x (vs. 1)', from past runs of model"""
+        speedups = self.speedups(cache_dir, model)
+        if len(speedups) < 2:
+            return ''
+        return ', '.join('%d threads: %.1fx' % (t, s) for t,(s,n) in speedups.items() if t != min(speedups)) + \
+               ' (vs. %d)' % min(speedups)
+
+
+_planner = OmpPlanner()
+
+def planner():
+    """The (one) OmpPlanner for this tool"""
+    return _planner
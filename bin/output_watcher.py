@@ -0,0 +1,122 @@
+# Watch a run's output directory for new frames
+#
+# Calls on_frames(names) (from a background thread) when new snapshot%08d.svg / output%08d*.mat / .xml
+# files have been completely written. Uses inotify (the optional inotify_simple package) on Linux,
+# else polls, treating a file as complete once it hasn't changed for a poll interval.
+# Bursts of files (e.g., a frame's .svg, .xml and .mat's) are debounced into a single call.
+
+import os
+import re
+import time
+import threading
+
+inotify_flag = True
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+except:
+    inotify_flag = False
+
+_frame_file_re = re.compile(r'^(snapshot\d{8}\.svg|output\d{8}(\.xml|_.*\.mat))$')
+
+
+class OutputWatcher(object):
+
+    def __init__(self, output_dir, on_frames, debounce=0.5, poll_interval=1.0):
+        self.output_dir = output_dir
+        self.on_frames = on_frames
+        self.debounce = debounce            # secs of quiet before on_frames is called
+        self.poll_interval = poll_interval  # secs, if not using inotify
+        self.use_inotify = inotify_flag
+        self._stop = threading.Event()
+        self._thread = None
+        self._pending = []
+        self._first_pending = None
+        # for polling: the next file # of each kind, and the sizes seen for files that may be still growing
+        self._next = {'snapshot%08d.svg': 0, 'output%08d.xml': 0}
+        self._sizes = {}
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        target = self._watch_inotify if self.use_inotify else self._watch_poll
+        self._thread = threading.Thread(target=target, name='output_watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2*max(self.poll_interval, self.debounce))
+        self._thread = None
+        self._flush()   # anything that was still waiting out the debounce
+
+    #-------------------------
+    def _add(self, names):
+        if names:
+            if not self._pending:
+                self._first_pending = time.time()
+            self._pending.extend(names)
+
+    def _flush_if_quiet(self, last_event):
+        # call on_frames once things have been quiet for a bit (or at least every few debounce periods)
+        now = time.time()
+        if self._pending and (now - last_event >= self.debounce or now - self._first_pending >= 4*self.debounce):
+            self._flush()
+
+    def _flush(self):
+        names, self._pending = self._pending, []
+        if names:
+            try:
+                self.on_frames(sorted(set(names)))
+            except Exception:
+                pass
+
+    def _watch_inotify(self):
+        try:
+            inotify = INotify()
+            inotify.add_watch(self.output_dir, inotify_flags.CLOSE_WRITE | inotify_flags.MOVED_TO)
+        except OSError:   # e.g., out of watches, or a filesystem without inotify (NFS)
+            self.use_inotify = False
+            return self._watch_poll()
+        last_event = 0
+        with inotify:
+            while not self._stop.is_set():
+                events = inotify.read(timeout=int(self.debounce * 1000))
+                names = [e.name for e in events if _frame_file_re.match(e.name)]
+                if names:
+                    self._add(names)
+                    last_event = time.time()
+                self._flush_if_quiet(last_event)
+
+    def _watch_poll(self):
+        last_event = 0
+        while not self._stop.wait(self.poll_interval):
+            names = self._poll()
+            if names:
+                self._add(names)
+                last_event = time.time()
+            self._flush_if_quiet(last_event)
+
+    def _poll(self):
+        """Completed files, checking only the next expected names (not listing the directory)."""
+        done = []
+        for pattern in self._next:
+            while True:
+                k = self._next[pattern]
+                name = pattern % k
+                try:
+                    st = os.stat(os.path.join(self.output_dir, name))
+                except OSError:
+                    break
+                recent = time.time() - st.st_mtime < self.poll_interval
+                if st.st_size == 0 or (recent and self._sizes.get(name) != st.st_size):   # still being written?
+                    self._sizes[name] = st.st_size
+                    break
+                self._sizes.pop(name, None)
+                done.append(name)
+                if pattern == 'output%08d.xml':   # the .xml is written last, so its frame's .mat's are done too
+                    for suffix in ['_microenvironment0.mat', '_cells.mat', '_cells_physicell.mat']:
+                        if os.path.isfile(os.path.join(self.output_dir, name[:-4] + suffix)):
+                            done.append(name[:-4] + suffix)
+                self._next[pattern] = k + 1
+        return done
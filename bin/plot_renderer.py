@@ -0,0 +1,119 @@
+# Persistent figure for the Plots tab
+#
+# The figure, axes, colorbar and cell collection are created once and then only their data
+# (contours or image, cell offsets/sizes/colors, title) is updated as the frame slider moves.
+# The figure isn't managed by pyplot, so nothing piles up in plt's figure list while scrubbing.
+
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.collections import EllipseCollection
+from IPython.display import display
+
+
+class PlotRenderer(object):
+
+    def __init__(self):
+        self.fig = None
+        self.ax = None
+        self.cbar = None
+        self.contours = None
+        self.image = None
+        self.cell_collection = None
+        self.layout = None
+
+    def begin(self, figsize, with_colorbar):
+        """Start a frame; (re)creates the figure if its size or layout changed. Returns the axes."""
+        layout = (tuple(figsize), with_colorbar)
+        if self.fig is None or layout != self.layout:
+            self.fig = Figure(figsize=figsize)
+            self.ax = self.fig.add_subplot(111)
+            self.cbar = None
+            self.contours = None
+            self.image = None
+            self.cell_collection = None
+            self.layout = layout
+        return self.ax
+
+    def set_contours(self, xgrid, ygrid, zvals, levels, cmap, fontsize, **kwargs):
+        """Replace the filled contours (a ContourSet can't be updated in place) and refresh the colorbar.
+        Returns False if contourf fails (e.g., a constant field with fixed levels)."""
+        if self.image is not None:
+            self.image.remove()
+            self.image = None
+        if self.contours is not None:
+            self.contours.remove()
+            self.contours = None
+        try:
+            self.contours = self.ax.contourf(xgrid, ygrid, zvals, levels, cmap=cmap, **kwargs)
+        except:
+            if self.cbar is not None:
+                self.cbar.ax.set_visible(False)
+            return False
+
+        self.update_colorbar(self.contours, fontsize)
+        return True
+
+    def set_image(self, zvals, extent, cmap, fontsize, vmin=None, vmax=None):
+        """Draw a field on a uniform mesh (rows = y) as an image; after the first frame only its array changes.
+        vmin, vmax = None scales the colors to this frame's values."""
+        if self.contours is not None:
+            self.contours.remove()
+            self.contours = None
+        if vmin is None or vmax is None:
+            vmin, vmax = np.nanmin(zvals), np.nanmax(zvals)
+        if self.image is None:
+            self.image = self.ax.imshow(zvals, origin='lower', extent=extent, interpolation='nearest',
+                                        aspect='auto', cmap=cmap, vmin=vmin, vmax=vmax)
+        else:
+            self.image.set_data(zvals)
+            self.image.set_extent(extent)
+            self.image.set_cmap(cmap)
+            self.image.set_clim(vmin, vmax)
+        self.update_colorbar(self.image, fontsize)
+        return True
+
+    def update_colorbar(self, mappable, fontsize):
+        if self.cbar is None:
+            self.cbar = self.fig.colorbar(mappable, ax=self.ax)
+        else:
+            self.cbar.update_normal(mappable)
+            self.cbar.ax.set_visible(True)
+        self.cbar.ax.tick_params(labelsize=fontsize)
+
+    def set_cells(self, x, y, r, rgbas, show_edge):
+        """Update the cells (circles sized in data units) in place, or create them on the first frame.
+        They're drawn above the contours, which get replaced on every frame."""
+        offsets = np.column_stack((x, y))
+        edgecolor = 'black' if show_edge else rgbas
+        linewidth = 0.5 if show_edge else None   # None: matplotlib's default
+        coll = self.cell_collection
+        if coll is not None and hasattr(coll, 'set_widths'):   # matplotlib >= 3.8
+            coll.set_offsets(offsets)
+            coll.set_widths(2*r)
+            coll.set_heights(2*r)
+            coll.set_angles(np.zeros_like(r))
+            coll.set_facecolor(rgbas)
+            coll.set_edgecolor(edgecolor)
+            coll.set_linewidth(linewidth)
+            return
+
+        if coll is not None:
+            coll.remove()
+        if hasattr(EllipseCollection, 'set_offset_transform'):   # matplotlib >= 3.6
+            transform = {'offset_transform': self.ax.transData}
+        else:
+            transform = {'transOffset': self.ax.transData}
+        self.cell_collection = EllipseCollection(2*r, 2*r, np.zeros_like(r), units='xy', offsets=offsets,
+                    facecolor=rgbas, edgecolor=edgecolor, linewidth=linewidth, zorder=2, **transform)
+        self.ax.add_collection(self.cell_collection)
+
+    def clear_cells(self):
+        if self.cell_collection is not None:
+            self.cell_collection.remove()
+            self.cell_collection = None
+
+    def set_title(self, title_str, fontsize=None):
+        self.ax.set_title(title_str, fontsize=fontsize)
+
+    def show(self):
+        display(self.fig)
@@ -0,0 +1,104 @@
+# Rate-limited refreshes of the GUI while a simulation is running
+#
+# Producers (e.g., the output watcher) call request() as often as they like; a background thread
+# coalesces the requests made within `window` secs into one refresh() call, at most `max_rate` calls
+# per second, and never more than one at a time. Requests made while a refresh is running are folded
+# into a single follow-up, so a slow refresh skips to the newest state instead of working through a
+# backlog. Given a `loop` (the kernel's), refresh() is run on it rather than on the background thread,
+# since widgets and plots (e.g., an Output widget's capture) are only safe to update from there.
+
+import time
+import asyncio
+import threading
+
+
+def kernel_loop():
+    """The event loop of the thread we're on (call it on the kernel's), or None"""
+    try:
+        return asyncio.get_event_loop()
+    except RuntimeError:
+        return None
+
+
+def call_on_loop(loop, func, *args):
+    """func(*args) on loop's thread, e.g. the kernel's, where widgets and plots are safe to update;
+    or right away if the loop isn't running (e.g., outside of a notebook)"""
+    if loop is not None and loop.is_running():
+        loop.call_soon_threadsafe(func, *args)
+    else:
+        func(*args)
+
+
+class RefreshScheduler(object):
+
+    def __init__(self, refresh, window=0.25, max_rate=2.0, loop=None):
+        self.refresh = refresh
+        self.loop = loop
+        self.window = window        # secs to wait for more requests before refreshing
+        self.max_rate = max_rate    # refreshes per sec
+        self.dropped = 0            # requests folded into another refresh
+        self._pending = False
+        self._last_refresh = 0
+        self._cond = threading.Condition()
+        self._generation = 0        # bumped by stop(), which retires the current thread
+        self._thread = None
+
+    def configure(self, window=None, max_rate=None):
+        with self._cond:
+            if window is not None:
+                self.window = window
+            if max_rate is not None:
+                self.max_rate = max_rate
+
+    def request(self):
+        with self._cond:
+            if self._pending:
+                self.dropped += 1
+            self._pending = True
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, args=(self._generation,),
+                                                name='refresh_scheduler', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def stop(self):
+        """Drop any pending request; the next request() starts over."""
+        with self._cond:
+            self._generation += 1
+            self._pending = False
+            self._thread = None
+            self._cond.notify_all()
+
+    def _run(self, generation):
+        while True:
+            with self._cond:
+                while not self._pending and generation == self._generation:
+                    self._cond.wait()
+                if generation != self._generation:
+                    return
+                # let a burst of requests settle, and stay under max_rate
+                delay = max(self.window, self._last_refresh + 1.0 / self.max_rate - time.time())
+            time.sleep(max(delay, 0))
+            with self._cond:
+                if generation != self._generation:
+                    return
+                self._pending = False   # anything requested from here on needs another refresh
+                self._last_refresh = time.time()
+            if self.loop is not None and self.loop.is_running():
+                done = threading.Event()
+                self.loop.call_soon_threadsafe(self._refresh, generation, done)
+                while not done.wait(0.5):   # (the kernel may be busy, e.g. running a cell)
+                    if generation != self._generation:
+                        return
+            else:
+                self._refresh(generation)
+
+    def _refresh(self, generation, done=None):
+        try:
+            if generation == self._generation:
+                self.refresh()
+        except Exception:
+            pass
+        finally:
+            if done is not None:
+                done.set()
@@ -0,0 +1,122 @@
+# Catalog of the cached runs
+#
+# The "Load Config" dropdown lists the runs in the cache dir. Instead of listing (and stat'ing) every run
+# dir each time, they're kept in a SQLite table in <cache dir>/.run_catalog.sqlite: run id (the dir's
+# name), path, ctime, config hash (bin/config_hash.py), # of frames, status ('done', 'failed', ... or
+# 'unknown' for a run found on disk) and size. Runs are added as they finish. The catalog is reconciled
+# with the cache dir lazily: only when the dir's mtime has changed (i.e., runs were added or removed
+# by something else, e.g. hublib), and then only the new run dirs are looked at.
+
+import os
+import re
+import sqlite3
+import threading
+from config_hash import read_config_hash
+
+catalog_file_name = '.run_catalog.sqlite'
+_snapshot_re = re.compile(r'^snapshot\d{8}\.svg$')
+
+
+def scan_run(rdir):
+    """(# of frames, # of files, size in bytes) of a run dir, from a single listing of it"""
+    frames = files = size = 0
+    for e in os.scandir(rdir):
+        if e.is_file(follow_symlinks=False):
+            files += 1
+            size += e.stat(follow_symlinks=False).st_size
+            if _snapshot_re.match(e.name):
+                frames += 1
+    return frames, files, size
+
+
+class RunCatalog(object):
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            self.db = sqlite3.connect(os.path.join(cache_dir, catalog_file_name), timeout=10, check_same_thread=False)
+            # keep the rollback journal file between transactions: creating and deleting it for each commit
+            # would change the cache dir's mtime, which reconcile() takes to mean runs were added or removed
+            self.db.execute('pragma journal_mode=persist')
+            self._create()
+        except (OSError, sqlite3.Error):   # e.g., a read-only cache dir; keep it for this session only
+            self.db = sqlite3.connect(':memory:', check_same_thread=False)
+            self._create()
+
+    def _create(self):
+        with self.db:
+            self.db.execute('create table if not exists runs (run_id text primary key, path text, ctime real, '
+                            'config_hash text, frame_count integer, file_count integer, status text, size integer)')
+            self.db.execute('create index if not exists runs_config_hash on runs (config_hash)')
+            self.db.execute('create table if not exists meta (key text primary key, value)')
+
+    def add_run(self, rdir, status='done'):
+        """Add (or update) the run in rdir, e.g. when it finishes"""
+        rdir = os.path.abspath(rdir)
+        try:
+            frames, files, size = scan_run(rdir)
+            ctime = os.path.getctime(rdir)
+        except OSError:
+            return
+        with self._lock, self.db:
+            self.db.execute('insert or replace into runs values (?,?,?,?,?,?,?,?)',
+                            (os.path.basename(rdir), rdir, ctime, read_config_hash(rdir), frames, files, status, size))
+
+    def set_status(self, rdir, status):
+        with self._lock, self.db:
+            self.db.execute('update runs set status=? where run_id=?', (status, os.path.basename(rdir)))
+
+    def reconcile(self):
+        """Catch up with run dirs added or removed behind our back; cheap if the cache dir hasn't changed."""
+        try:
+            mtime_ns = os.stat(self.cache_dir).st_mtime_ns
+        except OSError:
+            return
+        with self._lock:
+            row = self.db.execute("select value from meta where key='mtime_ns'").fetchone()
+            if row and row[0] == mtime_ns:
+                return
+            known = set(r[0] for r in self.db.execute('select run_id from runs'))
+        try:
+            names = set(e.name for e in os.scandir(self.cache_dir) if e.is_dir() and not e.name.startswith('.'))
+        except OSError:
+            return
+        for name in names - known:
+            rdir = os.path.join(self.cache_dir, name)
+            self.add_run(rdir, status='done' if read_config_hash(rdir) else 'unknown')
+        with self._lock, self.db:
+            self.db.executemany('delete from runs where run_id=?', [(name,) for name in known - names])
+            self.db.execute("insert or replace into meta values ('mtime_ns', ?)", (mtime_ns,))
+
+    def runs(self):
+        """[(path, ctime), ...] of the runs with results, newest first"""
+        self.reconcile()
+        with self._lock:
+            # (a run that was cancelled before it really began leaves a (mostly) empty dir)
+            return self.db.execute("select path, ctime from runs where status='done' or file_count > 5 "
+                                   "order by ctime desc").fetchall()
+
+    def find(self, config_hash):
+        """The newest finished run with this config hash, or None"""
+        self.reconcile()
+        with self._lock:
+            rows = self.db.execute("select path from runs where config_hash=? and status='done' "
+                                   "order by ctime desc", (config_hash,)).fetchall()
+        for (path,) in rows:
+            if os.path.isdir(path):
+                return path
+        return None
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+def run_catalog(cache_dir):
+    """The (one) RunCatalog for a cache dir."""
+    cache_dir = os.path.abspath(cache_dir)
+    with _catalogs_lock:
+        if cache_dir not in _catalogs:
+            _catalogs[cache_dir] = RunCatalog(cache_dir)
+        return _catalogs[cache_dir]
@@ -0,0 +1,134 @@
+# Run directories: a fresh tmpdir for each run, without waiting for the old one to be deleted
+#
+# new_run_dir() renames the previous tmpdir out of the way (tmpdir_<timestamp>.old; a rename is atomic and
+# instant, however big it is) and creates an empty one. The old ones are deleted by a RunDirReaper on a
+# background thread, which keeps the `keep` most recent and deletes the oldest while they take up more
+# than `quota` bytes. (Leftover tmpdir_*.bak dirs, from before, are treated the same way.)
+#
+# move_run_dir() moves a finished run into the cache dir without blocking when that's on another file
+# system: the run is renamed aside (tmpdir_<timestamp>.moving) and copied on a background thread.
+
+import os
+import time
+import glob
+import shutil
+import datetime
+import threading
+import xml.etree.ElementTree as ET
+
+old_suffixes = ['.old', '.bak']
+
+
+def new_run_dir(name='tmpdir'):
+    """An empty (new) run dir `name`; any previous one is renamed, for the reaper to delete."""
+    if os.path.lexists(name):
+        stamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        os.rename(name, '%s_%s.old' % (name, stamp))
+    os.makedirs(name)
+    return os.path.abspath(name)
+
+
+def move_run_dir(src, dst, done=None):
+    """Move run dir src to dst. On the same file system, that's a rename, and dst is returned. Otherwise
+    src is renamed aside (so a new run can have its name) and copied to dst on a background thread, then
+    done(dst, aside) is called (the caller disposes of aside, e.g. as an .old dir); aside is returned."""
+    try:
+        same_fs = os.stat(src).st_dev == os.stat(os.path.dirname(dst)).st_dev
+    except OSError:
+        same_fs = False
+    if same_fs:
+        os.rename(src, dst)
+        return dst
+
+    stamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+    aside = '%s_%s.moving' % (src, stamp)
+    os.rename(src, aside)
+    def work():
+        partial = os.path.join(os.path.dirname(dst), '.%s.partial' % os.path.basename(dst))
+        try:
+            shutil.copytree(aside, partial, symlinks=True)
+            os.rename(partial, dst)   # (only whole runs show up in the cache dir)
+        except OSError:
+            shutil.rmtree(partial, ignore_errors=True)
+            return   # it stays aside
+        if done is not None:
+            done(dst, aside)
+    threading.Thread(target=work, name='move_run_dir', daemon=True).start()
+    return aside
+
+
+def localize_config(config_file, config_dir, threads=None):
+    """Make a config.xml runnable in its own dir, outside of tmpdir: output goes to '.', and relative
+    <initial_conditions> folders (e.g., "../data") are made absolute from config_dir (i.e., tmpdir)."""
+    tree = ET.parse(config_file)
+    xml_root = tree.getroot()
+    if threads is not None:
+        uep = xml_root.find('.//parallel//omp_num_threads')
+        if uep is not None:
+            uep.text = str(threads)
+    uep = xml_root.find('.//save//folder')
+    if uep is not None:
+        uep.text = '.'
+    uep = xml_root.find('.//initial_conditions//cell_positions//folder')
+    if uep is not None and uep.text and not os.path.isabs(uep.text):
+        uep.text = os.path.normpath(os.path.join(config_dir, uep.text))
+    tree.write(config_file)
+
+
+def dir_size(path):
+    size = 0
+    for root, dirs, files in os.walk(path):
+        for f in files:
+            try:
+                size += os.lstat(os.path.join(root, f)).st_size
+            except OSError:
+                pass
+    return size
+
+
+class RunDirReaper(object):
+
+    def __init__(self, base_dir='.', name='tmpdir', keep=1, quota=1 << 30):
+        self.base_dir = os.path.abspath(base_dir)
+        self.name = name
+        self.keep = keep      # # of the most recent old run dirs to keep
+        self.quota = quota    # bytes, for the ones that are kept
+        self._wake = threading.Event()
+        self._thread = None
+
+    def old_dirs(self):
+        """Old run dirs, newest first"""
+        dirs = []
+        for suffix in old_suffixes:
+            dirs += [d for d in glob.glob(os.path.join(self.base_dir, '%s_*%s' % (self.name, suffix)))
+                     if os.path.isdir(d) and not os.path.islink(d)]
+        return sorted(dirs, key=os.path.getmtime, reverse=True)
+
+    def reap(self):
+        """Delete the old run dirs beyond `keep`, then the oldest while over the quota; returns how many."""
+        dirs = self.old_dirs()
+        doomed = dirs[self.keep:]
+        kept = dirs[:self.keep]
+        sizes = [dir_size(d) for d in kept]
+        while kept and sum(sizes) > self.quota:
+            doomed.append(kept.pop())
+            sizes.pop()
+        for d in doomed:
+            shutil.rmtree(d, ignore_errors=True)
+        return len(doomed)
+
+    def wake(self):
+        """Reap (again) in the background, e.g. after new_run_dir()"""
+        self._wake.set()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='run_dir_reaper', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                self.reap()
+            except OSError:
+                time.sleep(1)
@@ -0,0 +1,174 @@
+# Run a simulation locally (when hublib's RunCommand isn't available)
+#
+# The child process is owned by an asyncio task on the notebook's event loop, so the kernel stays
+# responsive: its output is streamed (in batches) into an Output widget, PhysiCell's
+# "current simulated time: 60 min (max: 14400 min)" lines drive a progress bar with an ETA,
+# and Stop (SIGTERM) / Kill buttons end it. done_func(run_manager, rdir) is called when it exits.
+# While it runs, its CPU, memory and I/O are sampled into the run dir (bin/telemetry.py).
+
+import os
+import re
+import time
+import asyncio
+import subprocess
+from collections import deque
+from ipywidgets import Layout, Label, Button, HBox, VBox, FloatProgress, Output
+from telemetry import Telemetry
+
+_sim_time_re = re.compile(r'current simulated time:\s*([-+.\deE]+)\s*min\s*\(max:\s*([-+.\deE]+)\s*min\)')
+
+
+def format_secs(secs):
+    secs = int(secs)
+    if secs >= 3600:
+        return '%dh %02dm' % (secs // 3600, (secs % 3600) // 60)
+    return '%dm %02ds' % (secs // 60, secs % 60)
+
+
+class RunManager(object):
+
+    def __init__(self, done_func=None, max_lines=2000, flush_interval=0.25, telemetry_interval=1.0):
+        self.done_func = done_func
+        self.max_lines = max_lines              # lines of output kept in the Output widget
+        self.flush_interval = flush_interval    # secs between updates of the Output widget
+        self.telemetry_interval = telemetry_interval   # secs between resource samples (None = don't)
+        self.telemetry = None
+        self.proc = None
+        self.task = None
+        self.returncode = None
+        self.rdir = None
+        self.elapsed = None     # secs the last run took
+        self.stop_reason = None # why it was stopped early, e.g. by a stop condition (bin/stop_conditions.py)
+        self.lines = deque(maxlen=max_lines)
+
+        self.progress = FloatProgress(value=0, min=0, max=1, description='Progress',
+                                      bar_style='info', layout=Layout(width='300px'))
+        self.status = Label('')
+        self.stop_button = Button(description='Stop', icon='stop', button_style='warning', disabled=True,
+                                  tooltip='Ask the simulation to stop (SIGTERM)')
+        self.stop_button.on_click(lambda b: self.stop())
+        self.kill_button = Button(description='Kill', icon='times', button_style='danger', disabled=True,
+                                  tooltip='Kill the simulation (SIGKILL)')
+        self.kill_button.on_click(lambda b: self.kill())
+        self.output = Output(layout=Layout(height='200px', overflow_y='scroll', border='1px solid gray'))
+        self.w = VBox([HBox([self.progress, self.status, self.stop_button, self.kill_button]), self.output])
+
+    @property
+    def running(self):
+        return self.proc is not None and self.returncode is None
+
+    def run(self, cmd, cwd=None, env=None):
+        """Start cmd (a list) in cwd (the run's output dir), with env (or ours); returns right away."""
+        if self.running:
+            self.status.value = 'A simulation is already running.'
+            return
+        self.telemetry = None
+        self.rdir = os.path.abspath(cwd or os.getcwd())
+        self.returncode = None
+        self.elapsed = None
+        self.stop_reason = None
+        self.lines.clear()
+        self.output.clear_output()
+        self.progress.value = 0
+        self.progress.bar_style = 'info'
+        self.status.value = 'starting...'
+        self.stop_button.disabled = False
+        self.kill_button.disabled = False
+        self.task = asyncio.ensure_future(self._run(cmd, self.rdir, env))
+
+    def stop(self, reason=None):
+        if self.running:
+            self.stop_reason = reason
+            self.status.value = 'stopping...'
+            self.proc.terminate()
+
+    def kill(self):
+        if self.running:
+            self.status.value = 'killing...'
+            self.proc.kill()
+
+    #-------------------------
+    async def _run(self, cmd, cwd, env):
+        start = time.time()
+        try:
+            self.proc = await asyncio.create_subprocess_exec(*cmd, cwd=cwd, env=env, stdout=asyncio.subprocess.PIPE,
+                                                             stderr=asyncio.subprocess.STDOUT)
+            readline = self.proc.stdout.readline
+        except NotImplementedError:   # an event loop without subprocess support (e.g., Windows' selector loop)
+            self.proc = subprocess.Popen(cmd, cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            loop = asyncio.get_event_loop()
+            readline = lambda: loop.run_in_executor(None, self.proc.stdout.readline)
+        except OSError as e:   # e.g., no executable; done_func still gets to clean up (free cores, etc.)
+            self.status.value = 'could not start: %s' % e
+            self.progress.bar_style = 'danger'
+            self.stop_button.disabled = self.kill_button.disabled = True
+            self.proc = None
+            self.returncode = -1
+            if self.done_func is not None:
+                self.done_func(self, self.rdir)
+            return
+
+        if self.telemetry_interval:
+            self.telemetry = Telemetry(self.proc.pid, cwd, interval=self.telemetry_interval)
+            self.telemetry.start()
+
+        self.status.value = 'running'
+        new_lines = []
+        last_flush = 0
+        while True:
+            line = await readline()
+            if not line:
+                break
+            line = line.decode(errors='replace')
+            new_lines.append(line)
+            m = _sim_time_re.search(line)
+            if m:
+                self._progress(float(m.group(1)), float(m.group(2)), time.time() - start)
+            if time.time() - last_flush > self.flush_interval:
+                self._flush(new_lines)
+                new_lines = []
+                last_flush = time.time()
+        self._flush(new_lines)
+
+        returncode = self.proc.wait()
+        if asyncio.iscoroutine(returncode):
+            returncode = await returncode
+        self.returncode = returncode
+        self.elapsed = time.time() - start
+        if self.telemetry is not None:
+            self.telemetry.stop()   # (writes telemetry.csv/.json into the run dir)
+        self.stop_button.disabled = self.kill_button.disabled = True
+        elapsed = format_secs(self.elapsed)
+        if returncode == 0:
+            self.progress.value = 1
+            self.progress.bar_style = 'success'
+            self.status.value = 'done (%s)' % elapsed
+        elif self.stop_reason:
+            self.progress.bar_style = 'warning'
+            self.status.value = 'terminated early after %s: %s' % (elapsed, self.stop_reason)
+        else:
+            self.progress.bar_style = 'danger'
+            self.status.value = 'exited with status %d after %s' % (returncode, elapsed)
+        if self.done_func is not None:
+            self.done_func(self, self.rdir)
+
+    def _progress(self, sim_time, max_time, elapsed):
+        if max_time <= 0:
+            return
+        frac = min(sim_time / max_time, 1)
+        self.progress.value = frac
+        if frac > 0:
+            eta = elapsed / frac * (1 - frac)
+            self.status.value = '%d of %d min, ETA %s' % (sim_time, max_time, format_secs(eta))
+
+    def _flush(self, new_lines):
+        # the Output widget only shows the last max_lines lines
+        if not new_lines:
+            return
+        overflow = len(self.lines) + len(new_lines) > self.max_lines
+        self.lines.extend(new_lines)
+        if overflow:
+            self.output.clear_output(wait=True)
+            self.output.append_stdout(''.join(self.lines))
+        else:
+            self.output.append_stdout(''.join(new_lines))
@@ -0,0 +1,149 @@
+# Stop conditions: end a running simulation early, once its outcome is decided
+#
+# One condition per line, checked on every new output frame (when its output%08d.xml is written):
+#   cells < 10                 # of cells (all of those in the cells .mat, not just at z=0)
+#   time >= 2880               simulated time (min)
+#   oxygen max < 0.5           min, max or mean of a substrate (by name) over the domain
+#   py: <expression>           a Python predicate, with time, cells (a CellFrame, or None),
+#                              n_cells, fields ({substrate name: values}) and np
+# The frames come from SubstrateTab.get_output_frame(), i.e., parsed (and cached) as for the Plots tab,
+# but always the armed run's, whatever the Plots tab is showing (e.g., a cached run loaded meanwhile).
+# The first condition that's true calls on_stop(reason), e.g. to stop myproj (on the kernel's thread).
+# arm() rejects conditions that could never be true: an unknown substrate, or cells/substrates without full data.
+
+import os
+import re
+import operator
+import threading
+import numpy as np
+from ipywidgets import Layout, Label, Checkbox, HBox, Textarea
+from refresh_scheduler import call_on_loop
+
+_ops = {'<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge, '==': operator.eq}
+_number = r'([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)'
+_count_re = re.compile(r'^(cells|time)\s*(<=|>=|==|<|>)\s*' + _number + '$')
+_field_re = re.compile(r'^(.+?)\s+(min|max|mean)\s*(<=|>=|==|<|>)\s*' + _number + '$')
+_output_xml_re = re.compile(r'^output(\d{8})\.xml$')
+
+
+class Condition(object):
+
+    def __init__(self, text):
+        self.text = text
+        self.needs = None    # 'cells' or 'fields', for the conditions on those
+        self.name = None     # the substrate, for a 'fields' one
+        m = _count_re.match(text)
+        if m:
+            what, op, value = m.group(1), _ops[m.group(2)], float(m.group(3))
+            if what == 'cells':
+                self.needs = 'cells'
+                self.check = lambda frame: frame['n_cells'] is not None and op(frame['n_cells'], value)
+            else:
+                self.check = lambda frame: frame['time'] is not None and op(frame['time'], value)
+            return
+        if text.startswith('py:'):
+            code = compile(text[3:].strip(), '<stop condition>', 'eval')   # (SyntaxError for a bad one)
+            self.check = lambda frame: bool(eval(code, {'np': np},
+                                                 {'time': frame['time'], 'cells': frame['cells'],
+                                                  'n_cells': frame['n_cells'], 'fields': frame['fields']}))
+            return
+        m = _field_re.match(text)
+        if m:
+            name, stat, op, value = m.group(1), m.group(2), _ops[m.group(3)], float(m.group(4))
+            self.needs, self.name = 'fields', name
+            reduce = {'min': np.min, 'max': np.max, 'mean': np.mean}[stat]
+            self.check = lambda frame: name in frame['fields'] and op(reduce(frame['fields'][name]), value)
+            return
+        raise ValueError("can't make sense of the stop condition: %s" % text)
+
+
+def parse_conditions(text):
+    conditions = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith('#'):
+            conditions.append(Condition(line))
+    return conditions
+
+
+class StopMonitor(object):
+    """Checks the conditions on a SubstrateTab's new output frames (a listener of its output watcher)"""
+
+    def __init__(self, sub, on_stop):
+        self.sub = sub
+        self.on_stop = on_stop    # on_stop(reason)
+        self.conditions = []
+        self.rdir = None          # the run's dir, once armed
+        self.fired = None         # the reason, once a condition is true
+        self._lock = threading.Lock()
+
+        self.enabled = Checkbox(value=False, description='Stop early when', indent=False,
+                                layout=Layout(width='140px'))
+        self.text = Textarea(placeholder='cells < 10\noxygen max < 0.5\npy: n_cells > 0.9 * 1e4',
+                             layout=Layout(width='400px', height='70px'))
+        self.status = Label('')
+        self.w = HBox([self.enabled, self.text, self.status])
+
+    def arm(self, rdir, full_data=True):
+        """Parse the conditions, for a run that's starting in rdir; returns False (and says why) if they're bad.
+
+        full_data: whether the run writes the .mat files (the cells and substrates), as the Config tab says
+        """
+        self.fired = None
+        self.conditions = []
+        self.rdir = os.path.abspath(rdir)
+        self.status.value = ''
+        if not self.enabled.value:
+            return True
+        try:
+            self.conditions = parse_conditions(self.text.value)
+        except (ValueError, SyntaxError) as e:
+            self.status.value = str(e)
+            return False
+        substrates = list(getattr(self.sub, 'field_dict', {}).values())
+        for condition in self.conditions:
+            if condition.needs and not full_data:
+                error = "%s: needs the full data (.mat) output, which is off in the Config tab" % condition.text
+            elif condition.needs == 'fields' and substrates and condition.name not in substrates:
+                error = "%s: no substrate '%s' (there's %s)" % (condition.text, condition.name, ', '.join(substrates))
+            else:
+                continue
+            self.conditions = []
+            self.status.value = error
+            return False
+        return True
+
+    def disarm(self):
+        self.conditions = []
+
+    def new_frames_cb(self, names):
+        frames = sorted(int(m.group(1)) for m in map(_output_xml_re.match, names) if m)
+        if not frames or not self.conditions:
+            return
+        with self._lock:
+            if self.fired:
+                return
+            for k in frames:
+                try:
+                    frame = self.sub.get_output_frame(k, self.rdir)
+                except (OSError, ValueError):
+                    continue
+                for condition in self.conditions:
+                    try:
+                        true = condition.check(frame)
+                    except Exception as e:   # e.g., a predicate that fails on this frame
+                        call_on_loop(self.sub.loop, self._say, '%s: %s' % (condition.text, e))
+                        continue
+                    if true:
+                        t = frame['time']
+                        self.fired = '%s (at %s min)' % (condition.text, ('%g' % t) if t is not None else '?')
+                        call_on_loop(self.sub.loop, self._fire, self.fired)
+                        return
+
+    # (these two on the kernel's thread: we're called on the output watcher's, and on_stop touches the run's process)
+    def _say(self, text):
+        self.status.value = text
+
+    def _fire(self, reason):
+        self.status.value = 'stopping: ' + reason
+        self.on_stop(reason)
@@ -1,6 +1,6 @@
 # substrates  Tab
 
-import os, math
+import os, math, copy
 from pathlib import Path
 from ipywidgets import Layout, Label, Text, Checkbox, Button, BoundedIntText, HBox, VBox, Box, \
     FloatText, Dropdown, interactive
@@ -8,10 +8,8 @@ import matplotlib.pyplot as plt
 from matplotlib.colors import BoundaryNorm
 from matplotlib.ticker import MaxNLocator
 from matplotlib.collections import LineCollection
-from matplotlib.patches import Circle, Ellipse, Rectangle
-from matplotlib.collections import PatchCollection
+from matplotlib.patches import Ellipse, Rectangle
 import matplotlib.colors as mplc
-from collections import deque
 import numpy as np
 import scipy.io
 import xml.etree.ElementTree as ET  # https://docs.python.org/2/library/xml.etree.elementtree.html
@@ -19,6 +17,15 @@ import glob
 import platform
 import zipfile
 from debug import debug_view 
+from svg_cells import read_cells, forget_cell_store, CellFrame, FILL_RGB, FILL_RGBA
+from frame_cache import FrameCache, FramePrefetcher
+from plot_renderer import PlotRenderer
+from mat_files import read_mat_rows, mat_shape
+from field_store import FieldStore
+from field_stats import FieldStats
+from frame_index import frame_index, forget_frame_index
+from output_watcher import OutputWatcher
+from refresh_scheduler import RefreshScheduler, kernel_loop, call_on_loop
 import warnings
 
 hublib_flag = True
@@ -34,6 +41,90 @@ else:
 #warnings.warn(message, mplDeprecation, stacklevel=1)
 warnings.filterwarnings("ignore")
 
+# rows of PhysiCell's cells .mat, in case a run's initial.xml doesn't list them
+default_cell_labels = {'ID':0, 'position_x':1, 'position_y':2, 'position_z':3, 'total_volume':4, 'cell_type':5,
+    'cycle_model':6, 'current_phase':7, 'elapsed_time_in_phase':8, 'nuclear_volume':9}
+
+# cell variables that are colored by category (vs. by a colormap)
+categorical_cell_variables = ['cell_type', 'cycle_model', 'current_phase']
+
+
+# Return {variable name: row} of the PhysiCell cells .mat, from the labels in a MultiCellDS .xml (e.g., initial.xml)
+def read_cell_labels(xml_root):
+    labels = {}
+    for elm in xml_root.iterfind('.//simplified_data[@source="PhysiCell"]//label'):
+        row = int(elm.attrib['index'])
+        size = int(elm.attrib.get('size', 1))
+        name = elm.text.strip()
+        if size == 1:
+            labels[name] = row
+        elif size == 3:   # e.g., position -> position_x, position_y, position_z
+            for k in range(size):
+                labels[name + '_' + 'xyz'[k]] = row + k
+        else:
+            for k in range(size):
+                labels[name + str(k)] = row + k
+    return labels
+
+
+# ({field index: substrate name}, {cell variable name: row}) from a run's initial.xml, for reading its
+# frames when they aren't the ones the Plots tab is showing (e.g., a live run's, for its stop conditions);
+# None until it's written
+def read_run_info(output_dir):
+    try:
+        xml_root = ET.parse(os.path.join(output_dir, 'initial.xml')).getroot()
+    except (OSError, ET.ParseError):
+        return None
+    field_dict = {k: elm.attrib['name'] for k,elm in enumerate(xml_root.iterfind('.//variables/variable'))}
+    labels = dict(default_cell_labels)
+    labels.update(read_cell_labels(xml_root))
+    return field_dict, labels
+
+
+def read_cells_mat(fname, labels, current_time=None):
+    """Read the cells in PhysiCell's output%08d_cells[_physicell].mat into a CellFrame.
+
+    Like the .svg, only cells intersecting z=0 are kept (with their radius in that plane).
+    The colors are left for the caller to fill in from CellFrame.variables.
+    Returns None for a BioFVM "basic_agents" .mat, which has no cell types, or one without the positions and volumes.
+    """
+    info_dict = {}
+    scipy.io.loadmat(fname, info_dict)
+    if 'basic_agents' in info_dict:
+        return None
+    C = [val for key,val in info_dict.items() if not key.startswith('__')][0]
+    variables = {name: C[row] for name,row in labels.items() if row < C.shape[0]}
+    if not all(name in variables for name in ['position_x', 'position_y', 'position_z', 'total_volume']):
+        return None
+
+    z = variables['position_z']
+    r = np.cbrt(0.75 * variables['total_volume'] / np.pi)
+    in_plane = np.fabs(z) < r
+    variables = {name: val[in_plane] for name,val in variables.items()}
+    z = z[in_plane]
+    r = np.sqrt(r[in_plane]**2 - z**2)
+    n = len(r)
+
+    if 'nuclear_volume' in variables:
+        rn = np.cbrt(0.75 * variables['nuclear_volume'] / np.pi)
+        has_nucleus = np.fabs(z) < rn
+        nucleus_r = np.sqrt(rn[has_nucleus]**2 - z[has_nucleus]**2)
+    else:
+        has_nucleus = np.zeros(n, dtype=bool)
+        nucleus_r = np.zeros(0)
+    num_nuclei = len(nucleus_r)
+
+    time_text = ''
+    if current_time is not None:   # same format as the .svg's
+        days = int(current_time / 1440)
+        hrs = int((current_time - days*1440) / 60)
+        time_text = "Current time: %d days, %d hours, and %2.2f minutes" % (days, hrs, current_time - days*1440 - hrs*60)
+
+    return CellFrame(variables['position_x'], variables['position_y'], r,
+                     np.ones((n,4)), np.full(n, FILL_RGB, dtype=np.int8), has_nucleus,
+                     nucleus_r, np.ones((num_nuclei,4)), np.full(num_nuclei, FILL_RGB, dtype=np.int8),
+                     time_text=time_text, variables=variables)
+
 class SubstrateTab(object):
 
     def __init__(self):
@@ -95,6 +186,31 @@ class SubstrateTab(object):
 
         self.title_str = ''
 
+        # parsed cells and substrates of recently viewed frames (cleared when switching to another run)
+        self.frame_cache = FrameCache(max_bytes=512*1024*1024)
+        # while the user looks at frame N, load frames N+-prefetch_depth in the background
+        self.prefetch_depth = 3
+        self.prefetch_workers = 2
+        self.prefetcher = FramePrefetcher(self.prefetch_frame, self.prefetch_depth, self.prefetch_workers)
+        # the microenvironment's x,y mesh rows; the same for every frame of a run
+        self.mesh = None
+        # a finished run's substrates, consolidated into one array (see field_store.py)
+        self.field_store = None
+        self.run_number = 0   # bumped by reset_run_state(), so late results for an earlier run are ignored
+        self.loop = kernel_loop()   # background threads hand widget and plot updates to the kernel's loop
+        # each substrate's min/max over the run, to fill in the colormap ranges
+        self.field_stats = None
+        # one figure, reused for every frame
+        self.renderer = PlotRenderer()
+        # during a run, watches its output dir for new frames
+        self.output_watcher = None
+        # new frames refresh the tab at most refresh_rate times/sec, coalescing those within refresh_window secs
+        self.refresh_window = 0.25
+        self.refresh_rate = 2.0
+        self.refresh_scheduler = RefreshScheduler(self.refresh_live, self.refresh_window, self.refresh_rate, loop=self.loop)
+        # also told about the watcher's new files, e.g. the stop conditions (see stop_conditions.py)
+        self.frame_listeners = []
+
         tab_height = '600px'
         tab_height = '500px'
         constWidth = '180px'
@@ -152,6 +268,16 @@ class SubstrateTab(object):
 #        self.field_cmap.observe(self.plot_substrate)
         self.field_cmap.observe(self.mcds_field_cb)
 
+        # BioFVM meshes are uniform, so a field can also be drawn as an image (much faster than contourf on big meshes)
+        self.substrate_mode = Dropdown(
+            options=['contour', 'raster'],
+            value='contour',
+            description='draw as',
+            style={'description_width': 'initial'},
+            layout=Layout(width=constWidth2)
+        )
+        self.substrate_mode.observe(lambda b: self.i_plot.update(), names='value')
+
         self.cmap_fixed_toggle = Checkbox(
             description='Fixed substrate range',
             disabled=False,
@@ -319,12 +445,25 @@ class SubstrateTab(object):
             if (self.cells_toggle.value):
                 self.cell_edges_toggle.disabled = False
                 self.cell_nucleus_toggle.disabled = False
+                self.cell_color_by.disabled = False
             else:
                 self.cell_edges_toggle.disabled = True
                 self.cell_nucleus_toggle.disabled = True
+                self.cell_color_by.disabled = True
 
         self.cells_toggle.observe(cells_toggle_cb)
 
+        # color cells using a variable from PhysiCell's cells .mat, or as in the .svg
+        self.cell_color_by = Dropdown(
+            options=[('SVG colors', 'svg')] + [(name, name) for name in default_cell_labels],
+            value='svg',
+            description='color by',
+            style={'description_width': 'initial'},
+            layout=Layout(width=constWidth)
+        )
+        self.cell_color_by.observe(lambda b: self.i_plot.update(), names='value')
+        self.cell_labels = None
+
 
         self.dark_mode_toggle = Checkbox(
             description='dark mode',
@@ -361,12 +500,14 @@ class SubstrateTab(object):
                 self.cmap_max.disabled = False
                 self.mcds_field.disabled = False
                 self.field_cmap.disabled = False
+                self.substrate_mode.disabled = False
             else:
                 self.cmap_fixed_toggle.disabled = True
                 self.cmap_min.disabled = True
                 self.cmap_max.disabled = True
                 self.mcds_field.disabled = True
                 self.field_cmap.disabled = True
+                self.substrate_mode.disabled = True
 
         self.substrates_toggle.observe(substrates_toggle_cb)
 
@@ -399,7 +540,7 @@ class SubstrateTab(object):
                             flex_direction='row',
                             display='flex')) 
         # row1b = Box( [self.cells_toggle, self.cell_nucleus_toggle, self.cell_edges_toggle, self.cell_alpha_toggle], layout=Layout(border='1px solid black',
-        row1b = Box( [self.cells_toggle, self.cell_edges_toggle, self.cell_alpha_toggle], layout=Layout(border='1px solid black',
+        row1b = Box( [self.cells_toggle, self.cell_edges_toggle, self.cell_alpha_toggle, self.cell_color_by], layout=Layout(border='1px solid black',
                             width='50%',
                             height='',
                             align_items='stretch',
@@ -414,7 +555,7 @@ class SubstrateTab(object):
                             flex_direction='row',
                             display='flex'))
         # row2b = Box( [self.substrates_toggle, self.grid_toggle], layout=Layout(border='1px solid black',
-        row2b = Box( [self.substrates_toggle, self.dark_mode_toggle ], layout=Layout(border='1px solid black',
+        row2b = Box( [self.substrates_toggle, self.substrate_mode, self.dark_mode_toggle ], layout=Layout(border='1px solid black',
                             width='50%',
                             height='',
                             align_items='stretch',
@@ -484,6 +625,16 @@ class SubstrateTab(object):
         # print(self.field_min_max)  # debug
         self.mcds_field.value = 0
         self.mcds_field.options = dropdown_options
+        if self.field_stats is not None and self.field_stats.output_dir == self.output_dir:
+            self.apply_field_stats(self.field_stats)
+
+        # the cell variables we can color by
+        cell_labels = read_cell_labels(xml_root)
+        if cell_labels:
+            color_by = self.cell_color_by.value
+            self.cell_color_by.options = [('SVG colors', 'svg')] + [(name, name) for name in cell_labels]
+            if color_by in cell_labels or color_by == 'svg':
+                self.cell_color_by.value = color_by
 #         self.mcds_field = Dropdown(
 # #            options={'oxygen': 0, 'glucose': 1},
 #             options=dropdown_options,
@@ -556,6 +707,12 @@ class SubstrateTab(object):
         # print("substrates: update rdir=", rdir)        
 
         if rdir:
+            if rdir != self.output_dir:
+                self.prefetcher.cancel()
+                self.frame_cache.clear()
+                self.cell_labels = None
+                self.mesh = None
+                self.field_store = FieldStore.open(rdir)
             self.output_dir = rdir
 
         # print('update(): self.output_dir = ', self.output_dir)
@@ -581,17 +738,75 @@ class SubstrateTab(object):
                 # print("substrates: update(): modulo=",self.modulo)        
 
 
-        # all_files = sorted(glob.glob(os.path.join(self.output_dir, 'output*.xml')))  # if the substrates/MCDS
-
-        all_files = sorted(glob.glob(os.path.join(self.output_dir, 'snap*.svg')))   # if .svg
-        if len(all_files) > 0:
-            last_file = all_files[-1]
-            self.max_frames.value = int(last_file[-12:-4])  # assumes naming scheme: "snapshot%08d.svg"
-        else:
-            substrate_files = sorted(glob.glob(os.path.join(self.output_dir, 'output*.xml')))
-            if len(substrate_files) > 0:
-                last_file = substrate_files[-1]
-                self.max_frames.value = int(last_file[-12:-4])
+        # the last snapshot%08d.svg, or else the last output%08d.xml (if the substrates/MCDS)
+        frames = self.get_frame_index()
+        frames.advance()   # cheap: only looks for the next frames' files
+        last_frame = frames.max_snapshot()
+        if last_frame is None:
+            last_frame = frames.max_output()
+        if last_frame is not None:
+            self.max_frames.value = last_frame
+
+        # reduce any new substrate frames (in the background) and use the results for the colormap ranges
+        if self.field_stats is None or self.field_stats.output_dir != self.output_dir:
+            self.field_stats = FieldStats(self.output_dir)
+            self.apply_field_stats(self.field_stats)   # whatever was saved last time
+        self.field_stats.update_in_background(frames.mat_names(),
+                                              done=lambda stats: call_on_loop(self.loop, self.apply_field_stats, stats))
+
+    # Fill in field_min_max with the fields' actual ranges, except for fields the user has fixed
+    # (on the kernel's thread, like the widget callbacks that also change them)
+    def apply_field_stats(self, stats):
+        if stats is not self.field_stats:   # (for a run that's no longer shown)
+            return
+        field_dict = getattr(self, 'field_dict', {})
+        for field_idx, field_name in field_dict.items():
+            field_range = stats.global_range(field_idx)
+            if field_range is None or self.field_min_max[field_name][2]:
+                continue
+            self.field_min_max[field_name][0], self.field_min_max[field_name][1] = field_range
+
+        field_name = field_dict.get(self.mcds_field.value)
+        if field_name and not self.field_min_max[field_name][2]:
+            self.skip_cb = True
+            self.cmap_min.value = self.field_min_max[field_name][0]
+            self.cmap_max.value = self.field_min_max[field_name][1]
+            self.skip_cb = False
+
+    # Follow a (live) run's output: new frames update the plot's frame range as soon as they're written
+    def watch_output(self, rdir):
+        self.stop_watching()
+        self.output_watcher = OutputWatcher(rdir, self.new_frames_cb)
+        self.output_watcher.start()
+
+    def stop_watching(self):
+        if self.output_watcher is not None:
+            self.output_watcher.stop()
+            self.output_watcher = None
+        self.refresh_scheduler.stop()
+
+    # called from the output watcher's thread, with the names of newly completed files
+    def new_frames_cb(self, names):
+        for listener in self.frame_listeners:
+            listener(names)
+        self.refresh_scheduler.request()
+
+    # called by the refresh scheduler (on the kernel's thread, like the widgets' callbacks, so it never
+    # draws concurrently with them): pick up the new frames, and if the slider was on
+    # the last frame, jump to the newest one (skipping any in between)
+    def refresh_live(self):
+        slider = self.i_plot.children[0]
+        follow = slider.value >= slider.max
+        self.update()
+        if follow and slider.value != slider.max:
+            slider.value = slider.max
+
+    def set_refresh_rate(self, window=None, max_rate=None):
+        if window is not None:
+            self.refresh_window = window
+        if max_rate is not None:
+            self.refresh_rate = max_rate
+        self.refresh_scheduler.configure(self.refresh_window, self.refresh_rate)
 
     def download_svg_cb(self):
         file_str = os.path.join(self.output_dir, '*.svg')
@@ -670,79 +885,177 @@ class SubstrateTab(object):
         self.i_plot.update()
 
 
-    #---------------------------------------------------------------------------
-    def circles(self, x, y, s, c='b', vmin=None, vmax=None, **kwargs):
-        """
-        See https://gist.github.com/syrte/592a062c562cd2a98a83 
-
-        Make a scatter plot of circles. 
-        Similar to plt.scatter, but the size of circles are in data scale.
-        Parameters
-        ----------
-        x, y : scalar or array_like, shape (n, )
-            Input data
-        s : scalar or array_like, shape (n, ) 
-            Radius of circles.
-        c : color or sequence of color, optional, default : 'b'
-            `c` can be a single color format string, or a sequence of color
-            specifications of length `N`, or a sequence of `N` numbers to be
-            mapped to colors using the `cmap` and `norm` specified via kwargs.
-            Note that `c` should not be a single numeric RGB or RGBA sequence 
-            because that is indistinguishable from an array of values
-            to be colormapped. (If you insist, use `color` instead.)  
-            `c` can be a 2-D array in which the rows are RGB or RGBA, however. 
-        vmin, vmax : scalar, optional, default: None
-            `vmin` and `vmax` are used in conjunction with `norm` to normalize
-            luminance data.  If either are `None`, the min and max of the
-            color array is used.
-        kwargs : `~matplotlib.collections.Collection` properties
-            Eg. alpha, edgecolor(ec), facecolor(fc), linewidth(lw), linestyle(ls), 
-            norm, cmap, transform, etc.
-        Returns
-        -------
-        paths : `~matplotlib.collections.PathCollection`
-        Examples
-        --------
-        a = np.arange(11)
-        circles(a, a, s=a*0.2, c=a, alpha=0.5, ec='none')
-        plt.colorbar()
-        License
-        --------
-        This code is under [The BSD 3-Clause License]
-        (http://opensource.org/licenses/BSD-3-Clause)
-        """
-
-        if np.isscalar(c):
-            kwargs.setdefault('color', c)
-            c = None
-
-        if 'fc' in kwargs:
-            kwargs.setdefault('facecolor', kwargs.pop('fc'))
-        if 'ec' in kwargs:
-            kwargs.setdefault('edgecolor', kwargs.pop('ec'))
-        if 'ls' in kwargs:
-            kwargs.setdefault('linestyle', kwargs.pop('ls'))
-        if 'lw' in kwargs:
-            kwargs.setdefault('linewidth', kwargs.pop('lw'))
-        # You can set `facecolor` with an array for each patch,
-        # while you can only set `facecolors` with a value for all.
-
-        zipped = np.broadcast(x, y, s)
-        patches = [Circle((x_, y_), s_)
-                for x_, y_, s_ in zipped]
-        collection = PatchCollection(patches, **kwargs)
-        if c is not None:
-            c = np.broadcast_to(c, zipped.shape).ravel()
-            collection.set_array(c)
-            collection.set_clim(vmin, vmax)
-
-        ax = plt.gca()
-        ax.add_collection(collection)
-        ax.autoscale_view()
-        # plt.draw_if_interactive()
-        if c is not None:
-            plt.sci(collection)
-        # return collection
+    #------------------------------------------------------------
+    # Parsed frames come from (and go into) the frame cache
+    def load_cells(self, frame):
+        fname = os.path.join(self.output_dir, "snapshot%08d.svg" % frame)
+        return self.frame_cache.get(self.output_dir, frame, 'cells', fname, read_cells)
+
+    # only the displayed field of a frame is read (and cached)
+    def load_substrate(self, substrate_frame):
+        store = self.field_store
+        if store is not None and substrate_frame < store.num_frames:
+            return {'field': store.field(substrate_frame, self.field_index),
+                    'current_time': store.times[substrate_frame]}
+        fname = self.get_frame_index().path(substrate_frame, 'mat') or \
+                os.path.join(self.output_dir, "output%08d_microenvironment0.mat" % substrate_frame)
+        field_index = self.field_index
+        return self.frame_cache.get(self.output_dir, substrate_frame, ('substrate', field_index), fname,
+                                    lambda fname: self.read_substrate(fname, field_index, substrate_frame))
+
+    # output # -> time and files of this run (see frame_index.py)
+    def get_frame_index(self):
+        return frame_index(self.output_dir)
+
+    def get_mesh(self, fname):
+        if self.mesh is None:
+            if self.field_store is not None:
+                self.mesh = self.field_store.mesh()
+            else:
+                xrow, yrow = read_mat_rows(fname, [0, 1])
+                self.mesh = (xrow, yrow)
+        return self.mesh
+
+    # A new run is starting in rdir (e.g., tmpdir again): forget everything read from the one before.
+    # (update() only does so when the dir's path changes.)
+    def reset_run_state(self, rdir):
+        self.prefetcher.cancel()
+        self.frame_cache.clear()
+        self.cell_labels = None
+        self.mesh = None
+        self.field_store = None
+        self.field_stats = None
+        self.run_number += 1
+        forget_frame_index(rdir)
+        forget_cell_store(rdir)
+
+    # called (on a background thread) once a run's substrates have been consolidated;
+    # run_number is the one when the consolidation was started
+    def set_field_store(self, rdir, store, run_number=None):
+        if run_number is not None and run_number != self.run_number:
+            return
+        if store is not None and os.path.abspath(rdir) == os.path.abspath(self.output_dir):
+            self.field_store = store
+
+    # Everything in output # substrate_frame, for code that looks at the data rather than plotting it:
+    # its time, cells (a CellFrame from the cells .mat, or None), n_cells (all of the .mat's cells, not just
+    # those at z=0 like cells; None without a cells .mat) and {substrate name: values at the voxels}.
+    # output_dir: the run's (default: the one being shown)
+    def get_output_frame(self, substrate_frame, output_dir=None):
+        output_dir = os.path.abspath(self.output_dir if output_dir is None else output_dir)
+        shown = (output_dir == os.path.abspath(self.output_dir))
+        if shown:
+            field_dict, labels = getattr(self, 'field_dict', {}), None
+        else:
+            field_dict, labels = read_run_info(output_dir) or ({}, dict(default_cell_labels))
+        index = frame_index(output_dir)
+        frame = {'time': index.time(substrate_frame), 'cells': None, 'n_cells': None, 'fields': {}}
+        fname = index.path(substrate_frame, 'cells')
+        if fname:
+            frame['n_cells'] = mat_shape(fname)[1]   # (a column per cell, "basic_agents" too)
+            if shown:   # (the same cache entry as the plots' when this output has an .svg frame)
+                frame['cells'] = self.frame_cache.get(output_dir, substrate_frame * self.modulo, 'cells_mat', fname,
+                                                      lambda fname: self.read_cells_frame(fname, substrate_frame))
+            else:
+                frame['cells'] = self.frame_cache.get(output_dir, substrate_frame, 'output_cells', fname,
+                                                      lambda fname: read_cells_mat(fname, labels, frame['time']))
+        fname = index.path(substrate_frame, 'mat')
+        if fname and field_dict:
+            rows = [4 + field_idx for field_idx in sorted(field_dict)]
+            fields = self.frame_cache.get(output_dir, substrate_frame, 'fields', fname,
+                                          lambda fname: read_mat_rows(fname, rows))
+            frame['fields'] = {field_dict[field_idx]: vals for field_idx, vals in zip(sorted(field_dict), fields)}
+        return frame
+
+    # Cells for a frame: from PhysiCell's cells .mat if there is one with the variable to color by
+    # (unless using the SVG colors), else from the .svg
+    def get_cells(self, frame):
+        if self.cell_color_by.value != 'svg':
+            fname = self.cells_mat_file(frame)
+            if fname:
+                substrate_frame = self.get_substrate_frame(frame)
+                cells = self.frame_cache.get(self.output_dir, frame, 'cells_mat', fname,
+                                             lambda fname: self.read_cells_frame(fname, substrate_frame))
+                if cells is not None and self.cell_color_by.value in cells.variables:
+                    return cells
+        return self.load_cells(frame)
+
+    # the cells .mat files are written with the substrates (full data), so only some .svg frames have one
+    def cells_mat_file(self, frame):
+        if self.customized_output_freq or (frame % self.modulo):
+            return None
+        # (older PhysiCell versions write both _cells_physicell.mat and _cells.mat; the index prefers the former)
+        return self.get_frame_index().path(self.get_substrate_frame(frame), 'cells')
+
+    def read_cells_frame(self, fname, substrate_frame):
+        current_time = self.get_frame_index().time(substrate_frame)
+        return read_cells_mat(fname, self.get_cell_labels(), current_time)
+
+    def get_cell_labels(self):
+        if self.cell_labels is None:
+            labels = dict(default_cell_labels)
+            try:
+                labels.update(read_cell_labels(ET.parse(os.path.join(self.output_dir, 'initial.xml')).getroot()))
+            except:
+                pass
+            self.cell_labels = labels
+        return self.cell_labels
+
+    # (rgba, nucleus_rgba) for cells from a cells .mat, colored by the selected variable
+    def mat_cell_colors(self, cells):
+        name = self.cell_color_by.value
+        if name not in cells.variables:   # (changed since get_cells)
+            return cells.rgba, cells.nucleus_rgba
+        vals = cells.variables[name]
+        if name in categorical_cell_variables:
+            rgbas = plt.cm.tab10(vals.astype(int) % 10)
+        elif len(vals) > 0:
+            norm = mplc.Normalize(vals.min(), vals.max())
+            rgbas = plt.cm.viridis(norm(vals))
+        else:
+            rgbas = np.ones((0,4))
+        nucleus_rgbas = rgbas[cells.has_nucleus].copy()
+        nucleus_rgbas[:,0:3] *= 0.5   # darker nuclei
+        return rgbas, nucleus_rgbas
+
+    # called on the prefetcher's threads
+    def prefetch_frame(self, frame):
+        try:
+            if self.cells_toggle.value:
+                self.get_cells(frame)
+            if self.substrates_toggle.value:
+                self.load_substrate(self.get_substrate_frame(frame))
+        except Exception:   # e.g., the frame isn't there (yet)
+            pass
+
+    def set_prefetch(self, depth=None, workers=None):
+        if depth is not None:
+            self.prefetch_depth = depth
+        if workers is not None:
+            self.prefetch_workers = workers
+        self.prefetcher.configure(self.prefetch_depth, self.prefetch_workers)
+
+    def read_substrate(self, fname, field_index, substrate_frame):
+        # current_time is in the matching output%08d.xml
+        current_time = self.get_frame_index().time(substrate_frame)
+        if current_time is None:
+            raise OSError("no current_time for " + fname)
+        return {'field': read_mat_rows(fname, [field_index])[0],
+                'current_time': current_time}
+
+    #------------------------------------------------------------
+    # Apply the transparency options to the cells' colors (Paul Nov 2020)
+    def cell_rgbas(self, rgbas, kinds):
+        rgbas = rgbas.copy()
+        alpha = rgbas[:,3]
+        is_rgba = (kinds == FILL_RGBA)
+        is_rgb = (kinds == FILL_RGB)
+        if self.enable_alpha:
+            alpha[is_rgba] = np.minimum(alpha[is_rgba] * 2.0, 1.0)  # cell_alpha_toggle
+            alpha[is_rgb] = self.default_alpha
+        else:
+            alpha[is_rgba | is_rgb] = 1.0
+        return rgbas
 
     #------------------------------------------------------------
     # def plot_svg(self, frame, rdel=''):
@@ -750,148 +1063,39 @@ class SubstrateTab(object):
         # global current_idx, axes_max
         global current_frame
         current_frame = frame
-        fname = "snapshot%08d.svg" % frame
-        full_fname = os.path.join(self.output_dir, fname)
         # with debug_view:
-            # print("plot_svg:", full_fname) 
-        # print("-- plot_svg:", full_fname) 
-        if not os.path.isfile(full_fname):
+            # print("plot_svg:", frame) 
+        try:
+            cells = self.get_cells(frame)
+        except OSError:
             print("Once output files are generated, click the slider.")   
             return
 
         # set background color 
         bgcolor = self.bgcolor;  # 1.0 for white 
 
-        xlist = deque()
-        ylist = deque()
-        rlist = deque()
-        rgba_list = deque() # Paul Nov 2020 
-
-        #  print('\n---- ' + fname + ':')
-#        tree = ET.parse(fname)
-        tree = ET.parse(full_fname)
-        root = tree.getroot()
-        #  print('--- root.tag ---')
-        #  print(root.tag)
-        #  print('--- root.attrib ---')
-        #  print(root.attrib)
-        #  print('--- child.tag, child.attrib ---')
-        numChildren = 0
-        for child in root:
-            #    print(child.tag, child.attrib)
-            #    print("keys=",child.attrib.keys())
-            if self.use_defaults and ('width' in child.attrib.keys()):
-                self.axes_max = float(child.attrib['width'])
-                # print("debug> found width --> axes_max =", axes_max)
-            if child.text and "Current time" in child.text:
-                svals = child.text.split()
-                # remove the ".00" on minutes
-                self.title_str += "   cells: " + svals[2] + "d, " + svals[4] + "h, " + svals[7][:-3] + "m"
-
-                # self.cell_time_mins = int(svals[2])*1440 + int(svals[4])*60 + int(svals[7][:-3])
-                # self.title_str += "   cells: " + str(self.cell_time_mins) + "m"   # rwh
-
-            # print("width ",child.attrib['width'])
-            # print('attrib=',child.attrib)
-            # if (child.attrib['id'] == 'tissue'):
-            if ('id' in child.attrib.keys()):
-                # print('-------- found tissue!!')
-                tissue_parent = child
-                break
-
-        # print('------ search tissue')
-        cells_parent = None
-
-        for child in tissue_parent:
-            # print('attrib=',child.attrib)
-            if (child.attrib['id'] == 'cells'):
-                # print('-------- found cells, setting cells_parent')
-                cells_parent = child
-                break
-            numChildren += 1
-
-        num_cells = 0
-        #  print('------ search cells')
-        for child in cells_parent:
-            #    print(child.tag, child.attrib)
-            #    print('attrib=',child.attrib)
-            for circle in child:  # two circles in each child: outer + nucleus
-                #  circle.attrib={'cx': '1085.59','cy': '1225.24','fill': 'rgb(159,159,96)','r': '6.67717','stroke': 'rgb(159,159,96)','stroke-width': '0.5'}
-                #      print('  --- cx,cy=',circle.attrib['cx'],circle.attrib['cy'])
-                xval = float(circle.attrib['cx'])
-
-                # map SVG coords into comp domain
-                # xval = (xval-self.svg_xmin)/self.svg_xrange * self.x_range + self.xmin
-                xval = xval/self.x_range * self.x_range + self.xmin
-
-                s = circle.attrib['fill']
-                # print("s=",s)
-                # print("type(s)=",type(s))
-                if( s[0:4] == "rgba" ):
-                    background = bgcolor[0] * 255.0; # coudl also be 255.0 for white
-                    rgba_float =list(map(float,s[5:-1].split(",")))
-                    r = rgba_float[0]
-                    g = rgba_float[1]
-                    b = rgba_float[2]
-                    alpha = rgba_float[3]
-                    alpha *= 2.0; # cell_alpha_toggle
-                    if( not self.enable_alpha or (alpha > 1.0) ):
-                        alpha = 1.0
-                    rgba = [1,1,1,alpha]
-                    rgba[0:3] = [ np.round(r), np.round(g), np.round(b) ];  
-                    rgba[0:3] = [x / 255. for x in rgba[0:3] ]  
-                elif (s[0:3] == "rgb" ):  # if an rgb string, e.g. "rgb(175,175,80)" 
-                    rgba = [1,1,1,1.0]
-                    if( self.enable_alpha ):
-                        rgba = [1,1,1,self.default_alpha]
-                    rgba[0:3] = list(map(int, s[4:-1].split(",")))  
-                    rgba[0:3] = [x / 255. for x in rgba[0:3] ]
-                else:     # otherwise, must be a color name
-                    rgb_tuple = mplc.to_rgb(mplc.cnames[s])  # a tuple
-                    rgba = [1,1,1,1.0]
-                    rgba[0:3] = [x for x in rgb_tuple]
-                # test for bogus x,y locations (rwh TODO: use max of domain?)
-                too_large_val = 10000.
-                if (np.fabs(xval) > too_large_val):
-                    print("bogus xval=", xval)
-                    break
-                yval = float(circle.attrib['cy'])
-                # yval = (yval - self.svg_xmin)/self.svg_xrange * self.y_range + self.ymin
-                yval = yval/self.y_range * self.y_range + self.ymin
-                if (np.fabs(yval) > too_large_val):
-                    print("bogus xval=", xval)
-                    break
-
-                rval = float(circle.attrib['r'])
-                # if (rgb[0] > rgb[1]):
-                #     print(num_cells,rgb, rval)
-                xlist.append(xval)
-                ylist.append(yval)
-                rlist.append(rval)
-
-                rgba_list.append(rgba)
-
-                # For .svg files with cells that *have* a nucleus, there will be a 2nd
-                if (not self.show_nucleus):
-                    break
-
-            num_cells += 1
-
-            # if num_cells > 3:   # for debugging
-            #   print(fname,':  num_cells= ',num_cells," --- debug exit.")
-            #   sys.exit(1)
-            #   break
-
-            # print(fname,':  num_cells= ',num_cells)
-
-        xvals = np.array(xlist)
-        yvals = np.array(ylist)
-        rvals = np.array(rlist)
-
-        rgbas = np.array(rgba_list)
-        # print("xvals[0:5]=",xvals[0:5])
-        # print("rvals[0:5]=",rvals[0:5])
-        # print("rvals.min, max=",rvals.min(),rvals.max())
+        if cells.variables is not None:   # from the cells .mat
+            cells = copy.copy(cells)
+            cells.rgba, cells.nucleus_rgba = self.mat_cell_colors(cells)
+        if self.use_defaults and cells.width:
+            self.axes_max = cells.width
+        if "Current time" in cells.time_text:
+            svals = cells.time_text.split()
+            # remove the ".00" on minutes
+            self.title_str += "   cells: " + svals[2] + "d, " + svals[4] + "h, " + svals[7][:-3] + "m"
+
+            # self.cell_time_mins = int(svals[2])*1440 + int(svals[4])*60 + int(svals[7][:-3])
+            # self.title_str += "   cells: " + str(self.cell_time_mins) + "m"   # rwh
+
+        num_cells = cells.num_cells
+        xvals, yvals, rvals, rgbas, kinds = cells.circles(self.show_nucleus)
+
+        if cells.variables is None:
+            # map SVG coords into comp domain
+            # xval = (xval-self.svg_xmin)/self.svg_xrange * self.x_range + self.xmin
+            xvals = xvals + self.xmin
+            yvals = yvals + self.ymin
+        rgbas = self.cell_rgbas(rgbas, kinds)
 
         # rwh - is this where I change size of render window?? (YES - yipeee!)
         #   plt.figure(figsize=(6, 6))
@@ -904,12 +1108,11 @@ class SubstrateTab(object):
             # hrs = int(mins/60)
             # days = int(hrs/24)
             # title_str = '%dd, %dh, %dm' % (int(days),(hrs%24), mins - (hrs*60))
-        plt.title(self.title_str)
-
-        plt.xlim(self.xmin, self.xmax)
-        plt.ylim(self.ymin, self.ymax)
+        self.renderer.set_title(self.title_str)
 
-        ax = plt.gca()
+        ax = self.renderer.ax
+        ax.set_xlim(self.xmin, self.xmax)
+        ax.set_ylim(self.ymin, self.ymax)
         ax.set_facecolor(bgcolor)
 
         #   plt.xlim(axes_min,axes_max)
@@ -924,14 +1127,10 @@ class SubstrateTab(object):
 #        print('fig.dpi=',fig.dpi) # = 72
 
         #rwh - temp fix - Ah, error only occurs when "edges" is toggled on
-        if (self.show_edge):
-            try:
-                self.circles(xvals,yvals, s=rvals, color=rgbas, edgecolor='black', linewidth=0.5 )
-                # cell_circles = self.circles(xvals,yvals, s=rvals, color=rgbs, edgecolor='black', linewidth=0.5)
-            except (ValueError):
-                pass
-        else:
-            self.circles(xvals,yvals, s=rvals, color=rgbas  )
+        try:
+            self.renderer.set_cells(xvals, yvals, rvals, rgbas, self.show_edge)
+        except (ValueError):
+            pass
 
         # if (self.show_tracks):
         #     for key in self.trackd.keys():
@@ -945,6 +1144,15 @@ class SubstrateTab(object):
 #        axx.set_title(title_str)
         # plt.title(title_str)
 
+    #---------------------------------------------------------------------------
+    # rwh - funky way to figure out substrate frame for pc4cancerbots (due to user-defined "save_interval*")
+    def get_substrate_frame(self, frame):
+        if (self.customized_output_freq and (frame > self.max_svg_frame_pre_therapy)):
+            # max_svg_frame_pre_therapy = int(self.therapy_activation_time/self.svg_delta_t)
+            # max_substrate_frame_pre_therapy = int(self.therapy_activation_time/self.substrate_delta_t)
+            return self.max_substrate_frame_pre_therapy + (frame - self.max_svg_frame_pre_therapy)
+        return int(frame / self.modulo)
+
     #---------------------------------------------------------------------------
     # assume "frame" is cell frame #, unless Cells is togggled off, then it's the substrate frame #
     # def plot_substrate(self, frame, grid):
@@ -971,17 +1179,11 @@ class SubstrateTab(object):
         if (self.substrates_toggle.value):
             # self.fig = plt.figure(figsize=(14, 15.6))
             # self.fig = plt.figure(figsize=(15.0, 12.5))
-            self.fig = plt.figure(figsize=(self.figsize_width_substrate, self.figsize_height_substrate))
+            ax = self.renderer.begin((self.figsize_width_substrate, self.figsize_height_substrate), with_colorbar=True)
 
-            # rwh - funky way to figure out substrate frame for pc4cancerbots (due to user-defined "save_interval*")
             # self.cell_time_mins 
             # self.substrate_frame = int(frame / self.modulo)
-            if (self.customized_output_freq and (frame > self.max_svg_frame_pre_therapy)):
-                # max_svg_frame_pre_therapy = int(self.therapy_activation_time/self.svg_delta_t)
-                # max_substrate_frame_pre_therapy = int(self.therapy_activation_time/self.substrate_delta_t)
-                self.substrate_frame = self.max_substrate_frame_pre_therapy + (frame - self.max_svg_frame_pre_therapy)
-            else:
-                self.substrate_frame = int(frame / self.modulo)
+            self.substrate_frame = self.get_substrate_frame(frame)
 
             # print("plot_substrate(): self.substrate_frame=",self.substrate_frame)        
 
@@ -994,26 +1196,17 @@ class SubstrateTab(object):
             #     self.substrate_frame = frame % self.modulo
             # else:
             #     self.substrate_frame = frame 
-            fname = "output%08d_microenvironment0.mat" % self.substrate_frame
-            xml_fname = "output%08d.xml" % self.substrate_frame
-            # fullname = output_dir_str + fname
-
-    #        fullname = fname
-            full_fname = os.path.join(self.output_dir, fname)
+            # fname = "output%08d_microenvironment0.mat" % self.substrate_frame
+            full_fname = self.get_frame_index().path(self.substrate_frame, 'mat')
             # print("--- plot_substrate(): full_fname=",full_fname)
-            full_xml_fname = os.path.join(self.output_dir, xml_fname)
-    #        self.output_dir = '.'
 
-    #        if not os.path.isfile(fullname):
-            if not os.path.isfile(full_fname):
+            if full_fname is None:
                 print("Once output files are generated, click the slider.")  # No:  output00000000_microenvironment0.mat
                 return
 
-    #        tree = ET.parse(xml_fname)
-            tree = ET.parse(full_xml_fname)
-            xml_root = tree.getroot()
-            mins = round(int(float(xml_root.find(".//current_time").text)))  # TODO: check units = mins
-            self.substrate_mins= round(int(float(xml_root.find(".//current_time").text)))  # TODO: check units = mins
+            substrate = self.load_substrate(self.substrate_frame)
+            mins = round(int(substrate['current_time']))  # TODO: check units = mins
+            self.substrate_mins = mins
 
             hrs = int(mins/60)
             days = int(hrs/24)
@@ -1021,13 +1214,9 @@ class SubstrateTab(object):
             # self.title_str = 'substrate: %dm' % (mins )   # rwh
 
 
-            info_dict = {}
-    #        scipy.io.loadmat(fullname, info_dict)
-            scipy.io.loadmat(full_fname, info_dict)
-            M = info_dict['multiscale_microenvironment']
             #     global_field_index = int(mcds_field.value)
             #     print('plot_substrate: field_index =',field_index)
-            f = M[self.field_index, :]   # 4=tumor cells field, 5=blood vessel density, 6=growth substrate
+            f = substrate['field']   # row field_index of the .mat: 4=tumor cells field, 5=blood vessel density, 6=growth substrate
             # plt.clf()
             # my_plot = plt.imshow(f.reshape(400,400), cmap='jet', extent=[0,20, 0,20])
         
@@ -1071,8 +1260,9 @@ class SubstrateTab(object):
             #     self.numy =  math.ceil( (self.ymax - self.ymin) / dy)
 
             try:
-                xgrid = M[0, :].reshape(self.numy, self.numx)
-                ygrid = M[1, :].reshape(self.numy, self.numx)
+                xrow, yrow = self.get_mesh(full_fname)
+                xgrid = xrow.reshape(self.numy, self.numx)
+                ygrid = yrow.reshape(self.numy, self.numx)
             except:
                 print("substrates.py: mismatched mesh size for reshape: numx,numy=",self.numx, self.numy)
                 pass
@@ -1081,39 +1271,31 @@ class SubstrateTab(object):
 
             num_contours = 15
             levels = MaxNLocator(nbins=num_contours).tick_values(self.cmap_min.value, self.cmap_max.value)
-            contour_ok = True
-            if (self.cmap_fixed_toggle.value):
-                try:
-                    #substrate_plot = main_ax.contourf(xgrid, ygrid, M[self.field_index, :].reshape(self.numy, self.numx), levels=levels, extend='both', cmap=self.field_cmap.value, fontsize=self.fontsize)
-                    substrate_plot = plt.contourf(xgrid, ygrid, M[self.field_index, :].reshape(self.numy, self.numx), levels=levels, extend='both', cmap=self.field_cmap.value, fontsize=self.fontsize)
-                except:
-                    contour_ok = False
-                    # print('got error on contourf 1.')
+            try:
+                zvals = f.reshape(self.numy, self.numx)
+            except:
+                zvals = None
+            if zvals is None:
+                contour_ok = False
+            elif (self.substrate_mode.value == 'raster'):
+                extent = [self.xmin, self.xmax, self.ymin, self.ymax]
+                if (self.cmap_fixed_toggle.value):
+                    contour_ok = self.renderer.set_image(zvals, extent, self.field_cmap.value, self.fontsize, self.cmap_min.value, self.cmap_max.value)
+                else:
+                    contour_ok = self.renderer.set_image(zvals, extent, self.field_cmap.value, self.fontsize)
+            elif (self.cmap_fixed_toggle.value):
+                contour_ok = self.renderer.set_contours(xgrid, ygrid, zvals, levels, self.field_cmap.value, self.fontsize, extend='both')
             else:    
-                try:
-                    #substrate_plot = main_ax.contourf(xgrid, ygrid, M[self.field_index, :].reshape(self.numy,self.numx), num_contours, cmap=self.field_cmap.value)
-                    substrate_plot = plt.contourf(xgrid, ygrid, M[self.field_index, :].reshape(self.numy,self.numx), num_contours, cmap=self.field_cmap.value)
-                except:
-                    contour_ok = False
-                    # print('got error on contourf 2.')
+                contour_ok = self.renderer.set_contours(xgrid, ygrid, zvals, num_contours, self.field_cmap.value, self.fontsize)
 
             if (contour_ok):
                 # main_ax.set_title(self.title_str, fontsize=self.fontsize)
-                plt.title(self.title_str, fontsize=self.fontsize)
-                # main_ax.tick_params(labelsize=self.fontsize)
-            # cbar = plt.colorbar(my_plot)
-                # cbar = self.fig.colorbar(substrate_plot, ax=main_ax)
-                cbar = self.fig.colorbar(substrate_plot)
-                cbar.ax.tick_params(labelsize=self.fontsize)
-                # cbar = main_ax.colorbar(my_plot)
-                # cbar.ax.tick_params(labelsize=self.fontsize)
+                self.renderer.set_title(self.title_str, fontsize=self.fontsize)
             # axes_min = 0
             # axes_max = 2000
 
-            # main_ax.set_xlim([self.xmin, self.xmax])
-            # main_ax.set_ylim([self.ymin, self.ymax])
-            plt.xlim(self.xmin, self.xmax)
-            plt.ylim(self.ymin, self.ymax)
+            ax.set_xlim(self.xmin, self.xmax)
+            ax.set_ylim(self.ymin, self.ymax)
 
             # if (frame == 0):  # maybe allow substrate grid display later
             #     xs = np.linspace(self.xmin,self.xmax,self.numx)
@@ -1132,11 +1314,19 @@ class SubstrateTab(object):
         if (self.cells_toggle.value):
             if (not self.substrates_toggle.value):
                 # self.fig = plt.figure(figsize=(12, 12))
-                self.fig = plt.figure(figsize=(self.figsize_width_svg, self.figsize_height_svg))
+                self.renderer.begin((self.figsize_width_svg, self.figsize_height_svg), with_colorbar=False)
             # self.plot_svg(frame)
             self.svg_frame = frame
             # print('plot_svg with frame=',self.svg_frame)
             self.plot_svg(self.svg_frame)
+        else:
+            self.renderer.clear_cells()
+
+        if (self.substrates_toggle.value or self.cells_toggle.value):
+            self.renderer.show()
+
+        # get the neighboring frames ready while this one is being looked at
+        self.prefetcher.prefetch(frame, self.max_frames.value)
 
         # plt.subplot(grid[2, 0])
         # oxy_ax = self.fig.add_subplot(grid[2:, 0:1])
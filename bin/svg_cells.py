@@ -0,0 +1,344 @@
+# Fast reader for the cells in PhysiCell's snapshot%08d.svg files
+#
+# Instead of building an ElementTree and walking every <circle> in Python, we scan the
+# raw bytes of a snapshot once and return the cells as columnar NumPy arrays. Fill colors
+# are parsed once per *distinct* color string (typically only a handful per snapshot)
+# and broadcast back to the cells. A CellStore keeps the parsed columns beside the run (see below).
+
+import os
+import re
+import json
+import threading
+import xml.etree.ElementTree as ET
+import numpy as np
+import matplotlib.colors as mplc
+
+# kinds of SVG "fill" strings; the Plots tab treats their alpha differently
+FILL_NAME = 0   # e.g. "red"
+FILL_RGB = 1    # e.g. "rgb(175,175,80)"
+FILL_RGBA = 2   # e.g. "rgba(175,175,80,0.5)"
+
+# test for bogus x,y locations (rwh TODO: use max of domain?)
+too_large_val = 10000.
+
+# PhysiCell's Write_SVG_circle always writes:  cx, cy, r, stroke-width, stroke, fill
+_circle_str = rb'<circle cx="([^"]*)" cy="([^"]*)" r="([^"]*)"[^>]*? fill="([^"]*)"[^>]*>'
+
+# one cell = <g id="cell123"> + outer circle + (optional) nucleus circle
+_cell_re = re.compile(rb'<g id="cell[^"]*">\s*' + _circle_str + rb'\s*(?:' + _circle_str + rb')?')
+_rect_width_re = re.compile(rb'<rect [^>]*?width="([^"]*)"')
+_svg_width_re = re.compile(rb'<svg [^>]*?width="([-+.\deE]+)')
+_time_re = re.compile(rb'(Current time:[^<]*?)\s*</text>')
+
+
+class CellFrame(object):
+    """Columnar cell data for one output frame.
+
+    x, y, r : float arrays, shape (n,)
+    rgba : float array, shape (n, 4), colors in [0,1]
+    kind : int8 array, shape (n,), one of FILL_NAME, FILL_RGB, FILL_RGBA
+    has_nucleus : bool array, shape (n,)
+    nucleus_r, nucleus_rgba, nucleus_kind : only for the cells where has_nucleus is True
+    variables : for cells read from a PhysiCell cells .mat, {name: array} of all of the cells' variables;
+        None for cells read from an .svg
+    """
+
+    def __init__(self, x, y, r, rgba, kind, has_nucleus, nucleus_r, nucleus_rgba, nucleus_kind,
+                 width=None, time_text='', variables=None):
+        self.x = x
+        self.y = y
+        self.r = r
+        self.rgba = rgba
+        self.kind = kind
+        self.has_nucleus = has_nucleus
+        self.nucleus_r = nucleus_r
+        self.nucleus_rgba = nucleus_rgba
+        self.nucleus_kind = nucleus_kind
+        self.width = width            # width of the SVG (background rect), if any
+        self.time_text = time_text    # e.g. "Current time: 0 days, 1 hours, and 0.00 minutes, z = 0.00 micron"
+        self.variables = variables
+
+    @property
+    def num_cells(self):
+        return len(self.x)
+
+    def circles(self, show_nucleus=False):
+        """Return (x, y, r, rgba, kind) of all circles to draw.
+
+        With show_nucleus, each nucleus directly follows its cell (same draw order as the SVG).
+        """
+        if not show_nucleus or not self.has_nucleus.any():
+            return self.x, self.y, self.r, self.rgba, self.kind
+
+        n = self.num_cells
+        num_nuclei = len(self.nucleus_r)
+        # index of each cell in the interleaved output, then its nucleus (if any) right after it
+        cell_idx = np.arange(n) + np.concatenate(([0], np.cumsum(self.has_nucleus)[:-1]))
+        nucleus_idx = cell_idx[self.has_nucleus] + 1
+
+        x = np.empty(n + num_nuclei)
+        y = np.empty(n + num_nuclei)
+        r = np.empty(n + num_nuclei)
+        rgba = np.empty((n + num_nuclei, 4))
+        kind = np.empty(n + num_nuclei, dtype=np.int8)
+        x[cell_idx], x[nucleus_idx] = self.x, self.x[self.has_nucleus]
+        y[cell_idx], y[nucleus_idx] = self.y, self.y[self.has_nucleus]
+        r[cell_idx], r[nucleus_idx] = self.r, self.nucleus_r
+        rgba[cell_idx], rgba[nucleus_idx] = self.rgba, self.nucleus_rgba
+        kind[cell_idx], kind[nucleus_idx] = self.kind, self.nucleus_kind
+        return x, y, r, rgba, kind
+
+
+def parse_fills(fills):
+    """Map an array of SVG fill strings (bytes) to (rgba, kind) arrays.
+
+    Each distinct string is parsed only once.
+    """
+    if len(fills) == 0:
+        return np.zeros((0, 4)), np.zeros(0, dtype=np.int8)
+
+    uniq, inverse = np.unique(np.asarray(fills, dtype=bytes), return_inverse=True)
+    rgba = np.ones((len(uniq), 4))
+    kind = np.zeros(len(uniq), dtype=np.int8)
+    for idx, s in enumerate(uniq):
+        s = s.decode().strip()
+        if s[0:4] == "rgba":
+            vals = list(map(float, s[5:-1].split(",")))
+            rgba[idx, 0:3] = np.round(vals[0:3]) / 255.
+            rgba[idx, 3] = vals[3]
+            kind[idx] = FILL_RGBA
+        elif s[0:3] == "rgb":  # if an rgb string, e.g. "rgb(175,175,80)"
+            rgba[idx, 0:3] = np.array(list(map(float, s[4:-1].split(",")))) / 255.
+            kind[idx] = FILL_RGB
+        else:     # otherwise, must be a color name
+            rgba[idx, 0:3] = mplc.to_rgb(s)
+            kind[idx] = FILL_NAME
+    inverse = inverse.ravel()
+    return rgba[inverse], kind[inverse]
+
+
+def read_svg_cells(fname):
+    """Read the cells of a PhysiCell snapshot .svg into a CellFrame."""
+    with open(fname, 'rb') as f:
+        buf = f.read()
+
+    # everything before the cells: background rect (width) and the "Current time" text
+    idx = buf.find(b'<g id="cells"')
+    header = buf[:idx] if idx > 0 else buf
+
+    # the domain's width: the background rect (at the top level, i.e., before any <g>, not e.g. one
+    # drawn inside the tissue for a substrate), else the <svg>'s width
+    width = None
+    g = header.find(b'<g')
+    widths = _rect_width_re.findall(header[:g] if g >= 0 else header) or _svg_width_re.findall(header)
+    if widths:
+        try:
+            width = float(widths[0])
+        except ValueError:
+            pass
+    time_text = ''
+    m = _time_re.search(header)
+    if m:
+        time_text = m.group(1).decode(errors='replace').strip()
+
+    cells = _cell_re.findall(buf, idx if idx > 0 else 0)
+    if not cells and b'<circle' in buf[idx:]:
+        # not the layout that PhysiCell writes; take the slow road
+        return _iterparse_svg_cells(fname, width, time_text)
+
+    if cells:
+        cols = np.array(cells, dtype=bytes).T    # (8, n)
+    else:
+        cols = np.zeros((8, 0), dtype=bytes)
+    x = cols[0].astype(float)
+    y = cols[1].astype(float)
+    r = cols[2].astype(float)
+    rgba, kind = parse_fills(cols[3])
+    has_nucleus = cols[4] != b''
+    nucleus_r = cols[6][has_nucleus].astype(float)
+    nucleus_rgba, nucleus_kind = parse_fills(cols[7][has_nucleus])
+
+    return _make_frame(x, y, r, rgba, kind, has_nucleus, nucleus_r, nucleus_rgba, nucleus_kind, width, time_text)
+
+
+def _iterparse_svg_cells(fname, width, time_text):
+    # Generic (slower) reader: each child <g> of <g id="cells"> holds a cell and, optionally, its nucleus
+    cols = [[] for _ in range(8)]
+    in_cells = False
+    depth = 0
+    for event, elm in ET.iterparse(fname, events=('start', 'end')):
+        tag = elm.tag.rsplit('}', 1)[-1]
+        if event == 'start':
+            if tag == 'g' and elm.attrib.get('id') == 'cells':
+                in_cells = True
+                depth = 0
+            elif in_cells and tag == 'g':
+                depth += 1
+            continue
+        if not in_cells:
+            continue
+        if tag == 'g' and depth == 0:   # end of the cells group
+            break
+        if tag == 'g' and depth == 1:
+            circles = [c for c in elm if c.tag.rsplit('}', 1)[-1] == 'circle']
+            if circles:
+                c = circles[0]
+                cols[0].append(c.attrib['cx'])
+                cols[1].append(c.attrib['cy'])
+                cols[2].append(c.attrib['r'])
+                cols[3].append(c.attrib['fill'])
+                if len(circles) > 1:
+                    cols[6].append(circles[1].attrib['r'])
+                    cols[7].append(circles[1].attrib['fill'])
+                else:
+                    cols[6].append('')
+                    cols[7].append('')
+            elm.clear()
+            depth -= 1
+        elif tag == 'g':
+            depth -= 1
+
+    x = np.array(cols[0], dtype=float)
+    y = np.array(cols[1], dtype=float)
+    r = np.array(cols[2], dtype=float)
+    rgba, kind = parse_fills([s.encode() for s in cols[3]])
+    has_nucleus = np.array([s != '' for s in cols[6]], dtype=bool)
+    nucleus_r = np.array([s for s in cols[6] if s], dtype=float)
+    nucleus_rgba, nucleus_kind = parse_fills([s.encode() for s in cols[7] if s])
+
+    return _make_frame(x, y, r, rgba, kind, has_nucleus, nucleus_r, nucleus_rgba, nucleus_kind, width, time_text)
+
+
+def _make_frame(x, y, r, rgba, kind, has_nucleus, nucleus_r, nucleus_rgba, nucleus_kind, width, time_text):
+    # drop cells at bogus locations
+    ok = (np.fabs(x) <= too_large_val) & (np.fabs(y) <= too_large_val)
+    if not ok.all():
+        print("bogus xval=", x[~ok][0])
+        nucleus_ok = ok[has_nucleus]
+        x, y, r, rgba, kind = x[ok], y[ok], r[ok], rgba[ok], kind[ok]
+        nucleus_r, nucleus_rgba, nucleus_kind = nucleus_r[nucleus_ok], nucleus_rgba[nucleus_ok], nucleus_kind[nucleus_ok]
+        has_nucleus = has_nucleus[ok]
+    return CellFrame(x, y, r, rgba, kind, has_nucleus, nucleus_r, nucleus_rgba, nucleus_kind,
+                     width=width, time_text=time_text)
+
+
+#---------------------------------------------------------------------------
+# Sidecar store: parsed cells, saved inside the run directory
+#
+# The first parse of a snapshot writes its cell columns to <run>/.svg_cells/snapshot%08d.npy (one record
+# per cell) and appends the source .svg's mtime and size to index.jsonl (one line per saved frame, the
+# last one for a frame wins; appending keeps a long run's saves O(1)). Later sessions memory-map
+# the .npy (no parsing, no copying) as long as the .svg hasn't changed; otherwise, re-parse.
+
+sidecar_dir_name = '.svg_cells'
+
+_cell_dtype = np.dtype([('x', 'f4'), ('y', 'f4'), ('r', 'f4'), ('rgba', 'f4', (4,)), ('kind', 'i1'),
+                        ('has_nucleus', '?'), ('nucleus_r', 'f4'), ('nucleus_rgba', 'f4', (4,)), ('nucleus_kind', 'i1')])
+
+
+class CellStore(object):
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.dir = os.path.join(output_dir, sidecar_dir_name)
+        self.index_file = os.path.join(self.dir, 'index.jsonl')
+        self.writable = True
+        self._lock = threading.Lock()
+        self.manifest = {}   # snapshot name -> its entry
+        num_lines, torn = 0, False
+        try:
+            with open(self.index_file) as f:
+                for line in f:
+                    num_lines += 1
+                    torn = not line.endswith('\n')
+                    try:
+                        entry = json.loads(line)
+                        self.manifest[entry['name']] = entry
+                    except (ValueError, KeyError, TypeError):   # (e.g., a line cut short by a crash)
+                        pass
+        except OSError:
+            pass
+        # mostly superseded entries, or a last line cut short (the next one would be appended to it); compact it
+        if torn or num_lines > 2 * len(self.manifest) + 100:
+            self._compact()
+
+    def _compact(self):
+        try:
+            with open(self.index_file + '.tmp', 'w') as f:
+                for entry in self.manifest.values():
+                    f.write(json.dumps(entry) + '\n')
+            os.replace(self.index_file + '.tmp', self.index_file)
+        except OSError:
+            pass
+
+    def read(self, fname):
+        """Return the CellFrame for this snapshot .svg, from the sidecar if it's still valid."""
+        st = os.stat(fname)
+        name = os.path.basename(fname)
+        entry = self.manifest.get(name)
+        if entry and entry['mtime_ns'] == st.st_mtime_ns and entry['size'] == st.st_size:
+            try:
+                return self._load(name, entry)
+            except (OSError, ValueError):
+                pass
+
+        cells = read_svg_cells(fname)
+        if self.writable:
+            self._save(name, st, cells)
+        return cells
+
+    def _npy_file(self, name):
+        return os.path.join(self.dir, os.path.splitext(name)[0] + '.npy')
+
+    def _load(self, name, entry):
+        rec = np.load(self._npy_file(name), mmap_mode='r')
+        has_nucleus = np.asarray(rec['has_nucleus'])
+        return CellFrame(rec['x'], rec['y'], rec['r'], rec['rgba'], rec['kind'], has_nucleus,
+                         rec['nucleus_r'][has_nucleus], rec['nucleus_rgba'][has_nucleus], rec['nucleus_kind'][has_nucleus],
+                         width=entry['width'], time_text=entry['time_text'])
+
+    def _save(self, name, st, cells):
+        rec = np.zeros(cells.num_cells, dtype=_cell_dtype)
+        rec['x'], rec['y'], rec['r'] = cells.x, cells.y, cells.r
+        rec['rgba'], rec['kind'] = cells.rgba, cells.kind
+        rec['has_nucleus'] = cells.has_nucleus
+        rec['nucleus_r'][cells.has_nucleus] = cells.nucleus_r
+        rec['nucleus_rgba'][cells.has_nucleus] = cells.nucleus_rgba
+        rec['nucleus_kind'][cells.has_nucleus] = cells.nucleus_kind
+        try:
+            os.makedirs(self.dir, exist_ok=True)
+            npy_file = self._npy_file(name)
+            with open(npy_file + '.tmp', 'wb') as f:
+                np.save(f, rec)
+            os.replace(npy_file + '.tmp', npy_file)
+            entry = {'name': name, 'mtime_ns': st.st_mtime_ns, 'size': st.st_size,
+                     'width': cells.width, 'time_text': cells.time_text}
+            with self._lock:
+                self.manifest[name] = entry
+                with open(self.index_file, 'a') as f:
+                    f.write(json.dumps(entry) + '\n')
+        except OSError:   # e.g., a read-only (shared) run directory
+            self.writable = False
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def cell_store(output_dir):
+    """The (one) CellStore for a run directory."""
+    output_dir = os.path.abspath(output_dir)
+    with _stores_lock:
+        if output_dir not in _stores:
+            _stores[output_dir] = CellStore(output_dir)
+        return _stores[output_dir]
+
+
+def forget_cell_store(output_dir):
+    """Drop the CellStore for a run directory, e.g. when a new run starts in it"""
+    with _stores_lock:
+        _stores.pop(os.path.abspath(output_dir), None)
+
+
+def read_cells(fname):
+    """Like read_svg_cells(), but goes through the run directory's sidecar store."""
+    return cell_store(os.path.dirname(fname)).read(fname)
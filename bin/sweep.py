@@ -0,0 +1,232 @@
+# Parameter sweeps, run locally
+#
+# The sweep is given as one line per parameter, "<name> = <values>", where <name> is a widget of one of
+# the input tabs (e.g., "resource_D" or "user_tab.resource_D") and <values> is a list ("1, 2, 5"), or
+# "start:stop:num" (evenly spaced, inclusive) or "start:stop:num:log" (log spaced). One config.xml is
+# written per point of the (full factorial) grid, using the tabs' own fill_xml, into its own directory
+# in the cache dir, so the "Load Config" dropdown lists the results like any other cached run.
+#
+# The runs share the cores that are free (see bin/omp_planner.py): N runs at a time, each with cores/N
+# OpenMP threads, pinned to its own cores.
+
+import os
+import time
+import datetime
+import itertools
+import json
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from config_hash import record_config_hash
+from omp_planner import planner
+from telemetry import Telemetry
+from run_dirs import localize_config
+from refresh_scheduler import kernel_loop, call_on_loop
+from ipywidgets import Layout, Label, Button, HBox, VBox, Textarea, BoundedIntText
+
+
+def plan_budget(num_points, cores, max_concurrent=0):
+    """(# of concurrent runs, OpenMP threads per run) for num_points runs on cores cores"""
+    concurrent = min(num_points, cores)
+    if max_concurrent > 0:
+        concurrent = min(concurrent, max_concurrent)
+    concurrent = max(concurrent, 1)
+    return concurrent, max(1, cores // concurrent)
+
+
+def parse_values(text):
+    text = text.strip()
+    if ':' in text:
+        parts = [p.strip() for p in text.split(':')]
+        start, stop, num = float(parts[0]), float(parts[1]), int(parts[2])
+        if len(parts) > 3 and parts[3] == 'log':
+            return np.logspace(np.log10(start), np.log10(stop), num).tolist()
+        return np.linspace(start, stop, num).tolist()
+    values = []
+    for v in text.split(','):
+        v = v.strip()
+        try:
+            values.append(int(v))
+        except ValueError:
+            try:
+                values.append(float(v))
+            except ValueError:
+                values.append(v)
+    return values
+
+
+def parse_sweep(text, tabs):
+    """[(tab name, widget attribute name, [values]), ...] from the sweep spec; tabs is {'user_tab': user_tab, ...}"""
+    params = []
+    for line in text.splitlines():
+        line = line.split('#')[0].strip()
+        if not line:
+            continue
+        if '=' not in line:
+            raise ValueError('expected "<name> = <values>": %s' % line)
+        name, values = [s.strip() for s in line.split('=', 1)]
+        if '.' in name:
+            tab_name, attr = name.split('.', 1)
+            if tab_name not in tabs or not hasattr(getattr(tabs[tab_name], attr, None), 'value'):
+                raise ValueError('unknown parameter: %s' % name)
+        else:
+            attr = name
+            found = [t for t in tabs if hasattr(getattr(tabs[t], attr, None), 'value')]
+            if not found:
+                raise ValueError('unknown parameter: %s' % name)
+            tab_name = found[0]
+        values = parse_values(values)
+        if not values:
+            raise ValueError('no values for %s' % name)
+        value = getattr(tabs[tab_name], attr).value
+        if isinstance(value, int) and not isinstance(value, bool):   # an IntText etc.: round the grid to ints
+            try:
+                values = list(dict.fromkeys(int(round(v)) for v in values))
+            except (TypeError, ValueError):
+                raise ValueError('%s takes integers' % name)
+        params.append((tab_name, attr, values))
+    return params
+
+
+class Sweep(object):
+
+    def __init__(self, tabs, write_config, executable, cache_dir, config_dir, done_func=None):
+        self.tabs = tabs                    # {'config_tab': config_tab, 'user_tab': user_tab, ...}
+        self.write_config = write_config    # write_config(fname) writes a config.xml from the tabs' widgets, returns its hash
+        self.executable = executable
+        self.cache_dir = cache_dir          # cache_dir() -> where the runs go
+        self.config_dir = config_dir        # where relative paths in the config are from (i.e., tmpdir)
+        self.done_func = done_func          # done_func(rdir), after each run (on the kernel's thread)
+        self.loop = kernel_loop()           # (the runs end on the pool's threads; widgets are updated on this one)
+        self.procs = {}
+        self.hashes = {}    # run dir -> its config's hash (before localize_config)
+        self.cancelled = False
+        self._lock = threading.Lock()
+        self._pool = None
+
+        self.spec = Textarea(placeholder='resource_D = 1e4:1e5:3:log\nquorum_lambda = 1, 10',
+                             description='Sweep', layout=Layout(width='500px', height='80px'))
+        self.max_concurrent = BoundedIntText(value=0, min=0, max=1024, description='Max runs',
+                                             tooltip='Max # of simulations at a time (0 = one per core)',
+                                             layout=Layout(width='160px'))
+        self.run_button = Button(description='Run Sweep', button_style='success')
+        self.run_button.on_click(lambda b: self.start())
+        self.cancel_button = Button(description='Cancel', button_style='danger', disabled=True)
+        self.cancel_button.on_click(lambda b: self.cancel())
+        self.status = Label('')
+        self.w = VBox([HBox([self.spec, VBox([self.max_concurrent, HBox([self.run_button, self.cancel_button])])]),
+                       self.status])
+
+    @property
+    def running(self):
+        return self._pool is not None
+
+    def start(self):
+        if self.running:
+            return
+        try:
+            params = parse_sweep(self.spec.value, self.tabs)
+        except ValueError as e:
+            self.status.value = str(e)
+            return
+        if not params:
+            self.status.value = 'Nothing to sweep.'
+            return
+
+        points = list(itertools.product(*[values for name, attr, values in params]))
+        concurrent, threads = plan_budget(len(points), planner().propose()[0], self.max_concurrent.value)
+        rdirs = self.write_configs(params, points, threads)
+
+        self.cancelled = False
+        self.num_done = self.num_failed = 0
+        self.num_points = len(points)
+        self.run_button.disabled = True
+        self.cancel_button.disabled = False
+        self.status.value = '%d runs: %d at a time, %d threads each' % (len(points), concurrent, threads)
+        self._pool = ThreadPoolExecutor(max_workers=concurrent)
+        futures = [self._pool.submit(self.run_one, rdir, threads) for rdir in rdirs]
+        threading.Thread(target=self._wait, args=(futures,), name='sweep', daemon=True).start()
+
+    def write_configs(self, params, points, threads):
+        """One run dir (with config.xml) per point; the widgets are put back as they were."""
+        stamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        widgets = [getattr(self.tabs[name], attr) for name, attr, values in params]
+        saved = [w.value for w in widgets]
+        rdirs = []
+        try:
+            for k, point in enumerate(points):
+                for w, value in zip(widgets, point):
+                    w.value = value
+                rdir = os.path.join(self.cache_dir(), 'sweep_%s_%03d' % (stamp, k))
+                os.makedirs(rdir)
+                config_file = os.path.join(rdir, 'config.xml')
+                self.hashes[rdir] = self.write_config(config_file)
+                localize_config(config_file, self.config_dir, threads)
+                with open(os.path.join(rdir, 'sweep.json'), 'w') as f:
+                    json.dump({'%s.%s' % (name, attr): value for (name, attr, values), value in zip(params, point)}, f)
+                rdirs.append(rdir)
+        finally:
+            for w, value in zip(widgets, saved):
+                w.value = value
+        return rdirs
+
+    def run_one(self, rdir, threads):
+        if self.cancelled:
+            return None
+        env = planner().start(rdir, threads)
+        start = time.time()
+        try:
+            with open(os.path.join(rdir, 'output.log'), 'w') as log:
+                proc = subprocess.Popen([self.executable, 'config.xml'], cwd=rdir, env=env,
+                                        stdout=log, stderr=subprocess.STDOUT)
+                with self._lock:
+                    self.procs[rdir] = proc
+                telemetry = Telemetry(proc.pid, rdir, interval=2.0)
+                telemetry.start()
+                returncode = proc.wait()
+                telemetry.stop()
+                with self._lock:
+                    del self.procs[rdir]
+        finally:
+            planner().finish(rdir)
+
+        with self._lock:
+            self.num_done += 1
+            if returncode != 0:
+                self.num_failed += 1
+            status = '%d of %d runs done' % (self.num_done, self.num_points) + \
+                     (' (%d failed)' % self.num_failed if self.num_failed else '')
+        call_on_loop(self.loop, self._say, status)
+        if returncode == 0:
+            record_config_hash(rdir, self.executable, self.hashes.get(rdir))
+            planner().record_run(self.cache_dir(), self.executable, rdir, time.time() - start)
+            if self.done_func is not None:
+                call_on_loop(self.loop, self.done_func, rdir)
+        return returncode
+
+    def _say(self, text):
+        self.status.value = text
+
+    def _wait(self, futures):
+        for f in futures:
+            try:
+                f.result()
+            except Exception as e:
+                call_on_loop(self.loop, self._say, 'sweep error: %s' % e)
+        self._pool.shutdown()
+        call_on_loop(self.loop, self._finished)
+
+    # (on the kernel's thread, after any done_func calls still pending there)
+    def _finished(self):
+        self._pool = None
+        self.run_button.disabled = False
+        self.cancel_button.disabled = True
+        if self.cancelled:
+            self.status.value = 'Cancelled after %d of %d runs.' % (self.num_done, self.num_points)
+
+    def cancel(self):
+        self.cancelled = True   # runs not started yet are skipped
+        with self._lock:
+            for proc in self.procs.values():
+                proc.terminate()
@@ -0,0 +1,234 @@
+# Resource telemetry of a simulation: CPU, memory, I/O and threads of myproj (and any children)
+#
+# A Telemetry samples the process tree every `interval` secs on a background thread, using psutil if it's
+# installed, else /proc (Linux). When stopped, it writes <run dir>/telemetry.csv (the time series,
+# thinned to at most max_samples rows) and <run dir>/telemetry.json (a summary: wall and CPU time,
+# average CPU, peak RSS, bytes read/written, max threads, size of the output).
+# TelemetryTab shows them for a run, next to the plots.
+
+import os
+import csv
+import json
+import time
+import threading
+from ipywidgets import Layout, HTML, VBox, Output
+from IPython.display import display
+import matplotlib.pyplot as plt
+
+psutil_flag = True
+try:
+    import psutil
+except:
+    psutil_flag = False
+
+telemetry_csv = 'telemetry.csv'
+telemetry_json = 'telemetry.json'
+columns = ['secs', 'cpu_pct', 'rss_mb', 'read_mb', 'write_mb', 'threads']
+_clock_ticks = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+_page_size = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+MB = 1024. * 1024.
+
+
+def _proc_children(pid):
+    """pids of pid's descendants, from /proc/*/stat"""
+    parents = {}
+    for name in os.listdir('/proc'):
+        if name.isdigit():
+            try:
+                with open('/proc/%s/stat' % name) as f:
+                    stat = f.read()
+                parents.setdefault(int(stat[stat.rindex(')') + 2:].split()[1]), []).append(int(name))
+            except (OSError, ValueError):
+                pass
+    found, todo = [], [pid]
+    while todo:
+        kids = parents.get(todo.pop(), [])
+        found += kids
+        todo += kids
+    return found
+
+
+def _proc_sample(pid):
+    """(cpu secs, rss bytes, read bytes, write bytes, threads) of one process, from /proc"""
+    with open('/proc/%d/stat' % pid) as f:
+        stat = f.read()
+    fields = stat[stat.rindex(')') + 2:].split()
+    cpu = (int(fields[11]) + int(fields[12])) / _clock_ticks   # utime + stime
+    threads = int(fields[17])
+    rss = int(fields[21]) * _page_size
+    read = write = 0
+    try:
+        with open('/proc/%d/io' % pid) as f:
+            for line in f:
+                key, val = line.split(':')
+                if key == 'read_bytes':
+                    read = int(val)
+                elif key == 'write_bytes':
+                    write = int(val)
+    except (OSError, ValueError):   # e.g., not allowed
+        pass
+    return cpu, rss, read, write, threads
+
+
+def sample_tree(pid):
+    """(cpu secs, rss, read bytes, write bytes, threads) summed over pid and its descendants"""
+    totals = [0, 0, 0, 0, 0]
+    if psutil_flag:
+        try:
+            root = psutil.Process(pid)
+            procs = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return None
+        for p in procs:
+            try:
+                with p.oneshot():
+                    t = p.cpu_times()
+                    vals = [t.user + t.system, p.memory_info().rss, 0, 0, p.num_threads()]
+                    if hasattr(p, 'io_counters'):
+                        io = p.io_counters()
+                        vals[2:4] = io.read_bytes, io.write_bytes
+            except psutil.Error:
+                continue
+            totals = [a + b for a,b in zip(totals, vals)]
+        return totals
+    if not os.path.isdir('/proc/%d' % pid):
+        return None
+    for p in [pid] + _proc_children(pid):
+        try:
+            totals = [a + b for a,b in zip(totals, _proc_sample(p))]
+        except (OSError, ValueError, IndexError):
+            pass
+    return totals
+
+
+class Telemetry(object):
+
+    def __init__(self, pid, rdir, interval=1.0, max_samples=1000):
+        self.pid = pid
+        self.rdir = rdir
+        self.interval = interval
+        self.max_samples = max_samples
+        self.samples = []       # rows of `columns`
+        self.summary = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._start = None
+        self._last = None       # (time, cpu secs) of the previous sample
+        self.cpu_secs = 0
+
+    def start(self):
+        self._start = time.time()
+        self._thread = threading.Thread(target=self._run, name='telemetry', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling and write the telemetry files; returns the summary"""
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2*self.interval)
+        self.summary = self._summarize(time.time() - self._start)
+        self.save()
+        return self.summary
+
+    def _run(self):
+        while True:
+            self.sample()
+            if self._stop.wait(self.interval):
+                return
+
+    def sample(self):
+        vals = sample_tree(self.pid)
+        if vals is None:   # (gone)
+            return
+        cpu, rss, read, write, threads = vals
+        now = time.time()
+        if self._last is not None and now > self._last[0]:
+            cpu_pct = 100. * max(0, cpu - self._last[1]) / (now - self._last[0])
+        else:
+            cpu_pct = 0.
+        self._last = (now, cpu)
+        self.cpu_secs = cpu
+        self.samples.append([round(now - self._start, 2), round(cpu_pct, 1), round(rss / MB, 1),
+                             round(read / MB, 2), round(write / MB, 2), threads])
+        if len(self.samples) > self.max_samples:   # thin out the older half, keep it compact
+            half = len(self.samples) // 2
+            self.samples = self.samples[:half:2] + self.samples[half:]
+
+    def _summarize(self, wall):
+        s = self.samples
+        summary = {'wall_secs': round(wall, 1), 'cpu_secs': round(self.cpu_secs, 1),
+                   'avg_cpu_pct': round(100. * self.cpu_secs / wall, 1) if wall > 0 else 0,
+                   'peak_rss_mb': max([r[2] for r in s] or [0]),
+                   'read_mb': s[-1][3] if s else 0, 'write_mb': s[-1][4] if s else 0,
+                   'max_threads': max([r[5] for r in s] or [0]),
+                   'samples': len(s), 'source': 'psutil' if psutil_flag else '/proc'}
+        try:
+            summary['output_mb'] = round(sum(e.stat().st_size for e in os.scandir(self.rdir) if e.is_file()) / MB, 1)
+        except OSError:
+            pass
+        return summary
+
+    def save(self):
+        try:
+            with open(os.path.join(self.rdir, telemetry_csv), 'w', newline='') as f:
+                w = csv.writer(f)
+                w.writerow(columns)
+                w.writerows(self.samples)
+            with open(os.path.join(self.rdir, telemetry_json), 'w') as f:
+                json.dump(self.summary, f, indent=1)
+        except OSError:
+            pass
+
+
+def read_telemetry(rdir):
+    """(summary, samples) saved in a run dir, or (None, [])"""
+    try:
+        with open(os.path.join(rdir, telemetry_json)) as f:
+            summary = json.load(f)
+        with open(os.path.join(rdir, telemetry_csv)) as f:
+            rows = list(csv.reader(f))[1:]
+        return summary, [[float(v) for v in row] for row in rows]
+    except (OSError, ValueError):
+        return None, []
+
+
+class TelemetryTab(object):
+
+    def __init__(self):
+        self.summary = HTML('')
+        self.plot = Output(layout=Layout(height='auto'))
+        self.tab = VBox([self.summary, self.plot])
+        self.update('')
+
+    def update(self, rdir):
+        summary, samples = read_telemetry(rdir) if rdir else (None, [])
+        self.plot.clear_output(wait=True)
+        if summary is None:
+            self.summary.value = '<i>No resource telemetry for this run.</i>'
+            return
+        rows = [('Wall time', '%.1f s' % summary['wall_secs']),
+                ('CPU time', '%.1f s (avg %.0f%%)' % (summary['cpu_secs'], summary['avg_cpu_pct'])),
+                ('Peak RSS', '%.1f MB' % summary['peak_rss_mb']),
+                ('Read / written', '%.1f / %.1f MB' % (summary['read_mb'], summary['write_mb'])),
+                ('Max threads', '%d' % summary['max_threads'])]
+        if 'output_mb' in summary:
+            rows.append(('Output', '%.1f MB' % summary['output_mb']))
+        self.summary.value = '<table>' + ''.join('<tr><td><b>%s</b></td><td>%s</td></tr>' % r for r in rows) + '</table>'
+        if not samples:
+            return
+        secs = [r[0] for r in samples]
+        fig, axes = plt.subplots(1, 3, figsize=(15, 3))
+        axes[0].plot(secs, [r[1] for r in samples])
+        axes[0].set_title('CPU (%)')
+        axes[1].plot(secs, [r[2] for r in samples])
+        axes[1].set_title('RSS (MB)')
+        axes[2].plot(secs, [r[4] for r in samples], label='written')
+        axes[2].plot(secs, [r[3] for r in samples], label='read')
+        axes[2].set_title('I/O (MB)')
+        axes[2].legend()
+        for ax in axes:
+            ax.set_xlabel('secs')
+        fig.tight_layout()
+        with self.plot:
+            display(fig)
+        plt.close(fig)
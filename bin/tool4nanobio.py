@@ -3,9 +3,9 @@ import xml.etree.ElementTree as ET  # https://docs.python.org/2/library/xml.etre
 import os
 import glob
 import shutil
+import tempfile
 import math
 import datetime
-import tempfile
 from about import AboutTab
 from config import ConfigTab
 from microenv_params import MicroenvTab
@@ -17,10 +17,21 @@ except:
     pass
 # from svg import SVGTab
 from substrates import SubstrateTab
+from refresh_scheduler import call_on_loop
+from field_store import consolidate_in_background
+from run_manager import RunManager
+from sweep import Sweep
+from config_hash import config_hash, record_config_hash, executable_id
+from run_catalog import run_catalog
+from run_dirs import new_run_dir, move_run_dir, RunDirReaper
+from omp_planner import planner
+from job_queue import JobQueue, JobQueuePanel, job_queue_flag
+from telemetry import TelemetryTab
+from stop_conditions import StopMonitor
+from config_doc import ConfigDoc
 # from animate_tab import AnimateTab
 from pathlib import Path
 import platform
-import subprocess
 from debug import debug_view
 
 hublib_flag = True
@@ -34,6 +45,19 @@ if platform.system() != 'Windows':
 else:
     hublib_flag = False
 
+# after a run, consolidate its substrate .mat files into one memory-mapped store (bin/field_store.py);
+# faster scrubbing of the substrates, for another copy of them in the cache dir
+consolidate_fields_flag = False
+
+# offer to load a cached run with the same config (and executable) instead of rerunning it (bin/config_hash.py)
+reuse_cached_runs_flag = True
+
+myproj = os.path.abspath(os.path.join('bin', 'myproj'))
+
+# old tmpdirs: keep the most recent one, if it's under 1 GB (bin/run_dirs.py)
+run_dir_reaper = RunDirReaper('.', 'tmpdir', keep=1, quota=1 << 30)
+run_dir_reaper.wake()
+
 
 # join_our_list = "(Join/ask questions at https://groups.google.com/forum/#!forum/physicell-users)\n"
 
@@ -58,6 +82,7 @@ if xml_root.find('.//cell_definitions'):
 
 # svg = SVGTab()
 sub = SubstrateTab()
+telemetry_tab = TelemetryTab()   # the (resource) cost of the run being shown
 # animate_tab = AnimateTab()
 
 nanoHUB_flag = False
@@ -118,6 +143,7 @@ def read_config_cb(_b):
         # print("read_config_cb():  is_dir True, calling update_params")
         sub.update_params(config_tab, user_tab)
         sub.update(read_config.value)
+        telemetry_tab.update(read_config.value)
     # else:  # may want to distinguish "DEFAULT" from other saved .xml config files
         # FIXME: really need a call to clear the visualizations
         # svg.update('')
@@ -129,24 +155,35 @@ def read_config_cb(_b):
         # pass
         
 
-# Using the param values in the GUI, write a new .xml config file
-def write_config_file(name):
+# Using the param values in the GUI, fill in a new .xml config tree
+def fill_config_tree():
+    # (one ConfigDoc, indexed once, serves all the tabs' finds; bin/config_doc.py)
+    doc = ConfigDoc.parse(full_xml_filename)  # this file cannot be overwritten; part of tool distro
+    config_tab.fill_xml(doc)
+    microenv_tab.fill_xml(doc)
+    user_tab.fill_xml(doc)
+    if doc.find('.//cell_definitions'):
+        cell_types_tab.fill_xml(doc)
+    return doc.tree
+
+
+# Using the param values in the GUI, write a new .xml config file; returns its (canonical) hash
+def write_config_file(name, update_plots=True):
     # with debug_view:
     #     print("write_config_file: based on ",full_filename)
-    tree = ET.parse(full_xml_filename)  # this file cannot be overwritten; part of tool distro
-    xml_root = tree.getroot()
-    config_tab.fill_xml(xml_root)
-    microenv_tab.fill_xml(xml_root)
-    user_tab.fill_xml(xml_root)
-    if xml_root.find('.//cell_definitions'):
-        cell_types_tab.fill_xml(xml_root)
+    tree = fill_config_tree()
     tree.write(name)
+    h = config_hash(tree.getroot(), myproj)
+
+    if not update_plots:   # e.g., the configs of a sweep
+        return h
 
     # update substrate mesh layout (beware of https://docs.python.org/3/library/functions.html#round)
     sub.update_params(config_tab, user_tab)
     # sub.numx =  math.ceil( (config_tab.xmax.value - config_tab.xmin.value) / config_tab.xdelta.value )
     # sub.numy =  math.ceil( (config_tab.ymax.value - config_tab.ymin.value) / config_tab.ydelta.value )
     # print("tool4nanobio.py: ------- sub.numx, sub.numy = ", sub.numx, sub.numy)
+    return h
 
 
 # callback from write_config_button
@@ -161,6 +198,16 @@ def write_config_file(name):
 #     write_config_file(name)
 
 
+# The dir of cached runs (results of hublib runs, and of local sweeps)
+def cache_dir():
+    if nanoHUB_flag:
+        return os.path.expanduser("~/data/results/.submit_cache/tool4nanobio")  # does Windows like this?
+    if 'CACHEDIR' in os.environ:
+        return os.path.join(os.environ['CACHEDIR'], "tool4nanobio")
+    # local cache
+    return os.path.expanduser(os.path.join('~', '.local','share','tool4nanobio','cache'))
+
+
 # Fill the "Load Config" dropdown widget with valid cached results (and 
 # default & previous config options)
 def get_config_files():
@@ -176,35 +223,16 @@ def get_config_files():
     cf.update(dict(zip(list(map(os.path.basename, files)), files)))
 
     # Find the dir path (full_path) to the cached dirs
-    if nanoHUB_flag:
-        full_path = os.path.expanduser("~/data/results/.submit_cache/tool4nanobio")  # does Windows like this?
-    else:
-        # local cache
-        try:
-            cachedir = os.environ['CACHEDIR']
-            full_path = os.path.join(cachedir, "tool4nanobio")
-        except:
-            # print("Exception in get_config_files")
-            return cf
-
-    # Put all those cached (full) dirs into a list
-    dirs_all = [os.path.join(full_path, f) for f in os.listdir(full_path) if f != '.cache_table']
-
-    # Only want those dirs that contain output files (.svg, .mat, etc), i.e., handle the
-    # situation where a user cancels a Run before it really begins, which may create a (mostly) empty cached dir.
-    dirs = [f for f in dirs_all if len(os.listdir(f)) > 5]   # "5" somewhat arbitrary
-    # with debug_view:
-    #     print(dirs)
+    full_path = cache_dir()
+    if not os.path.isdir(full_path):
+        return cf
 
-    # Get a list of sorted dirs, according to creation timestamp (newest -> oldest)
-    sorted_dirs = sorted(dirs, key=os.path.getctime, reverse=True)
-    # with debug_view:
-    #     print(sorted_dirs)
+    # The cached dirs with results, sorted by creation timestamp (newest -> oldest), come from
+    # the run catalog (bin/run_catalog.py) rather than from listing every one of them.
+    runs = run_catalog(full_path).runs()
 
-    # Get a list of timestamps associated with each dir
-    sorted_dirs_dates = [str(datetime.datetime.fromtimestamp(os.path.getctime(x))) for x in sorted_dirs]
     # Create a dict of {timestamp:dir} pairs
-    cached_file_dict = dict(zip(sorted_dirs_dates, sorted_dirs))
+    cached_file_dict = dict((str(datetime.datetime.fromtimestamp(ctime)), rdir) for rdir, ctime in runs)
     cf.update(cached_file_dict)
     # with debug_view:
     #     print(cf)
@@ -216,13 +244,12 @@ def fill_gui_params(config_file):
     # with debug_view:
     #     print("fill_gui_params: filling with ",config_file)
     # print("fill_gui_params: filling with ",config_file)
-    tree = ET.parse(config_file)
-    xml_root = tree.getroot()
-    config_tab.fill_gui(xml_root)
-    microenv_tab.fill_gui(xml_root)
-    user_tab.fill_gui(xml_root)
-    if xml_root.find('.//cell_definitions'):
-        cell_types_tab.fill_gui(xml_root)
+    doc = ConfigDoc.parse(config_file)
+    config_tab.fill_gui(doc)
+    microenv_tab.fill_gui(doc)
+    user_tab.fill_gui(doc)
+    if doc.find('.//cell_definitions'):
+        cell_types_tab.fill_gui(doc)
 
 
 def run_done_func(s, rdir):
@@ -234,10 +261,46 @@ def run_done_func(s, rdir):
         os.system("submit  mail2self -s 'nanoHUB tool4nanobio' -t 'Your Run completed.'&")
 
     # save the config file to the cache directory
-    shutil.copy('config.xml', rdir)
+    rdir = os.path.abspath(rdir)
+    # (from the caller, not the cwd: a queued job may have been submitted since this run started)
+    local_run = isinstance(s, RunManager)   # hublib's runs are already in the cache dir
+    if not local_run:
+        shutil.copy('config.xml', rdir)
 
     # cd out of tmpdir 
     os.chdir(homedir)
+    sub.stop_watching()
+    if local_run:
+        planner().finish('local')   # its cores are free again
+
+    # a run that finished is marked with its config's hash; a local one is then moved into the cache dir.
+    # So is one that a stop condition ended early, but without the hash: it's not this config's full result.
+    stop_reason = getattr(s, 'stop_reason', None)
+    status = 'terminated early' if stop_reason else 'done'
+    consolidate = consolidate_fields_flag and getattr(s, 'returncode', 0) == 0 and not stop_reason
+    moving = False   # to the cache dir, in the background (see run_moved)
+    if local_run:
+        stop_monitor.disarm()
+    if getattr(s, 'returncode', 0) == 0 or stop_reason:
+        if stop_reason:
+            with open(os.path.join(rdir, 'terminated_early.txt'), 'w') as f:
+                f.write(stop_reason + '\n')
+        else:
+            record_config_hash(rdir, myproj)
+            if getattr(s, 'elapsed', None):   # for the speedups reported on the Config tab
+                planner().record_run(cache_dir(), myproj, rdir, s.elapsed)
+        if local_run:
+            # (a rename; or, if the cache dir is on another file system, a copy on a background thread)
+            cdir = os.path.join(cache_dir(), 'run_' + datetime.datetime.now().strftime('%Y%m%d_%H%M%S'))
+            try:
+                os.makedirs(cache_dir(), exist_ok=True)
+                rdir = move_run_dir(rdir, cdir, done=lambda cdir, aside:
+                                    call_on_loop(sub.loop, run_moved, cdir, aside, status, consolidate))
+                moving = (rdir != cdir)
+            except OSError:
+                pass
+        if not local_run or (rdir != os.path.abspath('tmpdir') and not moving):
+            run_catalog(cache_dir()).add_run(rdir, status=status)
 
     # new results are available, so update dropdown
     # with debug_view:
@@ -251,6 +314,32 @@ def run_done_func(s, rdir):
     # and update visualizations
     # svg.update(rdir)
     sub.update(rdir)
+    telemetry_tab.update(rdir)
+
+    # pack the substrate frames of a finished run into one store (in the background), for faster scrubbing
+    if consolidate and not moving:
+        consolidate_fields(rdir)
+
+
+def consolidate_fields(rdir):
+    run_number = sub.run_number
+    consolidate_in_background(rdir, done=lambda store: sub.set_field_store(rdir, store, run_number))
+
+
+# (on the kernel's thread) a local run has been copied into the cache dir, from aside
+def run_moved(cdir, aside, status, consolidate):
+    run_catalog(cache_dir()).add_run(cdir, status=status)
+    read_config.options = get_config_files()
+    if os.path.abspath(sub.output_dir) == aside:   # (still showing it)
+        sub.update(cdir)
+        telemetry_tab.update(cdir)
+    try:   # the reaper deletes it, like an old tmpdir
+        os.rename(aside, aside[:-len('.moving')] + '.old')
+    except OSError:
+        pass
+    run_dir_reaper.wake()
+    if consolidate:
+        consolidate_fields(cdir)
 
     # animate_tab.gen_button.disabled = False
 
@@ -280,14 +369,10 @@ def run_sim_func(s):
     # make sure we are where we started
     os.chdir(homedir)
 
-    # remove any previous data
+    # start with an empty tmpdir; the previous one is renamed and deleted in the background
     # NOTE: this dir name needs to match the <folder>  in /data/<config_file.xml>
-    os.system('rm -rf tmpdir*')
-    if os.path.isdir('tmpdir'):
-        # something on NFS causing issues...
-        tname = tempfile.mkdtemp(suffix='.bak', prefix='tmpdir_', dir='.')
-        shutil.move('tmpdir', tname)
-    os.makedirs('tmpdir')
+    new_run_dir('tmpdir')
+    run_dir_reaper.wake()
 
     # write the default config file to tmpdir
     new_config_file = "tmpdir/config.xml"  # use Path; work on Windows?
@@ -300,7 +385,9 @@ def run_sim_func(s):
     os.chdir(tdir)  # operate from tmpdir; temporary output goes here.  may be copied to cache later
     # svg.update(tdir)
     # sub.update_params(config_tab)
+    sub.reset_run_state(tdir)   # (the same path as the last run's)
     sub.update(tdir)
+    sub.watch_output(tdir)   # refresh the plots as new frames are written
     # animate_tab.update(tdir)
 
     if nanoHUB_flag:
@@ -321,19 +408,13 @@ def run_sim_func(s):
 
 def outcb(s):
     # This is called when new output is received.
-    # Only update file list for certain messages: 
+    # New frames are picked up by the Plots tab's output watcher (sub.watch_output), not from the log.
     # print("outcb(): s=",s)
-    if "simulat" in s:    # "current simulated time: 60 min (max: 14400 min)"
-        # New Data. update visualizations
-        # svg.update('')
-        # sub.update('')
-        # sub.update_params(config_tab)
-        sub.update()
     return s
 
 
 # Callback for the ("dumb") 'Run' button (without hublib.ui)
-def run_button_cb(s):
+def run_button_cb(s, rerun=False):
 #    with debug_view:
 #        print('run_button_cb')
 
@@ -341,29 +422,90 @@ def run_button_cb(s):
     # print("new_config_file = ", new_config_file)
 #    write_config_file(new_config_file)
 
-    # make sure we are where we started
-    os.chdir(homedir)
+    executor = executors['queue' if remote_cb.value else 'interactive']
+    if executor.busy():   # don't wipe tmpdir out from under it
+        run_manager.status.value = 'Stop the current simulation first.'
+        return
 
-    # remove any previous data
-    # NOTE: this dir name needs to match the <folder>  in /data/<config_file.xml>
-    os.system('rm -rf tmpdir*')
-    if os.path.isdir('tmpdir'):
-        # something on NFS causing issues...
-        tname = tempfile.mkdtemp(suffix='.bak', prefix='tmpdir_', dir='.')
-        shutil.move('tmpdir', tname)
-    os.makedirs('tmpdir')
+    # already have the results of this config?
+    cached_run_box.layout.display = 'none'
+    if reuse_cached_runs_flag and not rerun:
+        cached_run_box.rdir = run_catalog(cache_dir()).find(config_hash(fill_config_tree().getroot(), myproj))
+        if cached_run_box.rdir:
+            cached_run_label.value = 'This config was already run (%s).' % \
+                datetime.datetime.fromtimestamp(os.path.getctime(cached_run_box.rdir)).strftime('%Y-%m-%d %H:%M')
+            cached_run_box.layout.display = None
+            return
 
-    # write the default config file to tmpdir
-    new_config_file = "tmpdir/config.xml"  # use Path; work on Windows?
-    write_config_file(new_config_file)  
+    executor.start()
 
-    tdir = os.path.abspath('tmpdir')
-    os.chdir(tdir)  # operate from tmpdir; temporary output goes here.  may be copied to cache later
-    # svg.update(tdir)
-    # sub.update_params(config_tab)
-    sub.update(tdir)
 
-    subprocess.Popen(["../bin/myproj", "config.xml"])
+#-------------------------------------------------
+# Executors: how the ("dumb") 'Run' button runs a config (off nanoHUB, where Submit does this).
+# Each has busy() and start(), which writes the GUI's config and runs it.
+class InteractiveExecutor(object):
+    # myproj in tmpdir, under the run manager, with the plots following along
+
+    def busy(self):
+        return run_manager.running
+
+    def start(self):
+        if not stop_monitor.arm(os.path.join(homedir, 'tmpdir'), config_tab.toggle_mcds.value):   # (a stop condition it can't make sense of)
+            return
+
+        # make sure we are where we started
+        os.chdir(homedir)
+
+        # start with an empty tmpdir; the previous one is renamed and deleted in the background
+        # NOTE: this dir name needs to match the <folder>  in /data/<config_file.xml>
+        new_run_dir('tmpdir')
+        run_dir_reaper.wake()
+
+        # write the default config file to tmpdir
+        new_config_file = "tmpdir/config.xml"  # use Path; work on Windows?
+        write_config_file(new_config_file)  
+
+        tdir = os.path.abspath('tmpdir')
+        os.chdir(tdir)  # operate from tmpdir; temporary output goes here.  may be copied to cache later
+        # svg.update(tdir)
+        # sub.update_params(config_tab)
+        sub.reset_run_state(tdir)   # (the same path as the last run's)
+        sub.update(tdir)
+        sub.watch_output(tdir)
+
+        # the run manager streams its output, shows progress, and calls run_done_func when it exits
+        # (with its OpenMP threads on cores that no other run of ours is using)
+        run_manager.run(["../bin/myproj", "config.xml"], cwd=tdir,
+                        env=planner().start('local', config_tab.omp_threads.value))
+
+
+class QueueExecutor(object):
+    # a job in the local job queue (bin/job_queue.py); it outlives the kernel, and its results go to the cache dir.
+    # (It doesn't chdir: an interactive run may be going on in tmpdir.)
+
+    def __init__(self, spool_dir):
+        self.queue = JobQueue(spool_dir, cache_dir())
+        self.panel = JobQueuePanel(self.queue, done_func=lambda: setattr(read_config, 'options', get_config_files()))
+        self.queue.resume()
+
+    def busy(self):
+        return False
+
+    def start(self):
+        threads = config_tab.omp_threads.value
+        # as many at a time as fit in the cores that aren't claimed (e.g., by a sweep); the worker re-reads it
+        self.queue.set_max_jobs(max(1, planner().propose()[0] // threads))
+        # (a file of its own, in case another kernel is submitting to the same spool dir)
+        fd, config_file = tempfile.mkstemp(prefix='.config_', suffix='.xml', dir=self.queue.spool_dir)
+        os.close(fd)
+        try:
+            h = write_config_file(config_file, update_plots=False)
+            job_id = self.queue.submit(config_file, myproj, os.path.join(homedir, 'tmpdir'), threads=threads, config_hash=h,
+                                       **self.panel.limits())
+        finally:
+            os.remove(config_file)
+        self.panel.status.value = 'queued %s' % job_id
+        self.panel.refresh()
 
 
 #-------------------------------------------------
@@ -388,31 +530,76 @@ else:
             tooltip='Run a simulation',
         )
         run_button.on_click(run_button_cb)
+        run_manager = RunManager(done_func=run_done_func)
+        # stop conditions, checked on each new output frame (bin/stop_conditions.py)
+        stop_monitor = StopMonitor(sub, on_stop=run_manager.stop)
+        sub.frame_listeners.append(stop_monitor.new_frames_cb)
+        executors = {'interactive': InteractiveExecutor()}
+        if job_queue_flag:
+            executors['queue'] = QueueExecutor(os.path.expanduser(os.path.join('~', '.local','share','tool4nanobio','spool')))
+
+        # shown instead of running when a cached run has the same config
+        def load_cached_run_cb(b):
+            cached_run_box.layout.display = 'none'
+            if cached_run_box.rdir not in read_config.options.values():
+                read_config.options = get_config_files()
+            read_config.value = cached_run_box.rdir   # read_config_cb fills the GUI and plots it
+
+        def rerun_cb(b):
+            run_button_cb(b, rerun=True)
+
+        cached_run_label = widgets.Label('')
+        load_cached_button = widgets.Button(description='Load it', button_style='info')
+        load_cached_button.on_click(load_cached_run_cb)
+        rerun_button = widgets.Button(description='Run anyway')
+        rerun_button.on_click(rerun_cb)
+        cached_run_box = widgets.HBox([cached_run_label, load_cached_button, rerun_button],
+                                      layout=widgets.Layout(display='none'))
+        cached_run_box.rdir = None
+
+
+read_config = widgets.Dropdown(
+    description='Load Config',
+    options=get_config_files(),
+    tooltip='Config File or Previous Run',
+)
+read_config.style = {'description_width': '%sch' % str(len(read_config.description) + 1)}
+read_config.observe(read_config_cb, names='value') 
+
+
+# a sweep's runs go into the cache dir; each one shows up in the 'Load Config' dropdown when it's done
+# (called on the kernel's thread, so it doesn't race the user's picks in the dropdown)
+def sweep_done_func(rdir):
+    run_catalog(cache_dir()).add_run(rdir)
+    # (without reloading the GUI from whatever the dropdown is showing)
+    value = read_config.value
+    read_config.unobserve(read_config_cb, names='value')
+    read_config.options = get_config_files()
+    if value in read_config.options.values():
+        read_config.value = value
+    read_config.observe(read_config_cb, names='value')
 
+config_tab.timings_dir, config_tab.model = cache_dir(), executable_id(myproj)
 
-if nanoHUB_flag or hublib_flag:
-    read_config = widgets.Dropdown(
-        description='Load Config',
-        options=get_config_files(),
-        tooltip='Config File or Previous Run',
-    )
-    read_config.style = {'description_width': '%sch' % str(len(read_config.description) + 1)}
-    read_config.observe(read_config_cb, names='value') 
+sweep_tabs = {'config_tab': config_tab, 'microenv_tab': microenv_tab, 'user_tab': user_tab}
+sweep = Sweep(sweep_tabs, lambda name: write_config_file(name, update_plots=False),
+              executable=myproj, cache_dir=cache_dir,
+              config_dir=os.path.abspath('tmpdir'), done_func=sweep_done_func)
 
 tab_height = 'auto'
 tab_layout = widgets.Layout(width='auto',height=tab_height, overflow_y='scroll',)   # border='2px solid black',
 
 if xml_root.find('.//cell_definitions'):
     # titles = ['About', 'Config Basics', 'Microenvironment', 'User Params', 'Cell Types', 'Out: Plots', 'Animate']
-    titles = ['About', 'Config Basics', 'Microenvironment', 'User Params', 'Cell Types', 'Out: Plots']
+    titles = ['About', 'Config Basics', 'Microenvironment', 'User Params', 'Cell Types', 'Out: Plots', 'Out: Run Stats']
 
     # tabs = widgets.Tab(children=[about_tab.tab, config_tab.tab, microenv_tab.tab, user_tab.tab, cell_types_tab.tab, sub.tab, animate_tab.tab],
-    tabs = widgets.Tab(children=[about_tab.tab, config_tab.tab, microenv_tab.tab, user_tab.tab, cell_types_tab.tab, sub.tab],
+    tabs = widgets.Tab(children=[about_tab.tab, config_tab.tab, microenv_tab.tab, user_tab.tab, cell_types_tab.tab, sub.tab, telemetry_tab.tab],
                    _titles={i: t for i, t in enumerate(titles)},
                    layout=tab_layout)
 else:
-    titles = ['About', 'Config Basics', 'Microenvironment', 'User Params', 'Out: Plots']
-    tabs = widgets.Tab(children=[about_tab.tab, config_tab.tab, microenv_tab.tab, user_tab.tab, sub.tab],
+    titles = ['About', 'Config Basics', 'Microenvironment', 'User Params', 'Out: Plots', 'Out: Run Stats']
+    tabs = widgets.Tab(children=[about_tab.tab, config_tab.tab, microenv_tab.tab, user_tab.tab, sub.tab, telemetry_tab.tab],
                    _titles={i: t for i, t in enumerate(titles)},
                    layout=tab_layout)
 
@@ -424,12 +611,20 @@ if nanoHUB_flag or hublib_flag:
     remote_cb = widgets.Checkbox(indent=False, value=False, description='Submit as Batch Job to Clusters/Grid')
 
     top_row = widgets.HBox(children=[read_config, tool_title])
-    gui = widgets.VBox(children=[top_row, tabs, run_button.w])
-    fill_gui_params(read_config.options['DEFAULT'])
+    gui = widgets.VBox(children=[top_row, tabs, run_button.w, sweep.w])
 else:
-    top_row = widgets.HBox(children=[tool_title])
-    gui = widgets.VBox(children=[top_row, tabs, run_button])
-    fill_gui_params("data/PhysiCell_settings.xml")
+    # run in the background job queue, rather than interactively
+    remote_cb = widgets.Checkbox(indent=False, value=False, description='Queue as a background job',
+                                 disabled='queue' not in executors)
+
+    top_row = widgets.HBox(children=[read_config, tool_title])
+    run_row = widgets.HBox([run_button, remote_cb, cached_run_box])
+    if 'queue' in executors:
+        gui = widgets.VBox(children=[top_row, tabs, run_row, stop_monitor.w, run_manager.w, executors['queue'].panel.w, sweep.w])
+        executors['queue'].panel.refresh()
+    else:
+        gui = widgets.VBox(children=[top_row, tabs, run_row, stop_monitor.w, run_manager.w, sweep.w])
+fill_gui_params(read_config.options['DEFAULT'])
 
 
 # pass in (relative) directory where output data is located
@@ -5,6 +5,7 @@
 #
 import os
 from ipywidgets import Label,Text,Checkbox,Button,HBox,VBox,FloatText,IntText,BoundedIntText,BoundedFloatText
+from config_doc import config_doc
     
 class UserTab(object):
 
@@ -262,77 +263,79 @@ class UserTab(object):
 
     # Populate the GUI widgets with values from the XML
     def fill_gui(self, xml_root):
-        uep = xml_root.find('.//user_parameters')  # find unique entry point into XML
-        self.resource_D.value = float(uep.find('.//resource_D').text)
-        self.resource_lambda.value = float(uep.find('.//resource_lambda').text)
-        self.quorum_D.value = float(uep.find('.//quorum_D').text)
-        self.quorum_lambda.value = float(uep.find('.//quorum_lambda').text)
-        self.death_signal_D.value = float(uep.find('.//death_signal_D').text)
-        self.death_signal_lambda.value = float(uep.find('.//death_signal_lambda').text)
-        self.signal_D.value = float(uep.find('.//signal_D').text)
-        self.signal_lambda.value = float(uep.find('.//signal_lambda').text)
-        self.poison_D.value = float(uep.find('.//poison_D').text)
-        self.poison_lambda.value = float(uep.find('.//poison_lambda').text)
-        self.number_of_invaders.value = int(uep.find('.//number_of_invaders').text)
-        self.number_of_suppliers.value = int(uep.find('.//number_of_suppliers').text)
-        self.number_of_scouts.value = int(uep.find('.//number_of_scouts').text)
-        self.number_of_attackers.value = int(uep.find('.//number_of_attackers').text)
-        self.invader_max_birth_rate.value = float(uep.find('.//invader_max_birth_rate').text)
-        self.invader_max_death_rate.value = float(uep.find('.//invader_max_death_rate').text)
-        self.invader_persistence_time.value = float(uep.find('.//invader_persistence_time').text)
-        self.invader_migration_speed.value = float(uep.find('.//invader_migration_speed').text)
-        self.invader_migration_bias.value = float(uep.find('.//invader_migration_bias').text)
-        self.invader_secretion_rate.value = float(uep.find('.//invader_secretion_rate').text)
-        self.invader_quorum_weight.value = float(uep.find('.//invader_quorum_weight').text)
-        self.scout_persistence_time.value = float(uep.find('.//scout_persistence_time').text)
-        self.scout_migration_speed.value = float(uep.find('.//scout_migration_speed').text)
-        self.scout_migration_bias.value = float(uep.find('.//scout_migration_bias').text)
-        self.scout_secretion_rate.value = float(uep.find('.//scout_secretion_rate').text)
-        self.scout_signal_threshold.value = float(uep.find('.//scout_signal_threshold').text)
-        self.attacker_max_birth_rate.value = float(uep.find('.//attacker_max_birth_rate').text)
-        self.attacker_max_death_rate.value = float(uep.find('.//attacker_max_death_rate').text)
-        self.attacker_persistence_time.value = float(uep.find('.//attacker_persistence_time').text)
-        self.attacker_migration_speed.value = float(uep.find('.//attacker_migration_speed').text)
-        self.attacker_migration_bias.value = float(uep.find('.//attacker_migration_bias').text)
-        self.attacker_secretion_rate.value = float(uep.find('.//attacker_secretion_rate').text)
-        self.attacker_signal_threshold.value = float(uep.find('.//attacker_signal_threshold').text)
-        self.supplier_secretion_rate.value = float(uep.find('.//supplier_secretion_rate').text)
+        doc = config_doc(xml_root)
+        uep = doc.find('.//user_parameters')  # find unique entry point into XML
+        self.resource_D.value = float(doc.find('.//resource_D', uep).text)
+        self.resource_lambda.value = float(doc.find('.//resource_lambda', uep).text)
+        self.quorum_D.value = float(doc.find('.//quorum_D', uep).text)
+        self.quorum_lambda.value = float(doc.find('.//quorum_lambda', uep).text)
+        self.death_signal_D.value = float(doc.find('.//death_signal_D', uep).text)
+        self.death_signal_lambda.value = float(doc.find('.//death_signal_lambda', uep).text)
+        self.signal_D.value = float(doc.find('.//signal_D', uep).text)
+        self.signal_lambda.value = float(doc.find('.//signal_lambda', uep).text)
+        self.poison_D.value = float(doc.find('.//poison_D', uep).text)
+        self.poison_lambda.value = float(doc.find('.//poison_lambda', uep).text)
+        self.number_of_invaders.value = int(doc.find('.//number_of_invaders', uep).text)
+        self.number_of_suppliers.value = int(doc.find('.//number_of_suppliers', uep).text)
+        self.number_of_scouts.value = int(doc.find('.//number_of_scouts', uep).text)
+        self.number_of_attackers.value = int(doc.find('.//number_of_attackers', uep).text)
+        self.invader_max_birth_rate.value = float(doc.find('.//invader_max_birth_rate', uep).text)
+        self.invader_max_death_rate.value = float(doc.find('.//invader_max_death_rate', uep).text)
+        self.invader_persistence_time.value = float(doc.find('.//invader_persistence_time', uep).text)
+        self.invader_migration_speed.value = float(doc.find('.//invader_migration_speed', uep).text)
+        self.invader_migration_bias.value = float(doc.find('.//invader_migration_bias', uep).text)
+        self.invader_secretion_rate.value = float(doc.find('.//invader_secretion_rate', uep).text)
+        self.invader_quorum_weight.value = float(doc.find('.//invader_quorum_weight', uep).text)
+        self.scout_persistence_time.value = float(doc.find('.//scout_persistence_time', uep).text)
+        self.scout_migration_speed.value = float(doc.find('.//scout_migration_speed', uep).text)
+        self.scout_migration_bias.value = float(doc.find('.//scout_migration_bias', uep).text)
+        self.scout_secretion_rate.value = float(doc.find('.//scout_secretion_rate', uep).text)
+        self.scout_signal_threshold.value = float(doc.find('.//scout_signal_threshold', uep).text)
+        self.attacker_max_birth_rate.value = float(doc.find('.//attacker_max_birth_rate', uep).text)
+        self.attacker_max_death_rate.value = float(doc.find('.//attacker_max_death_rate', uep).text)
+        self.attacker_persistence_time.value = float(doc.find('.//attacker_persistence_time', uep).text)
+        self.attacker_migration_speed.value = float(doc.find('.//attacker_migration_speed', uep).text)
+        self.attacker_migration_bias.value = float(doc.find('.//attacker_migration_bias', uep).text)
+        self.attacker_secretion_rate.value = float(doc.find('.//attacker_secretion_rate', uep).text)
+        self.attacker_signal_threshold.value = float(doc.find('.//attacker_signal_threshold', uep).text)
+        self.supplier_secretion_rate.value = float(doc.find('.//supplier_secretion_rate', uep).text)
 
 
     # Read values from the GUI widgets to enable editing XML
     def fill_xml(self, xml_root):
-        uep = xml_root.find('.//user_parameters')  # find unique entry point into XML 
-        uep.find('.//resource_D').text = str(self.resource_D.value)
-        uep.find('.//resource_lambda').text = str(self.resource_lambda.value)
-        uep.find('.//quorum_D').text = str(self.quorum_D.value)
-        uep.find('.//quorum_lambda').text = str(self.quorum_lambda.value)
-        uep.find('.//death_signal_D').text = str(self.death_signal_D.value)
-        uep.find('.//death_signal_lambda').text = str(self.death_signal_lambda.value)
-        uep.find('.//signal_D').text = str(self.signal_D.value)
-        uep.find('.//signal_lambda').text = str(self.signal_lambda.value)
-        uep.find('.//poison_D').text = str(self.poison_D.value)
-        uep.find('.//poison_lambda').text = str(self.poison_lambda.value)
-        uep.find('.//number_of_invaders').text = str(self.number_of_invaders.value)
-        uep.find('.//number_of_suppliers').text = str(self.number_of_suppliers.value)
-        uep.find('.//number_of_scouts').text = str(self.number_of_scouts.value)
-        uep.find('.//number_of_attackers').text = str(self.number_of_attackers.value)
-        uep.find('.//invader_max_birth_rate').text = str(self.invader_max_birth_rate.value)
-        uep.find('.//invader_max_death_rate').text = str(self.invader_max_death_rate.value)
-        uep.find('.//invader_persistence_time').text = str(self.invader_persistence_time.value)
-        uep.find('.//invader_migration_speed').text = str(self.invader_migration_speed.value)
-        uep.find('.//invader_migration_bias').text = str(self.invader_migration_bias.value)
-        uep.find('.//invader_secretion_rate').text = str(self.invader_secretion_rate.value)
-        uep.find('.//invader_quorum_weight').text = str(self.invader_quorum_weight.value)
-        uep.find('.//scout_persistence_time').text = str(self.scout_persistence_time.value)
-        uep.find('.//scout_migration_speed').text = str(self.scout_migration_speed.value)
-        uep.find('.//scout_migration_bias').text = str(self.scout_migration_bias.value)
-        uep.find('.//scout_secretion_rate').text = str(self.scout_secretion_rate.value)
-        uep.find('.//scout_signal_threshold').text = str(self.scout_signal_threshold.value)
-        uep.find('.//attacker_max_birth_rate').text = str(self.attacker_max_birth_rate.value)
-        uep.find('.//attacker_max_death_rate').text = str(self.attacker_max_death_rate.value)
-        uep.find('.//attacker_persistence_time').text = str(self.attacker_persistence_time.value)
-        uep.find('.//attacker_migration_speed').text = str(self.attacker_migration_speed.value)
-        uep.find('.//attacker_migration_bias').text = str(self.attacker_migration_bias.value)
-        uep.find('.//attacker_secretion_rate').text = str(self.attacker_secretion_rate.value)
-        uep.find('.//attacker_signal_threshold').text = str(self.attacker_signal_threshold.value)
-        uep.find('.//supplier_secretion_rate').text = str(self.supplier_secretion_rate.value)
+        doc = config_doc(xml_root)
+        uep = doc.find('.//user_parameters')  # find unique entry point into XML 
+        doc.find('.//resource_D', uep).text = str(self.resource_D.value)
+        doc.find('.//resource_lambda', uep).text = str(self.resource_lambda.value)
+        doc.find('.//quorum_D', uep).text = str(self.quorum_D.value)
+        doc.find('.//quorum_lambda', uep).text = str(self.quorum_lambda.value)
+        doc.find('.//death_signal_D', uep).text = str(self.death_signal_D.value)
+        doc.find('.//death_signal_lambda', uep).text = str(self.death_signal_lambda.value)
+        doc.find('.//signal_D', uep).text = str(self.signal_D.value)
+        doc.find('.//signal_lambda', uep).text = str(self.signal_lambda.value)
+        doc.find('.//poison_D', uep).text = str(self.poison_D.value)
+        doc.find('.//poison_lambda', uep).text = str(self.poison_lambda.value)
+        doc.find('.//number_of_invaders', uep).text = str(self.number_of_invaders.value)
+        doc.find('.//number_of_suppliers', uep).text = str(self.number_of_suppliers.value)
+        doc.find('.//number_of_scouts', uep).text = str(self.number_of_scouts.value)
+        doc.find('.//number_of_attackers', uep).text = str(self.number_of_attackers.value)
+        doc.find('.//invader_max_birth_rate', uep).text = str(self.invader_max_birth_rate.value)
+        doc.find('.//invader_max_death_rate', uep).text = str(self.invader_max_death_rate.value)
+        doc.find('.//invader_persistence_time', uep).text = str(self.invader_persistence_time.value)
+        doc.find('.//invader_migration_speed', uep).text = str(self.invader_migration_speed.value)
+        doc.find('.//invader_migration_bias', uep).text = str(self.invader_migration_bias.value)
+        doc.find('.//invader_secretion_rate', uep).text = str(self.invader_secretion_rate.value)
+        doc.find('.//invader_quorum_weight', uep).text = str(self.invader_quorum_weight.value)
+        doc.find('.//scout_persistence_time', uep).text = str(self.scout_persistence_time.value)
+        doc.find('.//scout_migration_speed', uep).text = str(self.scout_migration_speed.value)
+        doc.find('.//scout_migration_bias', uep).text = str(self.scout_migration_bias.value)
+        doc.find('.//scout_secretion_rate', uep).text = str(self.scout_secretion_rate.value)
+        doc.find('.//scout_signal_threshold', uep).text = str(self.scout_signal_threshold.value)
+        doc.find('.//attacker_max_birth_rate', uep).text = str(self.attacker_max_birth_rate.value)
+        doc.find('.//attacker_max_death_rate', uep).text = str(self.attacker_max_death_rate.value)
+        doc.find('.//attacker_persistence_time', uep).text = str(self.attacker_persistence_time.value)
+        doc.find('.//attacker_migration_speed', uep).text = str(self.attacker_migration_speed.value)
+        doc.find('.//attacker_migration_bias', uep).text = str(self.attacker_migration_bias.value)
+        doc.find('.//attacker_secretion_rate', uep).text = str(self.attacker_secretion_rate.value)
+        doc.find('.//attacker_signal_threshold', uep).text = str(self.attacker_signal_threshold.value)
+        doc.find('.//supplier_secretion_rate', uep).text = str(self.supplier_secretion_rate.value)
@@ -96,6 +96,7 @@ cells_tab_header = """
 #
 import os
 from ipywidgets import Label,Text,Checkbox,Button,HBox,VBox,FloatText,IntText,BoundedIntText,BoundedFloatText,Layout,Box,Dropdown
+from config_doc import config_doc
     
 class CellTypesTab(object):
 
@@ -139,7 +140,8 @@ fill_gui_str= """
 
     # Populate the GUI widgets with values from the XML
     def fill_gui(self, xml_root):
-        uep = xml_root.find('.//cell_definitions')  # find unique entry point
+        doc = config_doc(xml_root)   # (indexed; bin/config_doc.py)
+        uep = doc.find('.//cell_definitions')  # find unique entry point
 
 """
 
@@ -147,7 +149,8 @@ fill_xml_str= """
 
     # Read values from the GUI widgets to enable editing XML
     def fill_xml(self, xml_root):
-        uep = xml_root.find('.//cell_definitions')  # find unique entry point
+        doc = config_doc(xml_root)   # (indexed; bin/config_doc.py)
+        uep = doc.find('.//cell_definitions')  # find unique entry point
 
 """
 
@@ -335,37 +338,37 @@ def handle_divider_pheno(div_str):
 # default is to assume "float"
 def fill_gui_and_xml(widget_name, xml_elm):
     global fill_gui_str, fill_xml_str
-    fill_gui_str += indent + widget_name + ".value = float(uep.find('" + xml_elm + "').text)\n"
-    fill_xml_str += indent + "uep.find('" + xml_elm + "').text = str(" + widget_name + ".value)\n"
+    fill_gui_str += indent + widget_name + ".value = float(doc.find('" + xml_elm + "', uep).text)\n"
+    fill_xml_str += indent + "doc.find('" + xml_elm + "', uep).text = str(" + widget_name + ".value)\n"
 
 def fill_gui_and_xml_bool_attrib(widget_name, xml_elm, attrib_name):
     global fill_gui_str, fill_xml_str
     # fill_gui_str += indent + widget_name + ".value = ('true' == (uep.find('" + xml_elm + "').text.lower()))\n"
-    fill_gui_str += indent + widget_name + ".value = ('true' == (uep.find('" + xml_elm + "').attrib['" + attrib_name + "'].lower()))\n"
+    fill_gui_str += indent + widget_name + ".value = ('true' == (doc.find('" + xml_elm + "', uep).attrib['" + attrib_name + "'].lower()))\n"
 
     # fill_xml_str += indent + "uep.find('" + xml_elm + "').text = str(" + widget_name + ".value)\n"
-    fill_xml_str += indent + "uep.find('" + xml_elm + "').attrib['" + attrib_name + "'] = str(" + widget_name + ".value)\n"
+    fill_xml_str += indent + "doc.find('" + xml_elm + "', uep).attrib['" + attrib_name + "'] = str(" + widget_name + ".value)\n"
 
 def fill_gui_and_xml_bool(widget_name, xml_elm):
     global fill_gui_str, fill_xml_str
     # self.fix_persistence.value = ('true' == (uep.find('.//fix_persistence').text.lower()) )
     # fill_gui_str += indent + widget_name + ".value = ('true' == (uep.find('" + xml_elm + "').text.lower()))\n"
-    fill_gui_str += indent + widget_name + ".value = ('true' == (uep.find('" + xml_elm + "').text.lower()))\n"
+    fill_gui_str += indent + widget_name + ".value = ('true' == (doc.find('" + xml_elm + "', uep).text.lower()))\n"
 
     # uep.find('.//fix_persistence').text = str(self.fix_persistence.value)
     # fill_xml_str += indent + "uep.find('" + xml_elm + "').text = str(" + widget_name + ".value)\n"
-    fill_xml_str += indent + "uep.find('" + xml_elm + "').text = str(" + widget_name + ".value)\n"
+    fill_xml_str += indent + "doc.find('" + xml_elm + "', uep).text = str(" + widget_name + ".value)\n"
 
 def fill_gui_and_xml_string(widget_name, xml_elm):
     global fill_gui_str, fill_xml_str
-    fill_gui_str += indent + widget_name + ".value = uep.find('" + xml_elm + "').text\n"
-    fill_xml_str += indent + "uep.find('" + xml_elm + "').text = str(" + widget_name + ".value)\n"
+    fill_gui_str += indent + widget_name + ".value = doc.find('" + xml_elm + "', uep).text\n"
+    fill_xml_str += indent + "doc.find('" + xml_elm + "', uep).text = str(" + widget_name + ".value)\n"
 
 def fill_gui_and_xml_string_attrib(widget_name, xml_elm, attrib_name):
     global fill_gui_str, fill_xml_str
-    fill_gui_str += indent + widget_name + ".value = uep.find('" + xml_elm + "').attrib['" + attrib_name + "']\n"
+    fill_gui_str += indent + widget_name + ".value = doc.find('" + xml_elm + "', uep).attrib['" + attrib_name + "']\n"
     # fill_xml_str += indent + "uep.find('" + xml_elm + "').text = str(" + widget_name + ".value)\n"
-    fill_xml_str += indent + "uep.find('" + xml_elm + "').attrib['" + attrib_name + "'] = str(" + widget_name + ".value)\n"
+    fill_xml_str += indent + "doc.find('" + xml_elm + "', uep).attrib['" + attrib_name + "'] = str(" + widget_name + ".value)\n"
 
 
 def fill_gui_and_xml_comment(s):
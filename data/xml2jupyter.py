@@ -100,6 +100,7 @@ user_tab_header = """
 #
 import os
 from ipywidgets import Label,Text,Checkbox,Button,HBox,VBox,FloatText,IntText,BoundedIntText,BoundedFloatText,Layout,Box
+from config_doc import config_doc
     
 class UserTab(object):
 
@@ -151,10 +152,11 @@ fill_gui_str= """
 
     # Populate the GUI widgets with values from the XML
     def fill_gui(self, xml_root):
-        uep = xml_root.find('.//microenvironment_setup')  # find unique entry point
+        doc = config_doc(xml_root)   # (indexed; bin/config_doc.py)
+        uep = doc.find('.//microenvironment_setup')  # find unique entry point
         vp = []   # pointers to <variable> nodes
         if uep:
-            for var in uep.findall('variable'):
+            for var in doc.findall('variable', uep):
                 vp.append(var)
 
 """
@@ -163,10 +165,11 @@ fill_xml_str= """
 
     # Read values from the GUI widgets to enable editing XML
     def fill_xml(self, xml_root):
-        uep = xml_root.find('.//microenvironment_setup')  # find unique entry point
+        doc = config_doc(xml_root)   # (indexed; bin/config_doc.py)
+        uep = doc.find('.//microenvironment_setup')  # find unique entry point
         vp = []   # pointers to <variable> nodes
         if uep:
-            for var in uep.findall('variable'):
+            for var in doc.findall('variable', uep):
                 vp.append(var)
 
 """
@@ -221,8 +224,10 @@ units_count = 0
 # TODO: cast attributes to lower case before doing equality tests; perform more testing!
 
 uep = root.find('.//user_parameters')  # find unique entry point (uep) to user params
-fill_gui_str += indent + "uep = xml_root.find('.//user_parameters')  # find unique entry point\n"
-fill_xml_str += indent + "uep = xml_root.find('.//user_parameters')  # find unique entry point\n"
+fill_gui_str += indent + "doc = config_doc(xml_root)\n"
+fill_gui_str += indent + "uep = doc.find('.//user_parameters')  # find unique entry point\n"
+fill_xml_str += indent + "doc = config_doc(xml_root)\n"
+fill_xml_str += indent + "uep = doc.find('.//user_parameters')  # find unique entry point\n"
 
 # param_count = 0
    #param_desc_count = 0
@@ -412,11 +417,11 @@ for child in uep:   # uep = "unique entry point" for <user_parameters> (from abo
             if (not divider_flag):
                 # float, int, bool
                 if (type_cast[child.attrib['type']] == "bool"):
-                    fill_gui_str += indent + full_name + ".value = ('true' == (uep.find('.//" + child.tag + "').text.lower()) )\n"
+                    fill_gui_str += indent + full_name + ".value = ('true' == (doc.find('.//" + child.tag + "', uep).text.lower()) )\n"
                 else:
-                    fill_gui_str += indent + full_name + ".value = " + type_cast[child.attrib['type']] + "(uep.find('.//" + child.tag + "').text)\n"
+                    fill_gui_str += indent + full_name + ".value = " + type_cast[child.attrib['type']] + "(doc.find('.//" + child.tag + "', uep).text)\n"
 
-                fill_xml_str += indent + "uep.find('.//" + child.tag + "').text = str("+ full_name + ".value)\n"
+                fill_xml_str += indent + "doc.find('.//" + child.tag + "', uep).text = str("+ full_name + ".value)\n"
 
 vbox_str += indent + "])"
 
@@ -446,6 +451,7 @@ microenv_tab_header = """
 #
 import os
 from ipywidgets import Label,Text,Checkbox,Button,HBox,VBox,FloatText,IntText,BoundedIntText,BoundedFloatText,Layout,Box
+from config_doc import config_doc
     
 class MicroenvTab(object):
 
@@ -496,10 +502,11 @@ fill_gui_str= """
 
     # Populate the GUI widgets with values from the XML
     def fill_gui(self, xml_root):
-        uep = xml_root.find('.//microenvironment_setup')  # find unique entry point
+        doc = config_doc(xml_root)   # (indexed; bin/config_doc.py)
+        uep = doc.find('.//microenvironment_setup')  # find unique entry point
         vp = []   # pointers to <variable> nodes
         if uep:
-            for var in uep.findall('variable'):
+            for var in doc.findall('variable', uep):
                 vp.append(var)
 
 """
@@ -508,10 +515,11 @@ fill_xml_str= """
 
     # Read values from the GUI widgets to enable editing XML
     def fill_xml(self, xml_root):
-        uep = xml_root.find('.//microenvironment_setup')  # find unique entry point
+        doc = config_doc(xml_root)   # (indexed; bin/config_doc.py)
+        uep = doc.find('.//microenvironment_setup')  # find unique entry point
         vp = []   # pointers to <variable> nodes
         if uep:
-            for var in uep.findall('variable'):
+            for var in doc.findall('variable', uep):
                 vp.append(var)
 
 """
@@ -650,9 +658,9 @@ if uep:
                         microenv_tab_header += "\n" + indent + full_name + " = FloatText(value=" + ppchild.text + ",\n"
                         microenv_tab_header += indent2 + "step=" + str(delta_val) + ",style=style, layout=widget_layout)\n"
 
-                        fill_gui_str += indent + full_name + ".value = " + 'float' + "(vp["+str(var_idx)+"].find('.//" + ppchild.tag + "').text)\n"
+                        fill_gui_str += indent + full_name + ".value = " + 'float' + "(doc.find('.//" + ppchild.tag + "', vp["+str(var_idx)+"]).text)\n"
 
-                        fill_xml_str += indent + "vp["+str(var_idx)+"].find('.//" + ppchild.tag + "').text = str("+ full_name + ".value)\n"
+                        fill_xml_str += indent + "doc.find('.//" + ppchild.tag + "', vp["+str(var_idx)+"]).text = str("+ full_name + ".value)\n"
 
                         if 'units' in ppchild.attrib.keys():
                             if ppchild.attrib['units'] != "dimensionless" and ppchild.attrib['units'] != "none":
@@ -691,7 +699,7 @@ if uep:
                         print("       toggle_name=",toggle_name)
                         microenv_tab_header += indent + toggle_name + " = Checkbox(description='" + bv.attrib['ID'] + "', disabled=False" + ",style=style, layout=widget_layout)\n"
 
-                        fill_gui_str += indent + "if vp[" + str(var_idx) + "].find('.//boundary_value[" + str(bv_idx) +"]').attrib['enabled'].lower() == 'true':\n"
+                        fill_gui_str += indent + "if doc.find('.//boundary_value[" + str(bv_idx) +"]', vp[" + str(var_idx) + "]).attrib['enabled'].lower() == 'true':\n"
                         fill_gui_str += indent2 + toggle_name + ".value = True\n"
                         fill_gui_str += indent + "else:\n"
                         fill_gui_str += indent2 + toggle_name + ".value = False\n"
@@ -702,13 +710,13 @@ if uep:
                         microenv_tab_header += "\n" + indent + menv_var_name + " = FloatText(value=" + bv.text + ",style=style, layout=widget2_layout)\n"
 
                         # e.g., self.oxygen_Dirichlet_boundary_condition_value_xmin.value = float(vp[0].find('.//Dirichlet_options//boundary_value[1]').text)
-                        fill_gui_str += indent + menv_var_name + ".value = " + 'float' + "(vp["+str(var_idx)+"].find('.//" + child.tag + "//boundary_value[" + str(bv_idx) + "]').text)\n"
+                        fill_gui_str += indent + menv_var_name + ".value = " + 'float' + "(doc.find('.//" + child.tag + "//boundary_value[" + str(bv_idx) + "]', vp["+str(var_idx)+"]).text)\n"
 
                         # fill_xml_str += indent + "uep.find('.//" + child.tag + "').text = str("+ full_name + ".value)\n"
-                        fill_xml_str += indent + "vp[" + str(var_idx) + "].find('.//" + child.tag + "//boundary_value[" + str(bv_idx) + "]').text = str("+ menv_var_name + ".value)\n"
+                        fill_xml_str += indent + "doc.find('.//" + child.tag + "//boundary_value[" + str(bv_idx) + "]', vp[" + str(var_idx) + "]).text = str("+ menv_var_name + ".value)\n"
                     
                     # e.g., vp[0].find('.//Dirichlet_options//boundary_value[1]').attrib['enabled'] = str(self.oxygen_Dirichlet_boundary_condition_toggle_xmin.value).lower()
-                        fill_xml_str += indent + "vp[" + str(var_idx) + "].find('.//" + child.tag + "//boundary_value[" + str(bv_idx) + "]').attrib['enabled'] = str(" + toggle_name + ".value).lower()\n\n"
+                        fill_xml_str += indent + "doc.find('.//" + child.tag + "//boundary_value[" + str(bv_idx) + "]', vp[" + str(var_idx) + "]).attrib['enabled'] = str(" + toggle_name + ".value).lower()\n\n"
 
 
                         param_count += 1
@@ -740,10 +748,10 @@ if uep:
                 microenv_tab_header += "\n" + indent + full_name + " = FloatText(value=" + child.text + ",style=style, layout=widget_layout)\n"
 
                 # fill_gui_str += indent + full_name + ".value = " + 'float' + "(uep.find('.//" + child.tag + "').text)\n"
-                fill_gui_str += indent + full_name + ".value = " + 'float' + "(vp["+str(var_idx)+"].find('.//" + child.tag + "').text)\n"
+                fill_gui_str += indent + full_name + ".value = " + 'float' + "(doc.find('.//" + child.tag + "', vp["+str(var_idx)+"]).text)\n"
 
                 # fill_xml_str += indent + "uep.find('.//" + child.tag + "').text = str("+ full_name + ".value)\n"
-                fill_xml_str += indent + "vp["+str(var_idx)+"].find('.//" + child.tag + "').text = str("+ full_name + ".value)\n"
+                fill_xml_str += indent + "doc.find('.//" + child.tag + "', vp["+str(var_idx)+"]).text = str("+ full_name + ".value)\n"
 
 
                 # Handle the one-off, Dirichlet BC toggle widget. So very ugly.
@@ -754,13 +762,13 @@ if uep:
 
                     # Ugly.
                     # fill_gui_str += indent + full_name + ".value = " + 'float' + "(vp["+str(var_idx)+"].find('.//" + ppchild.tag + "').text)\n"
-                    fill_gui_str += indent + "if vp[" + str(var_idx) + "].find('.//Dirichlet_boundary_condition').attrib['enabled'].lower() == 'true':\n"
+                    fill_gui_str += indent + "if doc.find('.//Dirichlet_boundary_condition', vp[" + str(var_idx) + "]).attrib['enabled'].lower() == 'true':\n"
                     fill_gui_str += indent2 + toggle_name + ".value = True\n"
                     fill_gui_str += indent + "else:\n"
                     fill_gui_str += indent2 + toggle_name + ".value = False\n"
 
 #                    vp[0].find('.//Dirichlet_boundary_condition').attrib['enabled'] = str(self.oxygen_Dirichlet_boundary_condition_toggle.value)
-                    fill_xml_str += indent + "vp[" + str(var_idx) + "].find('.//Dirichlet_boundary_condition').attrib['enabled'] = str(" + toggle_name + ".value).lower()\n\n"
+                    fill_xml_str += indent + "doc.find('.//Dirichlet_boundary_condition', vp[" + str(var_idx) + "]).attrib['enabled'] = str(" + toggle_name + ".value).lower()\n\n"
 
                 if 'units' in child.attrib.keys():
                     if child.attrib['units'] != "dimensionless" and child.attrib['units'] != "none":
@@ -835,7 +843,7 @@ if uep:
             # fill_gui_str += indent + gradients_toggle_name + ".value = bool(uep.find('.//options//calculate_gradients').text)\n"
 
             # Ugly.
-            fill_gui_str += indent + "if uep.find('.//options//calculate_gradients').text.lower() == 'true':\n"
+            fill_gui_str += indent + "if doc.find('.//options//calculate_gradients', uep).text.lower() == 'true':\n"
             fill_gui_str += indent2 + gradients_toggle_name + ".value = True\n"
             fill_gui_str += indent + "else:\n"
             fill_gui_str += indent2 + gradients_toggle_name + ".value = False\n"
@@ -848,7 +856,7 @@ if uep:
             # self.track_internal.value = bool(uep.find(".//options//track_internalized_substrates_in_each_agent").text)
 
             # note that in Python: str(True) --> 'True'
-            fill_xml_str += indent + "uep.find('.//options//calculate_gradients').text = str("+ gradients_toggle_name + ".value)\n"
+            fill_xml_str += indent + "doc.find('.//options//calculate_gradients', uep).text = str("+ gradients_toggle_name + ".value)\n"
 
         # uep.find('.//options//calculate_gradients').text = str(self.calculate_gradient.value)
         # uep.find('.//options//track_internalized_substrates_in_each_agent').text = str(self.track_internal.value)
@@ -877,12 +885,12 @@ if uep:
             # fill_gui_str += indent + track_toggle_name + ".value = bool(uep.find('.//options//track_internalized_substrates_in_each_agent').text)\n"
 
             # Ugly.
-            fill_gui_str += indent + "if uep.find('.//options//track_internalized_substrates_in_each_agent').text.lower() == 'true':\n"
+            fill_gui_str += indent + "if doc.find('.//options//track_internalized_substrates_in_each_agent', uep).text.lower() == 'true':\n"
             fill_gui_str += indent2 + track_toggle_name + ".value = True\n"
             fill_gui_str += indent + "else:\n"
             fill_gui_str += indent2 + track_toggle_name + ".value = False\n"
 
-            fill_xml_str += indent + "uep.find('.//options//track_internalized_substrates_in_each_agent').text = str("+ track_toggle_name + ".value)\n"
+            fill_xml_str += indent + "doc.find('.//options//track_internalized_substrates_in_each_agent', uep).text = str("+ track_toggle_name + ".value)\n"
 
 
     print('--------- done with microenv --------------')